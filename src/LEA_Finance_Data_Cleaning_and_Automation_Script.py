@@ -11,41 +11,46 @@ import pandas as pd
 import numpy as np
 import os
 import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
 from sqlalchemy import create_engine
+from column_mapping import ColumnMapping, ColumnMappingRegistry, SENTINEL_TABLE, inferred_dtypes
+from bulk_loader import copy_load, insert_new_entities, DEFAULT_BATCH_SIZE
+from load_manifest import LoadManifest, plan_incremental_years
+from long_format import wide_to_long, plain_columns
+from query_cache import bump_data_version
+from expenditures import TitleRegistry
+from schema_manager import apply_schema, ensure_sentinel_table, refresh_zscore_view, load_title_registry
+from warehouse import ParquetWarehouse, WAREHOUSE_PATH
+from zscores import ZScoreEngine, ZSCORE_PATH
+from instrumentation import configure, configure_worker, current, measure_iter, stage, METRICS_PATH
 
 
-def melt_df(df, schema, table, column_mapping_df, total_columns):
-    columns_to_use = []
-    new_columns = []
-    for _, row in column_mapping_df.iterrows():
-        if row['Table'] in [table, 'all']:
-            if row['New Name'] not in total_columns:
-                columns_to_use.append(row['New Name'])
+# File Locations
+RAW_DATA_DIR = os.path.join("..", "raw_data_files")
+DB_CREDENTIALS_PATH = os.path.join("..", "LEA_Finance_Survey_DB.json")
 
-    new_df = df[columns_to_use].copy()
-    id_vars = ['census_id', 'year'] + [col for col in new_df.columns if col.endswith('_flag')]
+# Two-digit survey years available as sdf10.txt through sdf20.txt
+SURVEY_YEARS = range(10, 21)
 
-    if schema == 'expenses':
-        new_df = pd.melt(new_df, id_vars=id_vars, var_name='expenditure_title', value_name='amount')
-        new_columns = ['expenditure_title', 'amount']
-    elif schema == 'revenue':
-        new_df = pd.melt(new_df, id_vars=id_vars, var_name='revenue_title', value_name='revenue')
-        new_columns = ['revenue_title', 'revenue']
+# Placeholder codes the F-33 files use in place of missing or withheld amounts
+SENTINELS = [-9, -3, -2, -1]
 
-    remaining_columns = [col for col in id_vars if col not in new_columns]
-    ordered_columns = remaining_columns[:2] + new_columns + remaining_columns[2:]
-    new_df = new_df[ordered_columns]
-    return new_df
+# Database write backends: row INSERTs through DataFrame.to_sql, or PostgreSQL COPY FROM STDIN
+LOADERS = ('to_sql', 'copy')
 
-# Database Initialization with Mapped Data
-# use_database = input("Enter 'y' to use database script. Else enter 'n'")
-use_database = 'y'
 
-if use_database == 'y':
+def create_database_engine():
+    """
+    Creates a SQLAlchemy engine using credentials from the JSON file.
+
+    Returns:
+    sqlalchemy.engine.Engine: An engine connected to the PostgreSQL database.
+    """
 
     # Read in database credentials from JSON file
-    db_credentials_path = os.path.join("..", "LEA_Finance_Survey_DB.json")
-    with open(db_credentials_path) as infile:
+    with open(DB_CREDENTIALS_PATH) as infile:
         credentials = json.load(infile)
 
     # Assign Credentials to Variables
@@ -56,112 +61,142 @@ if use_database == 'y':
     port = credentials['port']
 
     # Create a database connection using SQLAlchemy engine
-    engine = create_engine(f'postgresql://{username}:{password}@{host}:{port}/{database_name}')
-
-# Importing the Dataset
-for i in range(10, 21):
+    return create_engine(f'postgresql://{username}:{password}@{host}:{port}/{database_name}')
 
-    file_name = f'sdf{i}.txt'
-    file_path = os.path.join("..", "raw_data_files", file_name)
 
-    df = pd.read_csv(file_path, delimiter= '\t')
+def rename_columns(df: pd.DataFrame, mapping: ColumnMapping) -> pd.DataFrame:
+    """
+    Renames the raw F-33 columns to the database column names of the mapping workbook.
+    """
 
+    df.rename(columns=mapping.rename_map, inplace=True)
+    df.columns = df.columns.str.strip()
+    return df
 
-    # Import the Column Mapping
-    # An excel file with original and new column names, expected datatype, and descriptions is used.
-    column_map_path = os.path.join("..", 'LEA Local Finance Survey – School District Data 2010 – 2020 – Column Mapping.xlsx')
-    column_mapping_df = pd.read_excel(column_map_path,
-                                      sheet_name= f'Column Mapping {i}')
 
-    # Remove White Spaces from Column Names
-    column_mapping_df['Original Name'] = column_mapping_df['Original Name'].str.strip()
-    column_mapping_df['New Name'] = column_mapping_df['New Name'].str.strip()
+def drop_non_government_entities(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Exclusion of Non-Government Entities from Analysis.
+    Only LEAs with 'census_id' not equal to 'N' are considered for analysis.
+    """
 
-    # Create Dictionary to Map New Column Names
-    column_map_dict = column_mapping_df.set_index('Original Name')['New Name'].to_dict()
+    df = df[df['census_id'] != 'N']
+    return df
 
-    # Rename Columns
-    df.rename(columns=column_map_dict, inplace=True)
-    df.columns = df.columns.str.strip()
 
-    # Exclusion of Non-Government Entities from Analysis
-    # Only LEAs with 'census_id' not equal to 'N' are considered for analysis.
-    df = df[df['census_id'] != 'N']
-    df['census_id'].duplicated().any()
+def drop_total_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Column Removal for Database Normalization.
+    Columns starting with 'total_' are targeted for removal in the normalization process.
+    """
 
-    # Column Removal for Database Normalization
-    # Columns starting with 'total_' are targeted for removal in the normalization process.
     total_columns = []
     for col in df.columns:
         if col.startswith('total_'):
             total_columns.append(col)
 
-
-    column_totals = df[total_columns].copy()
     df.drop(columns= total_columns, inplace= True)
+    return df
+
+
+def cast_column_types(df: pd.DataFrame, mapping: ColumnMapping) -> pd.DataFrame:
+    """
+    Casting Data Types.
+    ansi_state_code and ansi_county_code are converted to Strings. Codes and _flag columns become categoricals,
+    following the mapping's dtype plan. The two-digit survey year becomes a January 1st timestamp, assembled
+    from integers rather than parsed from strings.
+    """
 
-    # Casting Data Types
-    # ansi_state_code and ansi_county_code are converted to Strings. 'year' is converted to datetime.
-    df['year'] = df['year'].astype(str)
-    df['year'] = '20' + df['year']
-    df['year'] = pd.to_datetime(df['year'].astype(str), format='%Y')
     df['ansi_state_code'] = df['ansi_state_code'].astype(str)
     df['ansi_county_code'] = df['ansi_county_code'].astype(str)
+    categorical_columns = [col for col, dtype in mapping.column_dtypes.items() if dtype == 'category' and col in df.columns]
+    df = df.astype({col: 'category' for col in categorical_columns})
+    df['year'] = pd.to_datetime(pd.DataFrame({'year': 2000 + df['year'].astype('int64'), 'month': 1, 'day': 1}))
     df['ccd_nonfiscal_match'] = df['ccd_nonfiscal_match'].astype(bool)
     df['census_fiscal_match'] = df['census_fiscal_match'].astype(bool)
+    return df
 
 
-    # Data Cleaning Notes
-    # Special placeholders in financial data (e.g., -1, -2, -3) are replaced with NaN for accurate analysis.
-    df.replace([-9, -3, -2, -1], np.nan, inplace=True)
+def compact_amounts(values: np.ndarray):
+    """
+    Stores a column of amounts in the smallest type that holds every value exactly: float32, then a
+    nullable Int32 for whole amounts too large for float32, otherwise float64 as it is
+    (long_format.COMPACT_AMOUNT_DTYPES).
+    """
 
-    # Entity Schema Tables
-    # Create entity DataFrame
-    entity_columns = []
-    for index, row in column_mapping_df.iterrows():
-        if row['Table'] in ['entity', 'all'] and row['New Name'] != 'year':
-            if row['New Name'] not in total_columns:
-                entity_columns.append(row['New Name'])
+    compact = values.astype(np.float32)
+    if np.array_equal(compact, values, equal_nan=True):
+        return compact
 
-    entity = df[entity_columns].copy()
+    reported = values[~np.isnan(values)]
+    if np.array_equal(reported, np.round(reported)) and (np.abs(reported) <= np.iinfo(np.int32).max).all():
+        return pd.array(values, dtype='Int32')
+    return values
 
-    # Create annual_stats DataFrame
-    annual_stats_columns = []
-    for index, row in column_mapping_df.iterrows():
-        if row['Table'] in ['annual_stats', 'all']:
-            if row['New Name'] not in total_columns:
-                annual_stats_columns.append(row['New Name'])
 
-    annual_stats = df[annual_stats_columns].copy()
+def replace_sentinels(df: pd.DataFrame, mapping: ColumnMapping) -> tuple:
+    """
+    Data Cleaning Notes.
+    Special placeholders in financial data (-1, -2, -3, -9) are replaced with NaN for accurate analysis.
 
-    if 'year' in annual_stats.columns and annual_stats.columns[-1] != 'year':
-        cols = [col for col in annual_stats.columns if col != 'year']
-        cols.append('year')
-        annual_stats = annual_stats[cols]
+    Only the workbook's NUMERIC columns are searched, as one NumPy block. Which placeholder each replaced
+    value held is kept in a sparse frame, and the amounts are then stored compactly (see compact_amounts()).
 
-    # Expenses & Revenue Schema Tables
-    # melt_df() Function Description:
-    # Converts data from wide to long format for normalization in relational databases and for visualizations.
+    Returns:
+    tuple: (cleaned frame, sentinel codes with census_id, year, column_name and an int8 sentinel).
+    """
 
+    columns = [col for col in mapping.numeric_columns if col in df.columns]
+    values = df[columns].to_numpy(dtype=np.float64)
+    is_sentinel = np.isin(values, SENTINELS)
+    rows, positions = np.nonzero(is_sentinel)
 
-    # Create DataFrames for expenditures, local, state, and federal revenue
-    expenditures = melt_df(df, 'expenses', 'expenditures', column_mapping_df, total_columns)
-    local = melt_df(df, 'revenue', 'local_revenue', column_mapping_df, total_columns)
-    state = melt_df(df, 'revenue', 'state_revenue', column_mapping_df, total_columns)
-    federal = melt_df(df, 'revenue', 'federal_revenue', column_mapping_df, total_columns)
+    sentinels = pd.DataFrame({'census_id': pd.Categorical(df['census_id']).take(rows),
+                              'year': df['year'].to_numpy()[rows],
+                              'column_name': pd.Categorical.from_codes(positions, categories=columns),
+                              'sentinel': values[rows, positions].astype(np.int8)})
 
-    print(f"Data for the 20{i} School Year has been Cleaned and Normalized for the Database")
+    values = np.where(is_sentinel, np.nan, values)
+    amounts = pd.DataFrame({col: compact_amounts(values[:, position]) for position, col in enumerate(columns)},
+                           index=df.index)
+    df = pd.concat([df.drop(columns=columns), amounts], axis=1)[df.columns]
+    return df, sentinels
+
+
+def split_tables(df: pd.DataFrame, mapping: ColumnMapping, drop_empty_measures: bool = False,
+                 titles: TitleRegistry = None, sentinels: pd.DataFrame = None) -> dict:
+    """
+    Splits a cleaned wide frame into the normalized tables.
+
+    entity and annual_stats get float64 amounts and string codes back (see long_format.plain_columns()),
+    and the long tables float64 measures, so every year and chunk writes the same column types.
+
+    Returns:
+    dict: Table name mapped to [schema name, DataFrame], in database insertion order.
+    """
+
+    # Entity Schema Tables
+    # Column lists for each table are precompiled from the mapping workbook by ColumnMappingRegistry.
+    entity = plain_columns(df[mapping.table_columns['entity']])
 
-    census_id_query = 'SELECT census_id FROM entity.entity;'
-    existing_census_ids = pd.read_sql(census_id_query, engine)
+    # Create annual_stats DataFrame ('year' is already ordered last)
+    annual_stats = plain_columns(df[mapping.table_columns['annual_stats']])
 
-    # Convert the existing_census_ids DataFrame to a list for easier checking
-    existing_census_id_list = existing_census_ids['census_id'].tolist()
+    # Expenses & Revenue Schema Tables
+    # wide_to_long() Function Description:
+    # Converts data from wide to long format for normalization in relational databases and for visualizations.
+    # All four tables are built in one pass, with titles and flags stored as categoricals.
 
-    # Iterate through the entity DataFrame and drop rows where the census_id already exists
-    entity = entity[~entity['census_id'].isin(existing_census_id_list)]
+
+    # Create DataFrames for expenditures, local, state, and federal revenue
+    long_tables = wide_to_long(df, mapping.table_columns, drop_empty=drop_empty_measures, titles=titles)
+    expenditures = long_tables['expenditures']
+    local = long_tables['local_revenue']
+    state = long_tables['state_revenue']
+    federal = long_tables['federal_revenue']
 
     # Create Database Mapping
+    # The entity table is listed first so that dependent rows are always inserted after it.
     database_map = {
         'entity': ['entity', entity],
         'annual_stats': ['entity', annual_stats],
@@ -170,16 +205,527 @@ for i in range(10, 21):
         'state_revenue': ['revenue', state],
         'local_revenue': ['revenue', local]
     }
+    if sentinels is not None:
+        sentinel_schema, sentinel_table = SENTINEL_TABLE
+        database_map[sentinel_table] = [sentinel_schema, sentinels]
 
-    populate_new_tables = 'y'
+    return database_map
 
-    if populate_new_tables == 'y':
-        print(f"Inserting data for the 20{i} School Year")
-        
-        # Iterate over the database_map to insert each DataFrame
-        for table_name, [schema_name, df_to_export] in database_map.items():
-            print(table_name)
-            df_to_export.to_sql(table_name, engine, schema=schema_name, if_exists='append', index=False)
-        print(f"Successfully inserted data for the 20{i} School Year")
 
-engine.dispose()
+def clean_frame(df: pd.DataFrame, mapping: ColumnMapping, drop_empty_measures: bool = False,
+                titles: TitleRegistry = None) -> dict:
+    """
+    Cleans and normalizes a raw F-33 frame (a whole year or a chunk of rows).
+
+    Every step works row by row, so cleaning the chunks of a file produces the same rows as
+    cleaning the file at once. The sentinel codes replaced by NaN are returned as one more table
+    (see column_mapping.SENTINEL_TABLE).
+
+    Parameters:
+    df (pd.DataFrame): Raw rows as read from an sdfNN.txt file.
+    mapping (ColumnMapping): Compiled column mapping for the file's survey year.
+    drop_empty_measures (bool): Drop null and zero amounts from the long-format tables.
+    titles (TitleRegistry, optional): Add a title_code column to the long-format tables.
+
+    Returns:
+    dict: Table name mapped to [schema name, DataFrame], in database insertion order.
+    """
+
+    steps = [('rename', lambda df: rename_columns(df, mapping)),
+             ('drop_non_government_entities', drop_non_government_entities),
+             ('drop_total_columns', drop_total_columns),
+             ('cast_column_types', lambda df: cast_column_types(df, mapping))]
+    for name, step in steps:
+        with stage(name, rows_in=len(df)) as measured:
+            df = step(df)
+            measured.rows_out = len(df)
+
+    with stage('replace_sentinels', rows_in=len(df)) as measured:
+        df, sentinels = replace_sentinels(df, mapping)
+        measured.rows_out = len(df)
+        measured.set(sentinels=len(sentinels))
+
+    with stage('split_tables', rows_in=len(df)) as measured:
+        database_map = split_tables(df, mapping, drop_empty_measures, titles, sentinels)
+        measured.rows_out = sum(len(table) for _, table in database_map.values())
+    return database_map
+
+
+def read_raw_file(file_path: str, mapping: ColumnMapping) -> pd.DataFrame:
+    """
+    Reads a whole raw sdfNN.txt file with the mapping's dtypes.
+
+    Codes are then given the types an untyped read infers (see inferred_dtypes()), so the values
+    stored in the database do not change.
+    """
+
+    df = pd.read_csv(file_path, delimiter= '\t', dtype=mapping.read_dtypes)
+    return df.astype(inferred_dtypes(df, mapping.inferred_columns))
+
+
+def clean_and_normalize_year(i: int, mapping: ColumnMapping, drop_empty_measures: bool = False,
+                             titles: TitleRegistry = None) -> dict:
+    """
+    Reads, cleans and normalizes a single year of the F-33 survey.
+
+    This function touches no database state, so it can safely run in a worker process.
+
+    Parameters:
+    i (int): Two-digit survey year (10 for sdf10.txt, 20 for sdf20.txt).
+    mapping (ColumnMapping): Compiled column mapping for the survey year.
+    drop_empty_measures (bool): Drop null and zero amounts from the long-format tables.
+    titles (TitleRegistry, optional): Add a title_code column to the long-format tables.
+
+    Returns:
+    dict: Table name mapped to [schema name, DataFrame], in database insertion order.
+    """
+
+    # Importing the Dataset
+    file_name = f'sdf{i}.txt'
+    file_path = os.path.join(RAW_DATA_DIR, file_name)
+
+    with stage('clean_year', year=i):
+        with stage('read') as measured:
+            df = read_raw_file(file_path, mapping)
+            measured.rows_out = len(df)
+
+        database_map = clean_frame(df, mapping, drop_empty_measures, titles)
+
+    print(f"Data for the 20{i} School Year has been Cleaned and Normalized for the Database")
+
+    return database_map
+
+
+def iter_year_chunks(i: int, mapping: ColumnMapping, chunksize: int, drop_empty_measures: bool = False,
+                     titles: TitleRegistry = None):
+    """
+    Streams one survey year through the cleaning step in row chunks.
+
+    The raw file is read with dtypes taken from the mapping workbook, so only one chunk of
+    raw, cleaned and melted rows is held in memory at a time. The code columns are first read
+    on their own to type them as the whole-file reader does (see inferred_dtypes()), so every
+    chunk writes the same values as clean_and_normalize_year().
+
+    Parameters:
+    i (int): Two-digit survey year.
+    mapping (ColumnMapping): Compiled column mapping for the survey year.
+    chunksize (int): Number of raw rows read per chunk.
+    drop_empty_measures (bool): Drop null and zero amounts from the long-format tables.
+    titles (TitleRegistry, optional): Add a title_code column to the long-format tables.
+
+    Yields:
+    dict: A database_map (see clean_frame()) for each chunk.
+    """
+
+    file_name = f'sdf{i}.txt'
+    file_path = os.path.join(RAW_DATA_DIR, file_name)
+
+    with stage('infer_code_types', year=i):
+        inferred_columns = set(mapping.inferred_columns)
+        codes = pd.read_csv(file_path, delimiter='\t', dtype=str, usecols=lambda name: name in inferred_columns)
+        code_dtypes = inferred_dtypes(codes, mapping.inferred_columns)
+        del codes
+
+    with pd.read_csv(file_path, delimiter='\t', dtype=mapping.read_dtypes, chunksize=chunksize) as reader:
+        for chunk in measure_iter('read', reader, year=i):
+            yield clean_frame(chunk.astype(code_dtypes), mapping, drop_empty_measures, titles)
+
+
+def timed_clean_and_normalize_year(i: int, mapping: ColumnMapping, drop_empty_measures: bool = False,
+                                   titles: TitleRegistry = None) -> tuple:
+    """
+    Runs clean_and_normalize_year() and measures its wall-clock time.
+
+    Parameters:
+    i (int): Two-digit survey year.
+    mapping (ColumnMapping): Compiled column mapping for the survey year.
+    drop_empty_measures (bool): Drop null and zero amounts from the long-format tables.
+    titles (TitleRegistry, optional): Add a title_code column to the long-format tables.
+
+    Returns:
+    tuple: (database_map, seconds spent cleaning and normalizing).
+    """
+
+    start = time.perf_counter()
+    database_map = clean_and_normalize_year(i, mapping, drop_empty_measures, titles)
+    return database_map, time.perf_counter() - start
+
+
+def insert_tables(database_map: dict, engine) -> None:
+    """
+    Appends one database_map to the database.
+
+    Entity rows are merged first, as the COPY loader does (see bulk_loader.insert_new_entities()):
+    only census_ids not yet in entity.entity are inserted, and the existing ones never leave the
+    database. The other tables are then appended in database_map order.
+
+    Parameters:
+    database_map (dict): Output of clean_frame().
+    engine (sqlalchemy.engine.Engine): Database engine to write to.
+    """
+
+    entity = database_map['entity'][1]
+    with stage('insert', rows_in=len(entity), table='entity') as measured:
+        conn = engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            measured.rows_out = insert_new_entities(cur, entity)
+            conn.commit()
+            cur.close()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    # Iterate over the database_map to insert each DataFrame
+    for table_name, [schema_name, df_to_export] in database_map.items():
+        if table_name == 'entity':
+            continue
+        with stage('insert', rows_in=len(df_to_export), table=table_name) as measured:
+            df_to_export.to_sql(table_name, engine, schema=schema_name, if_exists='append', index=False)
+            measured.rows_out = len(df_to_export)
+
+
+def check_replace_loader(loader: str, replacing: bool) -> None:
+    """
+    Replacing a year (incremental loads) happens inside the COPY transaction. With to_sql, a changed
+    year would be appended on top of its old rows, so the combination is refused.
+    """
+
+    if replacing and loader != 'copy':
+        raise ValueError(f"Incremental loads replace years with the COPY loader; loader='{loader}' would append "
+                         f"each changed year on top of its old rows")
+
+
+def insert_year(i: int, database_map: dict, engine, loader: str = 'to_sql',
+                batch_size: int = DEFAULT_BATCH_SIZE, rebuild_indexes: bool = False,
+                replace_hooks: tuple = (None, None)) -> None:
+    """
+    Inserts one cleaned year into the database.
+
+    Parameters:
+    i (int): Two-digit survey year.
+    database_map (dict): Output of clean_and_normalize_year().
+    engine (sqlalchemy.engine.Engine): Database engine to write to.
+    loader (str): 'to_sql' for DataFrame.to_sql, or 'copy' to load the year with COPY in one transaction.
+    batch_size (int): Rows per COPY statement (copy loader only).
+    rebuild_indexes (bool): Drop and rebuild secondary indexes around the load (copy loader only).
+    replace_hooks (tuple): (before_load, after_load) from LoadManifest.replace_year_hooks() (copy loader only).
+    """
+
+    check_replace_loader(loader, replace_hooks != (None, None))
+    print(f"Inserting data for the 20{i} School Year")
+    with stage('insert_year', year=i, loader=loader):
+        if loader == 'copy':
+            before_load, after_load = replace_hooks
+            copy_load(engine, [database_map], batch_size=batch_size, rebuild_indexes=rebuild_indexes,
+                      before_load=before_load, after_load=after_load)
+        else:
+            insert_tables(database_map, engine)
+    print(f"Successfully inserted data for the 20{i} School Year")
+
+
+def stream_year(i: int, mapping: ColumnMapping, chunksize: int, engine=None, loader: str = 'to_sql',
+                batch_size: int = DEFAULT_BATCH_SIZE, rebuild_indexes: bool = False,
+                replace_hooks: tuple = (None, None), drop_empty_measures: bool = False,
+                warehouse: ParquetWarehouse = None, zscores: ZScoreEngine = None, titles: TitleRegistry = None) -> int:
+    """
+    Cleans, normalizes and inserts one survey year chunk by chunk.
+
+    Each chunk is written before the next one is read, so peak memory depends on the chunk size
+    rather than the file size.
+
+    Parameters:
+    i (int): Two-digit survey year.
+    mapping (ColumnMapping): Compiled column mapping for the survey year.
+    chunksize (int): Number of raw rows read per chunk.
+    engine (sqlalchemy.engine.Engine, optional): Database engine. If None, nothing is inserted.
+    loader (str): 'to_sql' or 'copy'. With 'copy' every chunk of the year is committed in one transaction.
+    batch_size (int): Rows per COPY statement (copy loader only).
+    rebuild_indexes (bool): Drop and rebuild secondary indexes around the load (copy loader only).
+    replace_hooks (tuple): (before_load, after_load) from LoadManifest.replace_year_hooks() (copy loader only).
+    drop_empty_measures (bool): Drop null and zero amounts from the long-format tables.
+    titles (TitleRegistry, optional): Add a title_code column to the long-format tables.
+    warehouse (ParquetWarehouse, optional): Also write every chunk to the local Parquet warehouse.
+    zscores (ZScoreEngine, optional): Also compute the year's expenditure z-scores from the chunks.
+
+    Returns:
+    int: Number of chunks processed.
+    """
+
+    check_replace_loader(loader, replace_hooks != (None, None))
+    if engine is not None:
+        print(f"Inserting data for the 20{i} School Year in chunks of {chunksize:,} rows")
+
+    chunk_count = 0
+    year_writer = warehouse.year_writer(i) if warehouse is not None else None
+    zscore_accumulator = zscores.year_accumulator(i) if zscores is not None else None
+
+    def counted_chunks():
+        nonlocal chunk_count
+        for database_map in iter_year_chunks(i, mapping, chunksize, drop_empty_measures, titles):
+            chunk_count += 1
+            if year_writer is not None:
+                year_writer.write(database_map)
+            if zscore_accumulator is not None:
+                zscore_accumulator.write(database_map)
+            yield database_map
+
+    with stage('stream_year', year=i, loader=loader if engine is not None else None) as measured:
+        if engine is not None and loader == 'copy':
+            before_load, after_load = replace_hooks
+            copy_load(engine, counted_chunks(), batch_size=batch_size, rebuild_indexes=rebuild_indexes,
+                      before_load=before_load, after_load=after_load)
+        else:
+            for database_map in counted_chunks():
+                if engine is not None:
+                    insert_tables(database_map, engine)
+
+        if year_writer is not None:
+            year_writer.commit()
+        if zscore_accumulator is not None:
+            zscore_accumulator.commit(engine)
+        measured.set(chunks=chunk_count)
+
+    print(f"Data for the 20{i} School Year has been Cleaned and Normalized for the Database ({chunk_count} chunks)")
+    return chunk_count
+
+
+def run_streaming_ingestion(years=SURVEY_YEARS, chunksize: int = 50_000, engine=None,
+                            registry: ColumnMappingRegistry = None, manifest: LoadManifest = None,
+                            drop_empty_measures: bool = False, warehouse: ParquetWarehouse = None,
+                            zscores: ZScoreEngine = None, titles: TitleRegistry = None, **load_options) -> dict:
+    """
+    Streams each survey year through clean -> split -> melt -> write in row chunks.
+
+    Parameters:
+    years (iterable of int): Two-digit survey years to ingest.
+    chunksize (int): Number of raw rows read per chunk.
+    engine (sqlalchemy.engine.Engine, optional): Database engine. If None, nothing is inserted.
+    registry (ColumnMappingRegistry, optional): Compiled column mappings. Loaded from the cache if None.
+    manifest (LoadManifest, optional): If given, only new or changed years are loaded, each replaced atomically.
+        Needs loader='copy'.
+    drop_empty_measures (bool): Drop null and zero amounts from the long-format tables.
+    titles (TitleRegistry, optional): Add a title_code column to the long-format tables.
+    warehouse (ParquetWarehouse, optional): Also write each year to the local Parquet warehouse.
+    zscores (ZScoreEngine, optional): Also compute each year's expenditure z-scores, written next to the data
+        (expenses.expenditure_zscores, or local files without a database).
+    **load_options: loader, batch_size and rebuild_indexes, passed to stream_year().
+
+    Returns:
+    dict: Survey year mapped to {'total': seconds}.
+    """
+
+    check_replace_loader(load_options.get('loader', 'to_sql'), manifest is not None)
+    registry = registry if registry is not None else ColumnMappingRegistry().load()
+    options = {'drop_empty_measures': drop_empty_measures, 'title_codes': titles is not None}
+    fingerprints = plan_incremental_years(manifest, years, registry, options) if manifest is not None else None
+    years = list(fingerprints) if fingerprints is not None else list(years)
+    timings = {}
+    run_start = time.perf_counter()
+
+    try:
+        for i in years:
+            start = time.perf_counter()
+            if fingerprints is not None:
+                load_options['replace_hooks'] = manifest.replace_year_hooks(i, fingerprints[i])
+            stream_year(i, registry[i], chunksize, engine, drop_empty_measures=drop_empty_measures,
+                        warehouse=warehouse, zscores=zscores, titles=titles, **load_options)
+            if fingerprints is not None:
+                manifest.mark_loaded(i, fingerprints[i])
+            timings[i] = {'total': time.perf_counter() - start}
+            print(f"20{i} School Year: streamed in {timings[i]['total']:.1f}s")
+    finally:
+        # Cached query results of the analysis notebooks no longer match the database
+        if engine is not None and years:
+            bump_data_version()
+
+    print(f"Processed {len(years)} School Years in {time.perf_counter() - run_start:.1f}s (wall clock)")
+    return timings
+
+
+def run_ingestion(years=SURVEY_YEARS, workers: int = 1, engine=None,
+                  registry: ColumnMappingRegistry = None, manifest: LoadManifest = None,
+                  drop_empty_measures: bool = False, warehouse: ParquetWarehouse = None,
+                  zscores: ZScoreEngine = None, titles: TitleRegistry = None, **load_options) -> dict:
+    """
+    Cleans, normalizes and (optionally) inserts each survey year.
+
+    With workers > 1 the per-year cleaning runs in a process pool, while inserts stay in
+    this process and are issued strictly in year order.
+
+    Parameters:
+    years (iterable of int): Two-digit survey years to ingest.
+    workers (int): Number of worker processes. 1 runs everything serially.
+    engine (sqlalchemy.engine.Engine, optional): Database engine. If None, nothing is inserted.
+    registry (ColumnMappingRegistry, optional): Compiled column mappings. Loaded from the cache if None.
+    manifest (LoadManifest, optional): If given, only new or changed years are loaded, each replaced atomically.
+        Needs loader='copy'.
+    drop_empty_measures (bool): Drop null and zero amounts from the long-format tables.
+    titles (TitleRegistry, optional): Add a title_code column to the long-format tables.
+    warehouse (ParquetWarehouse, optional): Also write each year to the local Parquet warehouse.
+    zscores (ZScoreEngine, optional): Also compute each year's expenditure z-scores, written next to the data
+        (expenses.expenditure_zscores, or local files without a database).
+    **load_options: loader, batch_size and rebuild_indexes, passed to insert_year().
+
+    Returns:
+    dict: Survey year mapped to {'clean': seconds, 'insert': seconds, 'total': seconds}.
+    """
+
+    check_replace_loader(load_options.get('loader', 'to_sql'), manifest is not None)
+    registry = registry if registry is not None else ColumnMappingRegistry().load()
+    options = {'drop_empty_measures': drop_empty_measures, 'title_codes': titles is not None}
+    fingerprints = plan_incremental_years(manifest, years, registry, options) if manifest is not None else None
+    years = list(fingerprints) if fingerprints is not None else list(years)
+    timings = {}
+    run_start = time.perf_counter()
+
+    if workers > 1:
+        # Workers record their cleaning stages into the same metrics run
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=configure_worker, initargs=(current().settings,))
+        futures = {i: executor.submit(timed_clean_and_normalize_year, i, registry[i], drop_empty_measures, titles)
+                   for i in years}
+        results = (futures[i].result() for i in years)
+    else:
+        executor = None
+        results = (timed_clean_and_normalize_year(i, registry[i], drop_empty_measures, titles) for i in years)
+
+    try:
+        for i, (database_map, clean_seconds) in zip(years, results):
+            insert_start = time.perf_counter()
+            if warehouse is not None:
+                with stage('write_warehouse', year=i):
+                    warehouse.write_year(i, [database_map])
+            zscore_accumulator = zscores.year_accumulator(i) if zscores is not None else None
+            if zscore_accumulator is not None:
+                zscore_accumulator.write(database_map)
+            if engine is not None:
+                if fingerprints is not None:
+                    load_options['replace_hooks'] = manifest.replace_year_hooks(i, fingerprints[i])
+                insert_year(i, database_map, engine, **load_options)
+                if fingerprints is not None:
+                    manifest.mark_loaded(i, fingerprints[i])
+            if zscore_accumulator is not None:
+                zscore_accumulator.commit(engine)
+            insert_seconds = time.perf_counter() - insert_start
+
+            timings[i] = {'clean': clean_seconds,
+                          'insert': insert_seconds,
+                          'total': clean_seconds + insert_seconds}
+            print(f"20{i} School Year: cleaned in {clean_seconds:.1f}s, inserted in {insert_seconds:.1f}s")
+
+            # Release the year's frames before waiting on the next one
+            del database_map
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        # Cached query results of the analysis notebooks no longer match the database
+        if engine is not None and years:
+            bump_data_version()
+
+    print(f"Processed {len(years)} School Years in {time.perf_counter() - run_start:.1f}s (wall clock)")
+    return timings
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Clean, normalize and load the LEA Finance Survey into PostgreSQL.")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Number of processes used to clean years in parallel (default: 1, serial).")
+    parser.add_argument('--years', type=int, nargs='+', default=list(SURVEY_YEARS),
+                        help="Two-digit survey years to ingest (default: 10 through 20).")
+    parser.add_argument('--no-database', action='store_true',
+                        help="Clean and normalize only; skip all database writes.")
+    parser.add_argument('--chunksize', type=int, default=None,
+                        help="Stream each year in chunks of this many rows to bound memory (runs serially).")
+    parser.add_argument('--loader', choices=LOADERS, default='to_sql',
+                        help="Database write backend: row inserts via to_sql (default) or PostgreSQL COPY.")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows per COPY statement (default: {DEFAULT_BATCH_SIZE:,}).")
+    parser.add_argument('--rebuild-indexes', action='store_true',
+                        help="With --loader copy, drop secondary indexes before each year and rebuild them after.")
+    parser.add_argument('--warehouse', nargs='?', const=WAREHOUSE_PATH, default=None,
+                        help=f"Also write the normalized tables to a partitioned Parquet warehouse "
+                             f"(default location: {WAREHOUSE_PATH}). Combine with --no-database to skip PostgreSQL.")
+    parser.add_argument('--zscores', nargs='?', const=ZSCORE_PATH, default=None,
+                        help=f"Compute expenditure z-scores per state, title and year while loading and store the "
+                             f"partition statistics under the given directory (default: {ZSCORE_PATH}). Scores go to "
+                             f"expenses.expenditure_zscores, or to files there with --no-database.")
+    parser.add_argument('--apply-schema', action='store_true',
+                        help="Before loading, create or migrate to year-partitioned, indexed tables (see schema_manager.py).")
+    parser.add_argument('--refresh-zscores', action='store_true',
+                        help="After loading, refresh expenses.expenditure_zscores_by_state_year, concurrently when "
+                             "the view has its unique index.")
+    parser.add_argument('--drop-empty-measures', action='store_true',
+                        help="Leave null and zero amounts out of the expenditure and revenue tables.")
+    parser.add_argument('--incremental', action='store_true',
+                        help="Skip years whose raw file and mapping sheet are unchanged since their last load, "
+                             "and atomically replace the rest (uses the COPY loader).")
+    parser.add_argument('--metrics', nargs='?', const=METRICS_PATH, default=None,
+                        help=f"Append wall time, CPU time, memory and rows in/out of every stage as JSON lines "
+                             f"(default file: {METRICS_PATH}). Summarize with instrumentation.py.")
+    parser.add_argument('--trace-memory', action='store_true',
+                        help="With --metrics, also record the tracemalloc peak of each stage (slower).")
+    parser.add_argument('--profile-stage', default=None,
+                        help="Run every occurrence of this stage (e.g. replace_sentinels) under cProfile and write "
+                             "the statistics next to the metrics file.")
+    args = parser.parse_args(argv)
+
+    if args.incremental and args.no_database:
+        parser.error("--incremental needs the database manifest and cannot be combined with --no-database.")
+    if (args.apply_schema or args.refresh_zscores) and args.no_database:
+        parser.error("--apply-schema and --refresh-zscores need the database and cannot be combined with --no-database.")
+    if args.incremental:
+        args.loader = 'copy'
+    if args.chunksize is not None and args.workers > 1:
+        parser.error("--chunksize streams years serially and cannot be combined with --workers.")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    if args.metrics or args.profile_stage:
+        configure(path=args.metrics, trace_memory=args.trace_memory, profile_stage=args.profile_stage)
+
+    # Database Initialization with Mapped Data
+    engine = None if args.no_database else create_database_engine()
+
+    load_options = {'loader': args.loader,
+                    'batch_size': args.batch_size,
+                    'rebuild_indexes': args.rebuild_indexes}
+    manifest = LoadManifest(engine, RAW_DATA_DIR) if args.incremental else None
+    warehouse = ParquetWarehouse(args.warehouse) if args.warehouse else None
+    zscores = ZScoreEngine(args.zscores) if args.zscores else None
+
+    try:
+        if args.apply_schema:
+            apply_schema(engine)
+        elif engine is not None:
+            ensure_sentinel_table(engine)
+        # Title codes are written once the schema has the title dimension (see schema_manager.py)
+        titles = load_title_registry(engine) if engine is not None else None
+
+        if args.chunksize is not None:
+            run_streaming_ingestion(args.years, chunksize=args.chunksize, engine=engine, manifest=manifest,
+                                    drop_empty_measures=args.drop_empty_measures, warehouse=warehouse, zscores=zscores,
+                                    titles=titles, **load_options)
+        else:
+            run_ingestion(args.years, workers=args.workers, engine=engine, manifest=manifest,
+                          drop_empty_measures=args.drop_empty_measures, warehouse=warehouse, zscores=zscores,
+                          titles=titles, **load_options)
+
+        # Once per run rather than per year: a refresh recomputes every year of the view
+        if args.refresh_zscores:
+            concurrently = refresh_zscore_view(engine)
+            print(f"Refreshed the z-score view {'concurrently' if concurrently else 'with an exclusive lock'}")
+    finally:
+        if engine is not None:
+            engine.dispose()
+        current().close()
+        if args.metrics:
+            print(f"Stage metrics of run {current().run_id} appended to {args.metrics}")
+
+
+if __name__ == '__main__':
+    main()
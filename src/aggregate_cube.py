@@ -0,0 +1,300 @@
+import numpy as np
+import pandas as pd
+from enum import Enum
+from typing import Iterable, List, Optional, Union
+from region import Region
+from expenditures import Expenditures
+
+
+# Geography levels of the cube, from finest to coarsest
+LEVELS = ('state', 'region', 'national')
+
+MEASURES = ('amount', 'count', 'student_count', 'cost_per_student', 'yearly_difference', 'growth_rate')
+
+Label = Optional[Union[str, Enum]]
+
+
+def label_value(label: Label):
+    """
+    Returns the plain value of an enum member (e.g. Region.SOUTH -> 'South'), or the label unchanged.
+    """
+
+    return label.value if isinstance(label, Enum) else label
+
+
+class AggregateCube:
+    """
+    Precomputed expenditure aggregates over year x geography x expenditure_title.
+
+    Built once from the expenditure frame (state, region, expenditure_title, year, amount) and, optionally,
+    the student count frame (state, region, year, student_count). Sums and row counts are stored in dense
+    NumPy arrays for every state, every region and the nation, per expenditure title and over all titles.
+    Per-student costs, yearly differences and growth rates are derived once from those arrays, so each
+    lookup is a few index lookups instead of a boolean mask over the full frame.
+
+    Regions and titles always include every Region and Expenditures member, so enum lookups never fail;
+    combinations without source rows are NaN.
+
+    Attributes:
+    years (np.ndarray): Sorted years of the year axis.
+    states (pd.Index): States of the state axis.
+    regions (pd.Index): Regions of the region axis.
+    titles (pd.Index): Expenditure titles of the title axis.
+    """
+
+    def __init__(self, expenditures: pd.DataFrame, student_counts: Optional[pd.DataFrame] = None,
+                 amount_column: str = 'amount', student_count_column: str = 'student_count'):
+        frames = [expenditures] + ([student_counts] if student_counts is not None else [])
+
+        self.years = np.sort(pd.unique(np.concatenate([frame['year'].dropna().astype(int).to_numpy() for frame in frames])))
+        self.states = pd.Index(sorted(pd.unique(np.concatenate([frame['state'].dropna().astype(str).to_numpy()
+                                                                for frame in frames]))))
+        self.regions = pd.Index(self._with_members(Region, *[frame['region'] for frame in frames if 'region' in frame]))
+        self.titles = pd.Index(self._with_members(Expenditures, expenditures['expenditure_title']))
+        self._year_index = pd.Index(self.years)
+
+        # Region of every state; -1 for states without one, which then only count towards the nation
+        state_region = np.full(len(self.states), -1)
+        for frame in frames:
+            if 'region' in frame:
+                pairs = frame[['state', 'region']].dropna().drop_duplicates()
+                state_region[self.states.get_indexer(pairs['state'].astype(str))] = self.regions.get_indexer(pairs['region'])
+        self.state_region = state_region
+
+        # Sums and row counts per (year, state, title) with the last title slot holding all titles
+        n_years, n_states, n_titles = len(self.years), len(self.states), len(self.titles)
+        shape = (n_years, n_states, n_titles + 1)
+        year_codes, state_codes = self._axis_codes(expenditures)
+        title_codes = self.titles.get_indexer(expenditures['expenditure_title'])
+        amounts = expenditures[amount_column].astype('float64').to_numpy()
+        # Rows with a null year, state or title have no cell and are left out
+        present = ~np.isnan(amounts) & (year_codes >= 0) & (state_codes >= 0) & (title_codes >= 0)
+
+        flat = np.ravel_multi_index((year_codes[present], state_codes[present], title_codes[present]), shape)
+        amount = np.bincount(flat, weights=amounts[present], minlength=np.prod(shape)).reshape(shape)
+        count = np.bincount(flat, minlength=np.prod(shape)).reshape(shape).astype('float64')
+        amount[:, :, n_titles] = amount[:, :, :n_titles].sum(axis=2)
+        count[:, :, n_titles] = count[:, :, :n_titles].sum(axis=2)
+
+        students = np.full((n_years, n_states), np.nan)
+        if student_counts is not None:
+            students = np.zeros((n_years, n_states))
+            student_rows = np.zeros((n_years, n_states))
+            year_codes, state_codes = self._axis_codes(student_counts)
+            valid = (year_codes >= 0) & (state_codes >= 0)
+            counts = student_counts[student_count_column].astype('float64').fillna(0).to_numpy()
+            np.add.at(students, (year_codes[valid], state_codes[valid]), counts[valid])
+            np.add.at(student_rows, (year_codes[valid], state_codes[valid]), 1)
+            students[student_rows == 0] = np.nan
+
+        self._arrays = {}
+        self._store('state', amount, count, students)
+        self._store('region', *self._roll_up_regions(amount, count, students))
+        self._store('national', amount.sum(axis=1, keepdims=True), count.sum(axis=1, keepdims=True),
+                    np.nansum(students, axis=1, keepdims=True) if student_counts is not None else students[:, :1])
+
+
+    def _axis_codes(self, frame: pd.DataFrame) -> tuple:
+        """
+        Year and state positions of every row of a frame; -1 where the year or state is null.
+        """
+
+        valid = (frame['year'].notna() & frame['state'].notna()).to_numpy()
+        year_codes = np.full(len(frame), -1)
+        state_codes = np.full(len(frame), -1)
+        year_codes[valid] = self._year_index.get_indexer(frame['year'][valid].astype(int))
+        state_codes[valid] = self.states.get_indexer(frame['state'][valid].astype(str))
+        return year_codes, state_codes
+
+
+    @staticmethod
+    def _with_members(enum: type, *columns: pd.Series) -> List[str]:
+        members = [member.value for member in enum]
+        found = set()
+        for column in columns:
+            found.update(column.dropna().unique())
+        return members + sorted(found - set(members))
+
+
+    def _roll_up_regions(self, amount: np.ndarray, count: np.ndarray, students: np.ndarray) -> tuple:
+        has_region = self.state_region >= 0
+        region_codes = self.state_region[has_region]
+        region_shape = (amount.shape[0], len(self.regions))
+
+        region_amount = np.zeros(region_shape + amount.shape[2:])
+        region_count = np.zeros(region_shape + amount.shape[2:])
+        region_students = np.zeros(region_shape)
+        np.add.at(region_amount, (slice(None), region_codes), amount[:, has_region])
+        np.add.at(region_count, (slice(None), region_codes), count[:, has_region])
+        np.add.at(region_students, (slice(None), region_codes), np.nan_to_num(students[:, has_region]))
+
+        # Regions without any student rows stay unknown rather than zero
+        region_student_rows = np.zeros(region_shape)
+        np.add.at(region_student_rows, (slice(None), region_codes), ~np.isnan(students[:, has_region]))
+        region_students[region_student_rows == 0] = np.nan
+        return region_amount, region_count, region_students
+
+
+    def _store(self, level: str, amount: np.ndarray, count: np.ndarray, students: np.ndarray) -> None:
+        # Combinations without source rows have no amount rather than an amount of zero
+        amount = np.where(count > 0, amount, np.nan)
+        students = students[:, :, None]
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            previous = np.concatenate([np.full((1,) + amount.shape[1:], np.nan), amount[:-1]])
+            yearly_difference = amount - previous
+            growth_rate = np.where(previous != 0, yearly_difference / previous * 100, np.nan)
+            cost_per_student = np.where(students > 0, amount / students, np.nan)
+
+        self._arrays[level] = {'amount': amount,
+                               'count': count,
+                               'student_count': np.broadcast_to(students, amount.shape),
+                               'cost_per_student': cost_per_student,
+                               'yearly_difference': yearly_difference,
+                               'growth_rate': growth_rate}
+
+
+    ############################## Lookups ##############################
+
+    def _geography(self, state: Label, region: Label) -> tuple:
+        state, region = label_value(state), label_value(region)
+        if state is not None:
+            return 'state', self.states.get_loc(state)
+        if region is not None:
+            return 'region', self.regions.get_loc(region)
+        return 'national', 0
+
+
+    def _title(self, expenditure_title: Label) -> int:
+        expenditure_title = label_value(expenditure_title)
+        return len(self.titles) if expenditure_title is None else self.titles.get_loc(expenditure_title)
+
+
+    def _measure(self, level: str, measure: str) -> np.ndarray:
+        if measure not in MEASURES:
+            raise ValueError(f"Unknown measure '{measure}'. Expected one of {MEASURES}")
+        return self._arrays[level][measure]
+
+
+    def value(self, measure: str, year: int, state: Label = None, region: Label = None,
+              expenditure_title: Label = None) -> float:
+        """
+        Returns one aggregate. Omitted dimensions are rolled up (no state/region: national; no title: all titles).
+
+        Parameters:
+        measure (str): One of MEASURES.
+        year (int): Year to look up.
+        state (str, optional): State name. Takes precedence over region.
+        region (str or Region, optional): Region name or member.
+        expenditure_title (str or Expenditures, optional): Expenditure title or member.
+
+        Returns:
+        float: The aggregate, NaN if no source rows fall into the combination.
+        """
+
+        level, geography = self._geography(state, region)
+        return float(self._measure(level, measure)[self._year_index.get_loc(int(year)), geography,
+                                                   self._title(expenditure_title)])
+
+
+    def series(self, measure: str, start_year: Optional[int] = None, end_year: Optional[int] = None,
+               state: Label = None, region: Label = None, expenditure_title: Label = None) -> pd.Series:
+        """
+        Returns an aggregate for every year of an inclusive year range, as a Series indexed by year.
+        """
+
+        level, geography = self._geography(state, region)
+        start = 0 if start_year is None else np.searchsorted(self.years, int(start_year), side='left')
+        stop = len(self.years) if end_year is None else np.searchsorted(self.years, int(end_year), side='right')
+        values = self._measure(level, measure)[start:stop, geography, self._title(expenditure_title)]
+        return pd.Series(values, index=pd.Index(self.years[start:stop], name='year'), name=measure)
+
+
+    def mean_growth_rate(self, start_year: int, end_year: int, state: Label = None, region: Label = None,
+                         expenditure_title: Label = None, measure: str = 'amount') -> float:
+        """
+        Mean of the yearly growth rates (in percent) within an inclusive year range, skipping missing years.
+
+        Matches Utilities.calculate_mean_growth_rate() on a frame whose growth_rate column is the
+        year-over-year pct_change() * 100 of the same aggregate.
+
+        Parameters:
+        measure (str): 'amount' or 'cost_per_student', the aggregate whose growth is averaged.
+        """
+
+        if measure == 'amount':
+            growth = self.series('growth_rate', start_year, end_year, state, region, expenditure_title)
+        else:
+            values = self.series(measure, state=state, region=region, expenditure_title=expenditure_title)
+            growth = values.pct_change(fill_method=None).loc[int(start_year):int(end_year)] * 100
+        return float(growth.mean())
+
+
+    def lookup(self, measure: str, queries: Union[pd.DataFrame, Iterable[dict]]) -> np.ndarray:
+        """
+        Answers many point lookups in one vectorized call.
+
+        Parameters:
+        measure (str): One of MEASURES.
+        queries (pd.DataFrame or iterable of dict): One lookup per row with a 'year' and optional
+            'state', 'region' and 'expenditure_title'. Missing or null values are rolled up.
+
+        Returns:
+        np.ndarray: One value per query, in query order.
+        """
+
+        queries = queries if isinstance(queries, pd.DataFrame) else pd.DataFrame(list(queries))
+        queries = queries.reindex(columns=['year', 'state', 'region', 'expenditure_title'])
+        for col in ['state', 'region', 'expenditure_title']:
+            queries[col] = queries[col].map(label_value)
+
+        year_codes = self._year_index.get_indexer(queries['year'].astype(int))
+        titles = queries['expenditure_title']
+        title_codes = np.where(titles.isna(), len(self.titles), self.titles.get_indexer(titles))
+        if (year_codes < 0).any() or (title_codes < 0).any():
+            raise KeyError("Some queries use a year or expenditure title that is not in the cube")
+
+        results = np.full(len(queries), np.nan)
+        is_state = queries['state'].notna().to_numpy()
+        is_region = ~is_state & queries['region'].notna().to_numpy()
+        is_national = ~is_state & ~is_region
+
+        for level, rows, codes in (('state', is_state, self.states.get_indexer(queries.loc[is_state, 'state'])),
+                                   ('region', is_region, self.regions.get_indexer(queries.loc[is_region, 'region'])),
+                                   ('national', is_national, np.zeros(is_national.sum(), dtype=int))):
+            if (codes < 0).any():
+                raise KeyError(f"Some queries use a {level} that is not in the cube")
+            results[rows] = self._measure(level, measure)[year_codes[rows], codes, title_codes[rows]]
+
+        return results
+
+
+    def to_frame(self, level: str = 'national', measures: Iterable[str] = MEASURES,
+                 by_title: bool = True) -> pd.DataFrame:
+        """
+        Returns a level of the cube as a long DataFrame, e.g. to plot it.
+
+        Parameters:
+        level (str): 'state', 'region' or 'national'.
+        measures (iterable of str): Measures to include as columns.
+        by_title (bool): One row per expenditure title if True, otherwise one row over all titles.
+
+        Returns:
+        pd.DataFrame: One row per year, geography and (optionally) title with at least one source row.
+        """
+
+        geographies = {'state': self.states, 'region': self.regions, 'national': pd.Index(['national'])}[level]
+        titles = list(self.titles) if by_title else [None]
+        title_slice = slice(0, len(self.titles)) if by_title else slice(len(self.titles), None)
+
+        year_codes, geography_codes, title_codes = np.indices((len(self.years), len(geographies), len(titles)))
+        frame = pd.DataFrame({'year': self.years[year_codes.ravel()]})
+        if level != 'national':
+            frame[level] = geographies[geography_codes.ravel()]
+        if by_title:
+            frame['expenditure_title'] = self.titles[title_codes.ravel()]
+        for measure in measures:
+            frame[measure] = self._measure(level, measure)[:, :, title_slice].ravel()
+
+        keep = self._arrays[level]['count'][:, :, title_slice].ravel() > 0
+        return frame[keep].reset_index(drop=True)
@@ -0,0 +1,274 @@
+import os
+import re
+from enum import Enum
+from datetime import datetime
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from region import Region, STATE_REGIONS
+from expenditures import CATEGORY_RULES, TitleCategory
+from long_format import LONG_TABLES
+
+
+# Directory of the CSV exports read when the database is unavailable (as in the notebooks)
+CSV_EXPORT_PATH = ".."
+
+# Aggregations the database and the local scan compute alike, mapped to their SQL function
+AGGREGATIONS = {'sum': 'SUM', 'mean': 'AVG', 'count': 'COUNT', 'min': 'MIN', 'max': 'MAX'}
+
+# Dimensions of every measure, taken from entity.entity (joined AS e); 'year' and 'region' are added per source
+ENTITY_DIMENSIONS = {'census_id': 'e.census_id', 'state': 'e.state', 'lea_name': 'e.lea_name'}
+
+# Region of each state as an SQL expression, since the database stores states only
+REGION_SQL = ("CASE e.state " + ' '.join(f"WHEN '{state}' THEN '{region.value}'" for state, region in STATE_REGIONS.items())
+              + " END")
+
+
+@dataclass(frozen=True)
+class MeasureSource:
+    """
+    Where a measure lives: the database tables it is aggregated from and the CSV export used without a database.
+
+    Attributes:
+    from_clause (str): SQL FROM clause; the measure's table is aliased m and entity.entity e.
+    expression (str): SQL expression aggregated, e.g. 'm.amount'.
+    dimensions (dict): Dimensions besides the entity ones, 'year' and 'region', mapped to their SQL expression.
+    title_table (str, optional): Long table whose titles the title dimension holds, for TitleCategory filters.
+    csv_file (str, optional): CSV export with the measure and some dimensions as columns, already summed per row.
+    """
+
+    from_clause: str
+    expression: str
+    dimensions: Dict[str, str] = field(default_factory=dict)
+    title_table: Optional[str] = None
+    csv_file: Optional[str] = None
+
+
+    @property
+    def title_dimension(self) -> Optional[str]:
+        return LONG_TABLES[self.title_table][1] if self.title_table else None
+
+
+    def dimension_sql(self, name: str) -> str:
+        if name == 'year':
+            return "DATE_PART('year', m.year)::int"
+        if name == 'region':
+            return REGION_SQL
+        return {**ENTITY_DIMENSIONS, **self.dimensions}[name]
+
+
+    @property
+    def dimension_names(self) -> List[str]:
+        return list(ENTITY_DIMENSIONS) + ['region', 'year'] + list(self.dimensions)
+
+
+def long_table_source(table: str, csv_file: Optional[str] = None) -> MeasureSource:
+    """
+    Source of the measure column of a long table (see long_format.LONG_TABLES), with its title as a dimension.
+    """
+
+    schema, title_column, measure_column = LONG_TABLES[table]
+    return MeasureSource(f"{schema}.{table} AS m INNER JOIN entity.entity AS e ON e.census_id = m.census_id",
+                         f"m.{measure_column}", {title_column: f"m.{title_column}"}, table, csv_file)
+
+
+# Measures aggregate() answers, by the name of the result column
+MEASURES = {
+    'amount': long_table_source('expenditures', 'tech_vocational_expenditures_2010_to_2020.csv'),
+    'federal_revenue': long_table_source('federal_revenue'),
+    'state_revenue': long_table_source('state_revenue'),
+    'local_revenue': long_table_source('local_revenue'),
+    'student_count': MeasureSource("entity.annual_stats AS m INNER JOIN entity.entity AS e ON e.census_id = m.census_id",
+                                   "m.fall_membership", csv_file='student_counts_by_state.csv')
+}
+
+
+def filter_values(value) -> list:
+    """
+    Values a filter selects: a single value, or every value of a list, tuple, set or range.
+    """
+
+    if isinstance(value, (str, Enum)) or not hasattr(value, '__iter__'):
+        return [value]
+    return list(value)
+
+
+@dataclass
+class AggregatePlan:
+    """
+    One aggregate of a measure by some dimensions, compiled either to an SQL GROUP BY or to a pandas scan.
+
+    Filters map a dimension to a value or a list of values. The title dimension also accepts TitleCategory
+    members and 'region' accepts Region members; a region filter selects the region's states.
+
+    Attributes:
+    measure (str): Measure aggregated (see MEASURES).
+    by (List[str]): Dimensions of the result, e.g. ['region', 'year'].
+    filters (dict): Dimension mapped to the values kept, e.g. {'year': [2014, 2015, 2016]}.
+    agg (str): Aggregation (see AGGREGATIONS).
+    """
+
+    measure: str
+    by: List[str] = field(default_factory=list)
+    filters: Dict[str, object] = field(default_factory=dict)
+    agg: str = 'sum'
+
+
+    def __post_init__(self):
+        if self.measure not in MEASURES:
+            raise ValueError(f"Unknown measure '{self.measure}'. Expected one of {list(MEASURES)}")
+        if self.agg not in AGGREGATIONS:
+            raise ValueError(f"Unknown aggregation '{self.agg}'. Expected one of {list(AGGREGATIONS)}")
+        unknown = [name for name in list(self.by) + list(self.filters) if name not in self.source.dimension_names]
+        if unknown:
+            raise ValueError(f"Measure '{self.measure}' has no dimension {unknown}. Expected some of {self.source.dimension_names}")
+        self.by = list(self.by)
+
+
+    @property
+    def source(self) -> MeasureSource:
+        return MEASURES[self.measure]
+
+
+    @property
+    def dimensions(self) -> List[str]:
+        """
+        Dimensions the plan reads: the grouping dimensions, then the filtered ones.
+        """
+
+        return self.by + [name for name in self.filters if name not in self.by]
+
+
+    def _selection(self, name: str) -> Tuple[list, Optional[str]]:
+        """
+        Splits a filter into the plain values it selects and a regular expression of its title categories.
+        """
+
+        values, categories = [], []
+        for value in filter_values(self.filters[name]):
+            if isinstance(value, TitleCategory):
+                categories.append(value)
+            else:
+                values.append(value.value if isinstance(value, Enum) else value)
+
+        if not categories:
+            return values, None
+        if name != self.source.title_dimension:
+            raise ValueError(f"Title categories can only filter the title dimension of '{self.measure}'")
+
+        # Rules of other long tables never match this measure's titles
+        patterns = [f"({CATEGORY_RULES[category][1].pattern})" for category in categories
+                    if CATEGORY_RULES[category][0] in (None, self.source.title_table)]
+        return values, '|'.join(patterns) or None
+
+
+    ############################## SQL ##############################
+    def to_sql(self) -> Tuple[str, dict]:
+        """
+        Compiles the plan to one parameterized GROUP BY query, so only the aggregated rows leave the database.
+
+        Years are filtered on the year column itself, so partitions of other years are pruned.
+
+        Returns:
+        tuple: (query, parameters for the driver).
+        """
+
+        source = self.source
+        columns = [f"{source.dimension_sql(name)} AS {name}" for name in self.by]
+        columns.append(f"{AGGREGATIONS[self.agg]}({source.expression}) AS {self.measure}")
+
+        conditions, params = [], {}
+        for position, name in enumerate(self.filters):
+            values, pattern = self._selection(name)
+            if name == 'year':
+                column, values = 'm.year', [datetime(int(year), 1, 1) for year in values]
+            elif name == 'region':
+                column, values = 'e.state', [state for state, region in STATE_REGIONS.items() if region.value in values]
+            else:
+                column = source.dimension_sql(name)
+
+            selected = []
+            if values:
+                params[f'filter_{position}'] = values
+                selected.append(f"{column} = ANY(%(filter_{position})s)")
+            if pattern is not None:
+                params[f'pattern_{position}'] = pattern
+                selected.append(f"{column} ~ %(pattern_{position})s")
+            conditions.append(f"({' OR '.join(selected) or 'FALSE'})")
+
+        query = f"SELECT {', '.join(columns)}\nFROM {source.from_clause}"
+        if conditions:
+            query += f"\nWHERE {' AND '.join(conditions)}"
+        if self.by:
+            positions = ', '.join(str(position) for position in range(1, len(self.by) + 1))
+            query += f"\nGROUP BY {positions}\nORDER BY {positions}"
+        return query + ';', params
+
+
+    ############################## Local Scan ##############################
+    def scan(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Runs the plan over a frame holding the measure and the plan's dimensions as columns.
+
+        A missing 'region' column is derived from 'state', and datetime years are reduced to their year.
+
+        Returns:
+        pd.DataFrame: The same columns and rows the SQL query returns.
+        """
+
+        columns = {}
+        for name in self.dimensions:
+            if name == 'region' and 'region' not in df.columns:
+                columns[name] = df['state'].map({state: region.value for state, region in STATE_REGIONS.items()})
+            elif name == 'year' and pd.api.types.is_datetime64_any_dtype(df['year']):
+                columns[name] = df['year'].dt.year
+            else:
+                columns[name] = df[name]
+
+        mask = np.ones(len(df), dtype=bool)
+        for name in self.filters:
+            values, pattern = self._selection(name)
+            column = columns[name]
+            if pattern is not None:
+                # Titles are few, so the categories are matched once per distinct title
+                regex = re.compile(pattern)
+                values = values + [title for title in pd.unique(column.dropna().astype(str)) if regex.search(title)]
+            mask &= column.isin(values).to_numpy()
+
+        frame = pd.DataFrame({name: columns[name] for name in self.by}, index=df.index)[mask]
+        frame[self.measure] = df[self.measure][mask]
+        if not self.by:
+            return pd.DataFrame({self.measure: [frame[self.measure].agg(self.agg)]})
+        return frame.groupby(self.by, sort=True, observed=True)[self.measure].agg(self.agg).reset_index()
+
+
+    def scan_csv(self, directory: str = CSV_EXPORT_PATH) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+        """
+        Runs the plan over the measure's CSV export, reading only the columns it needs.
+
+        Exports hold rows already summed per state, year and title, so only sums over their dimensions can be
+        answered, and only for the rows the export contains.
+
+        Returns:
+        tuple: (result, or None if the export cannot answer the plan; the path of the export).
+        """
+
+        if self.source.csv_file is None:
+            print(f"Measure '{self.measure}' has no CSV export")
+            return None, None
+        path = os.path.join(directory, self.source.csv_file)
+        if not os.path.exists(path):
+            print(f"CSV export {path} not found")
+            return None, path
+
+        available = set(pd.read_csv(path, nrows=0).columns)
+        derived = {'state'} if 'region' in self.dimensions and 'region' not in available else set()
+        missing = sorted((set(self.dimensions) | derived | {self.measure}) - available)
+        if missing or self.agg != 'sum':
+            print(f"CSV export {path} cannot answer the {self.agg} of '{self.measure}' by {self.dimensions}: "
+                  f"{f'it has no {missing}' if missing else 'its rows are already sums'}")
+            return None, path
+
+        usecols = [col for col in available if col in set(self.dimensions) | derived | {self.measure}]
+        return self.scan(pd.read_csv(path, usecols=usecols)), path
@@ -0,0 +1,427 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import platform
+import argparse
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Callable, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine
+from column_mapping import ColumnMappingRegistry
+from long_format import melt_df, verify_wide_to_long, LONG_TABLES
+from synthetic_data import SyntheticSurvey, write_survey, SYNTHETIC_PATH
+
+
+BASELINE_PATH = os.path.join("..", "benchmarks", "baseline.json")
+
+# Bump whenever stages are added, removed or measured differently, so old baselines are not compared
+BASELINE_FORMAT_VERSION = 3
+
+# A stage is reported as a regression when it is this much slower (or larger) than the baseline
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_SECONDS = 0.01
+
+DATABASES = ('sqlite', 'postgres', 'none')
+
+# Layers of Utilities whose cold import is timed, from the lightest to the whole class
+IMPORT_MODULES = ['utilities_core', 'utilities_db', 'utilities_charts', 'utilities']
+
+# Run by a fresh interpreter: seconds taken by one import and the number of modules it loaded
+IMPORT_TIMER = ("import sys, time, json; loaded = len(sys.modules); start = time.perf_counter(); import {module}; "
+                "print(json.dumps({{'seconds': time.perf_counter() - start, 'modules': len(sys.modules) - loaded}}))")
+
+
+############################## Measure ##############################
+
+def frame_rows(result) -> int:
+    """
+    Rows of a stage's output: a frame, a database_map, a dict of frames or a tuple of frames.
+    """
+
+    if isinstance(result, pd.DataFrame):
+        return len(result)
+    if isinstance(result, dict):
+        return sum(frame_rows(value[1] if isinstance(value, list) else value) for value in result.values())
+    if isinstance(result, tuple):
+        return sum(frame_rows(value) for value in result)
+    return 0
+
+
+def frame_megabytes(result) -> float:
+    if isinstance(result, pd.DataFrame):
+        return result.memory_usage(deep=True).sum() / 1e6
+    if isinstance(result, dict):
+        return sum(frame_megabytes(value[1] if isinstance(value, list) else value) for value in result.values())
+    if isinstance(result, tuple):
+        return sum(frame_megabytes(value) for value in result)
+    return 0.0
+
+
+def measure_stage(name: str, func: Callable, make_input: Callable = lambda: None, repeats: int = 3,
+                  rows_in: int = 0, **labels) -> tuple:
+    """
+    Times a stage and profiles its memory.
+
+    The stage runs repeats times for timing and once more under tracemalloc for its peak allocation,
+    each time on a fresh input from make_input(), so in-place stages never see their own output.
+
+    Parameters:
+    name (str): Stage name.
+    func (callable): func(input) -> output.
+    make_input (callable): Returns a fresh input; not timed.
+    repeats (int): Timed runs; the fastest is reported.
+    rows_in (int): Rows going into the stage.
+    labels: Extra columns of the result row, e.g. year=20.
+
+    Returns:
+    tuple: (result row, the stage's output).
+    """
+
+    timings = []
+    for _ in range(repeats):
+        stage_input = make_input()
+        start = time.perf_counter()
+        output = func(stage_input)
+        timings.append(time.perf_counter() - start)
+
+    stage_input = make_input()
+    tracemalloc.start()
+    try:
+        output = func(stage_input)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    row = {'stage': name, **labels,
+           'seconds': min(timings),
+           'median_seconds': float(np.median(timings)),
+           'peak_mb': peak / 1e6,
+           'output_mb': frame_megabytes(output),
+           'rows_in': rows_in,
+           'rows_out': frame_rows(output)}
+    return row, output
+
+
+############################## Stages ##############################
+
+def import_stages(modules: List[str] = IMPORT_MODULES, repeats: int = 3) -> List[dict]:
+    """
+    Times the cold import of each module in a fresh interpreter, the start-up cost of a script or worker using it.
+
+    Returns:
+    List[dict]: One row per module, named 'import_<module>', with the number of modules the import loaded.
+    """
+
+    source_dir = os.path.dirname(os.path.abspath(__file__))
+    rows = []
+    for module in modules:
+        runs = []
+        for _ in range(repeats):
+            completed = subprocess.run([sys.executable, '-c', IMPORT_TIMER.format(module=module)], cwd=source_dir,
+                                       capture_output=True, text=True, check=True)
+            runs.append(json.loads(completed.stdout.splitlines()[-1]))
+
+        timings = [run['seconds'] for run in runs]
+        # Memory of an import is not profiled; peak_mb stays empty so it is never reported as a regression
+        rows.append({'stage': f'import_{module}',
+                     'seconds': min(timings),
+                     'median_seconds': float(np.median(timings)),
+                     'peak_mb': np.nan,
+                     'output_mb': 0.0,
+                     'rows_in': 0,
+                     'rows_out': 0,
+                     'modules': runs[0]['modules']})
+    return rows
+
+
+def pipeline_stages(raw_path: str, mapping, repeats: int = 3, **labels) -> tuple:
+    """
+    Benchmarks the cleaning script's stages on one raw file, each stage on the previous stage's output,
+    and checks that wide_to_long() matches melt_df() on the cleaned frame.
+
+    Returns:
+    tuple: (result rows, the year's database_map).
+    """
+
+    # Imported here because the cleaning script pulls in the database stack
+    from LEA_Finance_Data_Cleaning_and_Automation_Script import (read_raw_file, rename_columns,
+                                                                 drop_non_government_entities, drop_total_columns, cast_column_types,
+                                                                 replace_sentinels, split_tables)
+    results = []
+
+    # Untyped reading, as the script did before the mapping's dtype plan, kept for comparison
+    row, _ = measure_stage('read', lambda _: pd.read_csv(raw_path, delimiter='\t'), repeats=repeats, **labels)
+    results.append(row)
+    row, raw = measure_stage('read_typed', lambda _: read_raw_file(raw_path, mapping), repeats=repeats, **labels)
+    results.append(row)
+
+    steps = [('rename', lambda df: rename_columns(df, mapping)),
+             ('filter_and_cast', lambda df: cast_column_types(drop_total_columns(drop_non_government_entities(df)), mapping))]
+    frame = raw
+    for name, step in steps:
+        row, frame = measure_stage(name, step, lambda: frame.copy(), repeats, len(frame), **labels)
+        results.append(row)
+
+    row, (frame, sentinels) = measure_stage('replace_sentinels', lambda df: replace_sentinels(df, mapping),
+                                            lambda: frame.copy(), repeats, len(frame), **labels)
+    results.append(row)
+
+    row, database_map = measure_stage('split_tables', lambda df: split_tables(df, mapping, sentinels=sentinels),
+                                      lambda: frame, repeats, len(frame), **labels)
+    results.append(row)
+
+    # The pandas.melt path wide_to_long() replaced, kept for comparison
+    def melt_all(df):
+        return {table: melt_df(df, schema, mapping.table_columns[table]) for table, (schema, _, _) in LONG_TABLES.items()}
+    row, _ = measure_stage('melt_df', melt_all, lambda: frame, repeats, len(frame), **labels)
+    results.append(row)
+
+    # Fails the run if wide_to_long() no longer reproduces melt_df() on this year
+    verify_wide_to_long(frame, mapping.table_columns)
+
+    return results, database_map
+
+
+def load_stage(database_map: dict, database: str, engine=None, repeats: int = 3, **labels) -> List[dict]:
+    """
+    Benchmarks writing one database_map.
+
+    'sqlite' writes with DataFrame.to_sql into an in-memory SQLite database, a stand-in that needs no server;
+    tables are named schema_table. 'postgres' runs bulk_loader.benchmark_loaders() (to_sql and COPY, rolled back)
+    against a database whose tables already exist.
+    """
+
+    rows_in = frame_rows(database_map)
+    if database == 'sqlite':
+        def write_sqlite(sqlite_engine):
+            with sqlite_engine.begin() as conn:
+                for table_name, [schema_name, df_to_export] in database_map.items():
+                    df_to_export.to_sql(f'{schema_name}_{table_name}', conn, if_exists='replace', index=False)
+            sqlite_engine.dispose()
+
+        row, _ = measure_stage('load_sqlite', write_sqlite, lambda: create_engine('sqlite://'), repeats, rows_in, **labels)
+        return [row]
+
+    # Imported here because bulk_loader is only needed with a PostgreSQL database
+    from bulk_loader import benchmark_loaders
+    timings = benchmark_loaders(engine, database_map, repeats)
+    return [{'stage': f'load_{loader}', **labels,
+             'seconds': group['seconds'].min(),
+             'median_seconds': group['seconds'].median(),
+             'peak_mb': np.nan, 'output_mb': 0.0,
+             'rows_in': rows_in, 'rows_out': rows_in}
+            for loader, group in timings.groupby('loader', sort=False)]
+
+
+def analysis_frames(expenditures: pd.DataFrame, annual_stats: pd.DataFrame, leas: pd.DataFrame) -> tuple:
+    """
+    State-level tech and vocational expenditures and student counts, shaped like the notebooks' query results.
+    """
+
+    # census_id is read as text, or as integers when a year has no 'N' rows, so the frames are joined on integers
+    leas = leas.assign(census_id=leas['census_id'].astype('int64'))
+    expenditures = expenditures[expenditures['expenditure_title'].astype(str).str.contains('tech|voc')]
+    expenditures = expenditures.assign(census_id=expenditures['census_id'].astype('int64')).merge(leas, on='census_id')
+    expenditures['year'] = expenditures['year'].dt.year
+    state_expenditures = expenditures.groupby(['state', 'region', 'expenditure_title', 'year'],
+                                              observed=True)['amount'].sum().reset_index()
+
+    student_counts = annual_stats.assign(census_id=annual_stats['census_id'].astype('int64')).merge(leas, on='census_id')
+    student_counts['year'] = student_counts['year'].dt.year
+    student_counts = student_counts.groupby(['state', 'region', 'year'])['fall_membership'].sum().reset_index()
+    return state_expenditures, student_counts.rename(columns={'fall_membership': 'student_count'})
+
+
+def utilities_stages(expenditures: pd.DataFrame, student_counts: pd.DataFrame, repeats: int = 3) -> List[dict]:
+    """
+    Benchmarks the Utilities aggregate and chart helpers on state-level frames.
+    """
+
+    # Imported here to keep the pipeline stages independent of the plotting stack
+    from utilities import Utilities
+    utils = Utilities()
+    years = sorted(expenditures['year'].unique())
+    windows = [(years[0], years[-1])]
+    rows_in = len(expenditures)
+
+    regional = expenditures.groupby(['region', 'year', 'expenditure_title'])['amount'].sum().reset_index()
+    national = expenditures.groupby('year')['amount'].sum().reset_index()
+    stages = [
+        ('get_year_total', lambda _: utils.get_year_total(national, years[-1], 'amount')),
+        ('calculate_growth_rates', lambda _: utils.calculate_growth_rates(expenditures, 'amount', ['state', 'expenditure_title'],
+                                                                          student_counts)),
+        ('calculate_change_statistics', lambda _: utils.calculate_change_statistics(expenditures, 'amount',
+                                                                                    ['state', 'expenditure_title'],
+                                                                                    windows, student_counts)),
+        ('build_aggregate_cube', lambda _: utils.build_aggregate_cube(expenditures, student_counts)),
+        ('make_line_plot_grid', lambda _: utils.make_line_plot_grid(regional, x='year', y='amount', color='expenditure_title',
+                                                                    facet_col='region', facet_col_wrap=2, title='Line grid')),
+        ('make_bar_chart_grid', lambda _: utils.make_bar_chart_grid(expenditures, x='year', y='amount', color='expenditure_title',
+                                                                    facet_col='region', facet_col_wrap=2, title='Bar grid')),
+        ('create_combined_figure', lambda _: utils.create_combined_figure(
+            utils.make_line_plot_grid(regional, x='year', y='amount', color='expenditure_title', facet_col='region',
+                                      facet_col_wrap=2, title='Line grid'),
+            utils.make_bar_chart_grid(expenditures, x='year', y='amount', color='expenditure_title', facet_col='region',
+                                      facet_col_wrap=2, title='Bar grid'),
+            'Combined', ('Lines', 'Bars')))
+    ]
+    return [measure_stage(name, func, repeats=repeats, rows_in=rows_in)[0] for name, func in stages]
+
+
+############################## Suite ##############################
+
+def run_suite(survey: SyntheticSurvey, output_dir: str = SYNTHETIC_PATH, database: str = 'sqlite', engine=None,
+              repeats: int = 3) -> pd.DataFrame:
+    """
+    Generates a synthetic survey and benchmarks every stage from the raw files to the charts.
+
+    Pipeline stages and the database load run per year; the Utilities stages run once on all years.
+    The cold import of each Utilities layer is timed first (see import_stages()).
+
+    Parameters:
+    survey (SyntheticSurvey): Scale of the generated data.
+    output_dir (str): Directory for the generated files.
+    database (str): 'sqlite' (in-memory stand-in), 'postgres' (engine required) or 'none'.
+    engine (sqlalchemy.engine.Engine, optional): PostgreSQL engine for database='postgres'.
+    repeats (int): Timed runs per stage.
+
+    Returns:
+    pd.DataFrame: One row per stage (and year) with seconds, peak and output memory and rows in and out.
+    """
+
+    results = import_stages(repeats=repeats)
+    paths = write_survey(survey, output_dir)
+    registry = ColumnMappingRegistry(paths['workbook'], cache_path=None).load()
+    leas = pd.read_csv(paths['leas'])
+
+    expenditures, annual_stats = [], []
+    for year in survey.years:
+        raw_path = os.path.join(paths['raw_data_dir'], f'sdf{year:02d}.txt')
+        rows, database_map = pipeline_stages(raw_path, registry[year], repeats, year=year)
+        results += rows
+        if database != 'none':
+            results += load_stage(database_map, database, engine, repeats, year=year)
+        expenditures.append(database_map['expenditures'][1])
+        annual_stats.append(database_map['annual_stats'][1])
+        print(f"Benchmarked the 20{year:02d} pipeline stages")
+
+    state_expenditures, student_counts = analysis_frames(pd.concat(expenditures, ignore_index=True),
+                                                         pd.concat(annual_stats, ignore_index=True), leas)
+    results += utilities_stages(state_expenditures, student_counts, repeats)
+    results = pd.DataFrame(results)
+    results['year'] = results['year'].astype('Int64')
+    return results
+
+
+def save_baseline(results: pd.DataFrame, survey: SyntheticSurvey, path: str = BASELINE_PATH) -> None:
+    """
+    Writes the results as a JSON baseline, with the survey scale and the library versions they were measured with.
+    """
+
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    baseline = {'format': BASELINE_FORMAT_VERSION,
+                'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+                'survey': {**survey.__dict__, 'years': list(survey.years)},
+                'environment': {'python': platform.python_version(), 'pandas': pd.__version__,
+                                'numpy': np.__version__, 'machine': platform.machine()},
+                'results': json.loads(results.to_json(orient='records'))}
+    with open(path, 'w') as outfile:
+        json.dump(baseline, outfile, indent=2)
+    print(f"Saved baseline to {path}")
+
+
+def load_baseline(path: str = BASELINE_PATH) -> dict:
+    with open(path) as infile:
+        baseline = json.load(infile)
+    if baseline.get('format') != BASELINE_FORMAT_VERSION:
+        print(f"Baseline {path} was written by another version of the suite; stages may not match")
+    return baseline
+
+
+def survey_differences(survey: SyntheticSurvey, baseline: dict) -> List[str]:
+    """
+    Names of the survey settings that differ from the baseline's, which makes the comparison meaningless.
+    """
+
+    current = {**survey.__dict__, 'years': list(survey.years)}
+    return [name for name, value in current.items() if baseline['survey'].get(name) != value]
+
+
+def compare_to_baseline(results: pd.DataFrame, baseline: dict, tolerance: float = DEFAULT_TOLERANCE) -> pd.DataFrame:
+    """
+    Compares the time and peak memory of every stage and year to a baseline.
+
+    Only stages more than MIN_REGRESSION_SECONDS slower count as time regressions, so timer noise on the
+    millisecond stages is not reported.
+
+    Returns:
+    pd.DataFrame: One row per stage and year with both measurements, their ratios and a regression flag.
+    """
+
+    keys = ['stage', 'year']
+    before = pd.DataFrame(baseline['results'])
+    before['year'] = before['year'].astype('Int64')
+    compared = before[keys + ['seconds', 'peak_mb']].merge(results[keys + ['seconds', 'peak_mb']], on=keys, how='outer',
+                                                          suffixes=('_baseline', '_current'), sort=False)
+    compared['time_ratio'] = compared['seconds_current'] / compared['seconds_baseline']
+    compared['memory_ratio'] = compared['peak_mb_current'] / compared['peak_mb_baseline']
+    slower = (compared['time_ratio'] > 1 + tolerance) & \
+             (compared['seconds_current'] - compared['seconds_baseline'] > MIN_REGRESSION_SECONDS)
+    compared['regression'] = slower | (compared['memory_ratio'] > 1 + tolerance)
+    return compared
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark every ingestion and analysis stage on synthetic F-33 data.")
+    parser.add_argument('--leas', type=int, default=1_000, help="LEAs per year (default: 1,000).")
+    parser.add_argument('--years', type=int, nargs='+', default=[18, 19, 20],
+                        help="Two-digit survey years (default: 18 19 20).")
+    parser.add_argument('--measures', type=int, help="Amount columns per long table (default: as in the workbook).")
+    parser.add_argument('--sentinel-rate', type=float, default=0.1, help="Share of -1/-2/-3/-9 amounts (default: 0.1).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0).")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed runs per stage (default: 3).")
+    parser.add_argument('--database', choices=DATABASES, default='sqlite',
+                        help="Load stage target: in-memory SQLite, the PostgreSQL database of the credentials file, or none.")
+    parser.add_argument('--data-dir', default=SYNTHETIC_PATH, help=f"Directory for the generated files (default: {SYNTHETIC_PATH}).")
+    parser.add_argument('--save-baseline', nargs='?', const=BASELINE_PATH, metavar='PATH',
+                        help=f"Save the results as a baseline (default: {BASELINE_PATH}).")
+    parser.add_argument('--compare', nargs='?', const=BASELINE_PATH, metavar='PATH',
+                        help=f"Compare the results to a baseline (default: {BASELINE_PATH}).")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="Slowdown or memory growth reported as a regression (default: 0.25).")
+    args = parser.parse_args(argv)
+
+    survey = SyntheticSurvey(args.leas, tuple(args.years), args.measures, args.sentinel_rate, seed=args.seed)
+    engine = None
+    if args.database == 'postgres':
+        # Imported here because the cleaning script itself imports the modules benchmarked above
+        from LEA_Finance_Data_Cleaning_and_Automation_Script import create_database_engine
+        engine = create_database_engine()
+
+    try:
+        results = run_suite(survey, args.data_dir, args.database, engine, args.repeats)
+    finally:
+        if engine is not None:
+            engine.dispose()
+
+    print(results.to_string(index=False))
+    if args.compare:
+        baseline = load_baseline(args.compare)
+        differences = survey_differences(survey, baseline)
+        if differences:
+            print(f"The baseline was measured with different settings ({', '.join(differences)}); ratios are not comparable")
+        compared = compare_to_baseline(results, baseline, args.tolerance)
+        print(compared.to_string(index=False))
+        regressions = compared[compared['regression']]
+        print(f"Regressions: {', '.join(regressions['stage'] + regressions['year'].map(lambda year: '' if pd.isna(year) else f' (20{year:02d})'))}"
+              if len(regressions) else "No regressions")
+    if args.save_baseline:
+        save_baseline(results, survey, args.save_baseline)
+
+
+if __name__ == '__main__':
+    main()
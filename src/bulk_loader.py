@@ -0,0 +1,279 @@
+import io
+import time
+import argparse
+from typing import Callable, Iterable, List, Optional
+import pandas as pd
+from instrumentation import stage
+from query_cache import bump_data_version
+
+
+# Marker written for missing values; passed to COPY as its NULL string so empty strings survive
+COPY_NULL = r'\N'
+
+DEFAULT_BATCH_SIZE = 100_000
+
+# Indexes that back a constraint (primary keys, unique constraints) cannot be dropped on their own
+INDEX_DEFINITIONS_QUERY = """
+SELECT i.indexname, i.indexdef
+FROM pg_indexes AS i
+WHERE i.schemaname = %s
+AND i.tablename = %s
+AND NOT EXISTS (
+    SELECT 1
+    FROM pg_constraint AS c
+    WHERE c.conindid = format('%%I.%%I', i.schemaname, i.indexname)::regclass
+);
+"""
+
+
+def quote_identifier(name: str) -> str:
+    """
+    Quotes a PostgreSQL identifier.
+    """
+
+    return '"' + name.replace('"', '""') + '"'
+
+
+def copy_frame(cur, df: pd.DataFrame, schema: str, table: str, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Streams a DataFrame into a table with COPY FROM STDIN.
+
+    Rows are serialized as CSV into an in-memory buffer batch_size rows at a time, so the
+    buffer never holds more than one batch.
+
+    Parameters:
+    cur (psycopg2.cursor): Cursor of an open transaction.
+    df (pd.DataFrame): Rows to load. Column names must match the target table.
+    schema (str): Target schema.
+    table (str): Target table.
+    batch_size (int): Number of rows serialized per COPY statement.
+
+    Returns:
+    int: Number of rows copied.
+    """
+
+    if df.empty:
+        return 0
+
+    columns = ', '.join(quote_identifier(col) for col in df.columns)
+    copy_sql = (f"COPY {quote_identifier(schema)}.{quote_identifier(table)} ({columns}) "
+                f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')")
+
+    for start in range(0, len(df), batch_size):
+        buffer = io.StringIO()
+        df.iloc[start:start + batch_size].to_csv(buffer, index=False, header=False, na_rep=COPY_NULL)
+        buffer.seek(0)
+        cur.copy_expert(copy_sql, buffer)
+
+    return len(df)
+
+
+def drop_indexes(cur, schema: str, table: str) -> List[str]:
+    """
+    Drops the non-constraint indexes of a table and returns their definitions.
+
+    Parameters:
+    cur (psycopg2.cursor): Cursor of an open transaction.
+    schema (str): Schema of the table.
+    table (str): Table whose indexes are dropped.
+
+    Returns:
+    list: CREATE INDEX statements that recreate the dropped indexes.
+    """
+
+    cur.execute(INDEX_DEFINITIONS_QUERY, (schema, table))
+    definitions = cur.fetchall()
+    for index_name, _ in definitions:
+        cur.execute(f"DROP INDEX {quote_identifier(schema)}.{quote_identifier(index_name)};")
+
+    # Indexes of partitioned tables are reported as ON ONLY, which would not rebuild them on the partitions
+    return [index_definition.replace(' ON ONLY ', ' ON ', 1) for _, index_definition in definitions]
+
+
+def insert_new_entities(cur, entity: pd.DataFrame, batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+    """
+    Inserts entity rows whose census_id is not yet in entity.entity.
+
+    The rows are copied into a temporary staging table and merged with an anti-join, so the
+    existing census_ids never leave the database.
+
+    Parameters:
+    cur (psycopg2.cursor): Cursor of an open transaction.
+    entity (pd.DataFrame): Entity rows of one year or chunk.
+    batch_size (int): Number of rows serialized per COPY statement.
+
+    Returns:
+    int: Number of new entity rows inserted.
+    """
+
+    if entity.empty:
+        return 0
+
+    cur.execute("CREATE TEMPORARY TABLE IF NOT EXISTS entity_staging "
+                "(LIKE entity.entity INCLUDING DEFAULTS) ON COMMIT DROP;")
+    cur.execute("TRUNCATE entity_staging;")
+    copy_frame(cur, entity, 'pg_temp', 'entity_staging', batch_size)
+
+    columns = ', '.join(quote_identifier(col) for col in entity.columns)
+    cur.execute(f"""
+        INSERT INTO entity.entity ({columns})
+        SELECT DISTINCT ON (s.census_id) {', '.join('s.' + quote_identifier(col) for col in entity.columns)}
+        FROM entity_staging AS s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM entity.entity AS e WHERE e.census_id = s.census_id
+        )
+        ORDER BY s.census_id;
+    """)
+    return cur.rowcount
+
+
+def copy_load(engine, database_maps: Iterable[dict], batch_size: int = DEFAULT_BATCH_SIZE,
+              rebuild_indexes: bool = False, before_load: Optional[Callable] = None,
+              after_load: Optional[Callable] = None) -> dict:
+    """
+    Loads one survey year into PostgreSQL with COPY inside a single transaction.
+
+    database_maps may be a single-item list (a whole year) or a generator of chunks; either
+    way every chunk of the year is committed together or not at all.
+
+    Parameters:
+    engine (sqlalchemy.engine.Engine): Engine of the target database.
+    database_maps (iterable of dict): Outputs of clean_frame() for one year.
+    batch_size (int): Number of rows serialized per COPY statement.
+    rebuild_indexes (bool): Drop secondary indexes before loading and rebuild them after.
+    before_load (callable, optional): Called as before_load(cur) inside the transaction before any rows are copied.
+    after_load (callable, optional): Called as after_load(cur, rows_copied) inside the transaction before commit.
+
+    Returns:
+    dict: Table name mapped to the number of rows copied (new rows only for entity).
+    """
+
+    conn = engine.raw_connection()
+    rows_copied = {}
+    dropped_indexes = None
+
+    try:
+        cur = conn.cursor()
+
+        if before_load is not None:
+            before_load(cur)
+
+        for database_map in database_maps:
+            if rebuild_indexes and dropped_indexes is None:
+                dropped_indexes = []
+                for table_name, [schema_name, _] in database_map.items():
+                    dropped_indexes += drop_indexes(cur, schema_name, table_name)
+
+            # The entity table is loaded first so dependent rows always find their census_id
+            for table_name, [schema_name, df_to_export] in database_map.items():
+                with stage('copy', rows_in=len(df_to_export), table=table_name) as measured:
+                    if table_name == 'entity':
+                        copied = insert_new_entities(cur, df_to_export, batch_size)
+                    else:
+                        copied = copy_frame(cur, df_to_export, schema_name, table_name, batch_size)
+                    measured.rows_out = copied
+                rows_copied[table_name] = rows_copied.get(table_name, 0) + copied
+
+        if dropped_indexes:
+            with stage('rebuild_indexes', rows_in=len(dropped_indexes)):
+                for index_definition in dropped_indexes:
+                    cur.execute(index_definition)
+
+        if after_load is not None:
+            after_load(cur, rows_copied)
+
+        conn.commit()
+        cur.close()
+        bump_data_version()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+    return rows_copied
+
+
+############################## Benchmark ##############################
+
+def benchmark_loaders(engine, database_map: dict, repeats: int = 3,
+                      batch_size: int = DEFAULT_BATCH_SIZE) -> pd.DataFrame:
+    """
+    Times DataFrame.to_sql against copy_load() for the same cleaned year.
+
+    Every run happens inside a transaction that is rolled back, so the benchmark leaves the
+    database unchanged.
+
+    Parameters:
+    engine (sqlalchemy.engine.Engine): Engine of a local PostgreSQL database with the target tables.
+    database_map (dict): Output of clean_and_normalize_year().
+    repeats (int): Number of timed runs per loader.
+    batch_size (int): Rows per COPY statement.
+
+    Returns:
+    pd.DataFrame: One row per (loader, run) with seconds and rows/second.
+    """
+
+    total_rows = sum(len(df) for _, df in database_map.values())
+    results = []
+
+    for run in range(repeats):
+        # to_sql path, as used by the cleaning script
+        with engine.connect() as conn:
+            trans = conn.begin()
+            start = time.perf_counter()
+            existing_census_ids = pd.read_sql('SELECT census_id FROM entity.entity;', conn)['census_id']
+            for table_name, [schema_name, df_to_export] in database_map.items():
+                if table_name == 'entity':
+                    df_to_export = df_to_export[~df_to_export['census_id'].isin(existing_census_ids)]
+                df_to_export.to_sql(table_name, conn, schema=schema_name, if_exists='append', index=False)
+            seconds = time.perf_counter() - start
+            trans.rollback()
+        results.append({'loader': 'to_sql', 'run': run, 'seconds': seconds})
+
+        # COPY path
+        raw_conn = engine.raw_connection()
+        try:
+            cur = raw_conn.cursor()
+            start = time.perf_counter()
+            for table_name, [schema_name, df_to_export] in database_map.items():
+                if table_name == 'entity':
+                    insert_new_entities(cur, df_to_export, batch_size)
+                else:
+                    copy_frame(cur, df_to_export, schema_name, table_name, batch_size)
+            seconds = time.perf_counter() - start
+        finally:
+            raw_conn.rollback()
+            raw_conn.close()
+        results.append({'loader': 'copy', 'run': run, 'seconds': seconds})
+
+    results = pd.DataFrame(results)
+    results['rows'] = total_rows
+    results['rows_per_second'] = total_rows / results['seconds']
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    # Imported here because the cleaning script itself imports this module
+    from LEA_Finance_Data_Cleaning_and_Automation_Script import clean_and_normalize_year, create_database_engine
+    from column_mapping import ColumnMappingRegistry
+
+    parser = argparse.ArgumentParser(description="Benchmark DataFrame.to_sql against COPY on a local PostgreSQL.")
+    parser.add_argument('--year', type=int, default=20, help="Two-digit survey year to load (default: 20).")
+    parser.add_argument('--repeats', type=int, default=3, help="Timed runs per loader (default: 3).")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="Rows per COPY statement.")
+    args = parser.parse_args(argv)
+
+    engine = create_database_engine()
+    try:
+        database_map = clean_and_normalize_year(args.year, ColumnMappingRegistry().load()[args.year])
+        results = benchmark_loaders(engine, database_map, args.repeats, args.batch_size)
+    finally:
+        engine.dispose()
+
+    print(results.to_string(index=False))
+    print(results.groupby('loader')[['seconds', 'rows_per_second']].median().to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,371 @@
+import io
+import time
+import argparse
+import contextlib
+from typing import Iterable, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+
+
+YEAR_COLUMN = 'year'
+
+# Statistics computed for the value column and, with student counts, for the per-student cost
+WINDOW_STATISTICS = ['start_value', 'end_value', 'absolute_difference', 'percent_difference',
+                     'mean_growth_rate', 'compound_growth_rate']
+
+
+class YearMatrix:
+    """
+    A measure summed per group and year, laid out as a dense groups x years array.
+
+    Years missing for a group are NaN. Every statistic below works on whole arrays, so the cost is one
+    groupby over the input followed by NumPy operations over all groups at once.
+
+    Attributes:
+    groups (pd.DataFrame): One row per group with the group columns, in matrix row order.
+    years (np.ndarray): Sorted years of the matrix columns.
+    values (np.ndarray): Summed measure, shape (len(groups), len(years)).
+    """
+
+    def __init__(self, df: pd.DataFrame, value_column: str, group_columns: Sequence[str],
+                 year_column: str = YEAR_COLUMN):
+        group_columns = list(group_columns)
+        sums = df.groupby(group_columns + [year_column], observed=True, sort=True)[value_column].sum(min_count=1)
+
+        years = sums.index.get_level_values(year_column).astype(int)
+        self.years = np.unique(years)
+        year_codes = np.searchsorted(self.years, years)
+
+        if group_columns:
+            group_codes, uniques = pd.factorize(sums.index.droplevel(year_column))
+            # factorize() drops the level names
+            if isinstance(uniques, pd.MultiIndex):
+                self.groups = pd.DataFrame({col: uniques.get_level_values(level) for level, col in enumerate(group_columns)})
+            else:
+                self.groups = pd.DataFrame({group_columns[0]: uniques})
+        else:
+            group_codes = np.zeros(len(sums), dtype=int)
+            self.groups = pd.DataFrame(index=range(1))
+
+        self.values = np.full((len(self.groups), len(self.years)), np.nan)
+        self.values[group_codes, year_codes] = sums.to_numpy(dtype='float64')
+
+
+    def aligned(self, other: 'YearMatrix') -> np.ndarray:
+        """
+        Returns other's values re-indexed to this matrix's groups and years.
+
+        other may be keyed by a subset of this matrix's group columns (e.g. student counts per state
+        for expenditures per state and title); its rows are then repeated for every matching group.
+        """
+
+        key_columns = list(other.groups.columns)
+        if key_columns:
+            rows = pd.MultiIndex.from_frame(other.groups).get_indexer(pd.MultiIndex.from_frame(self.groups[key_columns]))
+        else:
+            rows = np.zeros(len(self.groups), dtype=int)
+        columns = pd.Index(other.years).get_indexer(self.years)
+
+        result = np.full(self.values.shape, np.nan)
+        known_rows, known_columns = rows >= 0, columns >= 0
+        result[np.ix_(known_rows, known_columns)] = other.values[np.ix_(rows[known_rows], columns[known_columns])]
+        return result
+
+
+def divide(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    """
+    Element-wise division that gives NaN instead of inf wherever the denominator is zero or missing.
+    """
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(denominator != 0, numerator / denominator, np.nan)
+
+
+def previous_present(values: np.ndarray) -> np.ndarray:
+    """
+    For every cell, the value of the closest earlier year that has a value (NaN if none), like a
+    per-group shift() over the rows that exist.
+    """
+
+    positions = np.where(~np.isnan(values), np.arange(values.shape[1]), -1)
+    last_present = np.maximum.accumulate(positions, axis=1)
+    previous = np.concatenate([np.full((values.shape[0], 1), -1), last_present[:, :-1]], axis=1)
+    result = np.take_along_axis(values, np.maximum(previous, 0), axis=1)
+    result[previous < 0] = np.nan
+    return result
+
+
+def year_over_year(values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Returns the yearly difference and the growth rate in percent against the previous year with a value.
+    """
+
+    previous = previous_present(values)
+    difference = values - previous
+    return difference, divide(difference, previous) * 100
+
+
+def window_positions(years: np.ndarray, windows: Sequence[Tuple[int, int]]) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Converts inclusive (start_year, end_year) windows to matrix column positions.
+
+    Returns the exact positions of the start and end years (-1 where the year is not in the matrix).
+    """
+
+    windows = np.asarray(windows, dtype=int).reshape(-1, 2)
+    year_index = pd.Index(years)
+    return year_index.get_indexer(windows[:, 0]), year_index.get_indexer(windows[:, 1])
+
+
+def window_mean(values: np.ndarray, years: np.ndarray, windows: Sequence[Tuple[int, int]]) -> np.ndarray:
+    """
+    Mean of each row over each inclusive year window, skipping NaN, for all rows and windows at once.
+
+    Returns:
+    np.ndarray: Shape (rows, windows).
+    """
+
+    windows = np.asarray(windows, dtype=int).reshape(-1, 2)
+    starts = np.searchsorted(years, windows[:, 0], side='left')
+    stops = np.searchsorted(years, windows[:, 1], side='right')
+
+    # Prefix sums turn every window mean into two lookups
+    zero = np.zeros((values.shape[0], 1))
+    sums = np.concatenate([zero, np.nancumsum(values, axis=1)], axis=1)
+    counts = np.concatenate([zero, np.cumsum(~np.isnan(values), axis=1)], axis=1)
+    return divide(sums[:, stops] - sums[:, starts], counts[:, stops] - counts[:, starts])
+
+
+def take_years(values: np.ndarray, positions: np.ndarray) -> np.ndarray:
+    result = values[:, np.maximum(positions, 0)]
+    result[:, positions < 0] = np.nan
+    return result
+
+
+def window_statistics(values: np.ndarray, years: np.ndarray, windows: Sequence[Tuple[int, int]]) -> dict:
+    """
+    Computes every WINDOW_STATISTICS entry for every row and window of a groups x years matrix.
+
+    Returns:
+    dict: Statistic name mapped to an array of shape (rows, windows).
+    """
+
+    windows = np.asarray(windows, dtype=int).reshape(-1, 2)
+    start_positions, end_positions = window_positions(years, windows)
+    start_values = take_years(values, start_positions)
+    end_values = take_years(values, end_positions)
+    _, growth_rates = year_over_year(values)
+
+    difference = end_values - start_values
+    periods = (windows[:, 1] - windows[:, 0]).astype('float64')
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = divide(end_values, start_values)
+        compound = np.where((ratio >= 0) & (periods > 0), (ratio ** divide(1, periods) - 1) * 100, np.nan)
+
+    return {'start_value': start_values,
+            'end_value': end_values,
+            'absolute_difference': difference,
+            'percent_difference': divide(difference, start_values) * 100,
+            'mean_growth_rate': window_mean(growth_rates, years, windows),
+            'compound_growth_rate': compound}
+
+
+############################## Tidy API ##############################
+
+def growth_rates(df: pd.DataFrame, value_column: str, group_columns: Sequence[str] = (),
+                 student_counts: Optional[pd.DataFrame] = None, student_count_column: str = 'student_count',
+                 year_column: str = YEAR_COLUMN) -> pd.DataFrame:
+    """
+    Computes yearly differences and growth rates for every group in one pass.
+
+    Replaces the sort_values() / groupby().diff() / groupby().pct_change() * 100 cells of the notebooks.
+
+    Parameters:
+    df (pd.DataFrame): Rows with the group columns, the year column and the value column. Rows sharing a group and year are summed.
+    value_column (str): Measure to analyze, e.g. 'amount'.
+    group_columns (sequence of str): Columns defining a series, e.g. ['region', 'expenditure_title']. Empty for national totals.
+    student_counts (pd.DataFrame, optional): Student counts keyed by the year and a subset of the group columns
+        (e.g. ['state'] or ['census_id']). Adds student_count and cost_per_student columns.
+    student_count_column (str): Column of student_counts holding the counts.
+    year_column (str): Column holding the year.
+
+    Returns:
+    pd.DataFrame: One row per group and year with the value, yearly_difference and growth_rate (in percent).
+    """
+
+    matrix = YearMatrix(df, value_column, group_columns, year_column)
+    difference, growth = year_over_year(matrix.values)
+    columns = {value_column: matrix.values, 'yearly_difference': difference, 'growth_rate': growth}
+
+    if student_counts is not None:
+        students = matrix.aligned(student_matrix(student_counts, group_columns, student_count_column, year_column))
+        columns['student_count'] = students
+        columns['cost_per_student'] = divide(matrix.values, students)
+
+    present = ~np.isnan(matrix.values).ravel()
+    tidy = matrix.groups.loc[np.repeat(matrix.groups.index, len(matrix.years))].reset_index(drop=True)
+    tidy[year_column] = np.tile(matrix.years, len(matrix.groups))
+    for name, values in columns.items():
+        tidy[name] = values.ravel()
+    return tidy[present].reset_index(drop=True)
+
+
+def change_statistics(df: pd.DataFrame, value_column: str, group_columns: Sequence[str] = (),
+                      windows: Iterable[Tuple[int, int]] = (), student_counts: Optional[pd.DataFrame] = None,
+                      student_count_column: str = 'student_count', year_column: str = YEAR_COLUMN) -> pd.DataFrame:
+    """
+    Computes change statistics for every combination of group and year window in one vectorized pass.
+
+    For each (group, window) the result holds the start and end values, the absolute and percent
+    differences, the mean of the yearly growth rates inside the window (as calculate_mean_growth_rate())
+    and the compound annual growth rate. Divisions by zero give NaN element-wise instead of failing.
+
+    Parameters:
+    df (pd.DataFrame): Rows with the group columns, the year column and the value column. Rows sharing a group and year are summed.
+    value_column (str): Measure to analyze, e.g. 'amount'.
+    group_columns (sequence of str): Columns defining a series, e.g. ['region', 'expenditure_title']. Empty for national totals.
+    windows (iterable of tuple): Inclusive (start_year, end_year) pairs, e.g. [(2014, 2016), (2010, 2020)].
+    student_counts (pd.DataFrame, optional): Student counts keyed by the year and a subset of the group columns.
+        Adds the same statistics for the per-student cost, prefixed with 'cost_per_student_'.
+    student_count_column (str): Column of student_counts holding the counts.
+    year_column (str): Column holding the year.
+
+    Returns:
+    pd.DataFrame: One row per group and window with the group columns, start_year, end_year and the statistics.
+    """
+
+    windows = np.asarray(list(windows), dtype=int).reshape(-1, 2)
+    matrix = YearMatrix(df, value_column, group_columns, year_column)
+    statistics = window_statistics(matrix.values, matrix.years, windows)
+
+    if student_counts is not None:
+        students = matrix.aligned(student_matrix(student_counts, group_columns, student_count_column, year_column))
+        cost_statistics = window_statistics(divide(matrix.values, students), matrix.years, windows)
+        statistics.update({f'cost_per_student_{name}': values for name, values in cost_statistics.items()})
+
+    tidy = matrix.groups.loc[np.repeat(matrix.groups.index, len(windows))].reset_index(drop=True)
+    tidy['start_year'] = np.tile(windows[:, 0], len(matrix.groups))
+    tidy['end_year'] = np.tile(windows[:, 1], len(matrix.groups))
+    for name, values in statistics.items():
+        tidy[name] = values.ravel()
+    return tidy
+
+
+def student_matrix(student_counts: pd.DataFrame, group_columns: Sequence[str], student_count_column: str,
+                   year_column: str) -> YearMatrix:
+    key_columns = [col for col in group_columns if col in student_counts.columns]
+    return YearMatrix(student_counts, student_count_column, key_columns, year_column)
+
+
+############################## Benchmark ##############################
+
+def synthetic_lea_frame(n_leas: int = 13_000, titles: Sequence[str] = ('teacher_salaries_vocational_education',
+                                                                      'tech_related_supplies_services',
+                                                                      'tech_related_equipment'),
+                        years: Sequence[int] = range(2010, 2021), seed: int = 0) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Builds LEA-level expenditure and student count frames shaped like the survey, with zeros and gaps.
+
+    Returns:
+    tuple: (expenditures with census_id, expenditure_title, year, amount; student counts with census_id, year, student_count).
+    """
+
+    rng = np.random.default_rng(seed)
+    census_ids = np.array([f'{i:014d}' for i in range(n_leas)])
+    years = np.asarray(list(years))
+
+    index = pd.MultiIndex.from_product([census_ids, list(titles), years], names=['census_id', 'expenditure_title', 'year'])
+    amounts = rng.lognormal(11, 2, len(index)).round()
+    amounts[rng.random(len(index)) < 0.2] = 0
+    expenditures = index.to_frame(index=False).assign(amount=amounts)
+    expenditures = expenditures[rng.random(len(expenditures)) > 0.05].reset_index(drop=True)
+
+    student_index = pd.MultiIndex.from_product([census_ids, years], names=['census_id', 'year'])
+    student_counts = student_index.to_frame(index=False).assign(student_count=rng.integers(0, 50_000, len(student_index)))
+    return expenditures, student_counts
+
+
+def per_call_statistics(utils, growth_df: pd.DataFrame, census_id: str, expenditure_title: str,
+                        start_year: int, end_year: int) -> dict:
+    """
+    The same statistics for one (LEA, title, window) through the scalar Utilities helpers.
+    """
+
+    criteria = {'census_id': census_id, 'expenditure_title': expenditure_title}
+    start_value = utils.get_single_value_from_df(growth_df, {**criteria, 'year': start_year}, 'amount')
+    end_value = utils.get_single_value_from_df(growth_df, {**criteria, 'year': end_year}, 'amount')
+
+    mask = (growth_df['census_id'] == census_id) & (growth_df['expenditure_title'] == expenditure_title) & \
+           (growth_df['year'] >= start_year) & (growth_df['year'] <= end_year)
+    result = {'mean_growth_rate': growth_df.loc[mask, 'growth_rate'].mean()}
+    if start_value is not None and end_value is not None:
+        result['absolute_difference'] = utils.calculate_total_difference(start_value, end_value)
+        result['percent_difference'] = utils.calculate_percentage_difference(start_value, end_value)
+    return result
+
+
+def benchmark_change_statistics(n_leas: int = 13_000, windows: Sequence[Tuple[int, int]] = ((2010, 2020), (2014, 2016), (2017, 2019)),
+                                sample_calls: int = 200) -> pd.DataFrame:
+    """
+    Times change_statistics() against looping the per-call Utilities helpers at LEA granularity.
+
+    The per-call path is timed on sample_calls (LEA, title, window) combinations and extrapolated to the
+    full grid, since running it for every LEA would take hours. The sampled results are checked against
+    the batch output.
+
+    Returns:
+    pd.DataFrame: One row per path with seconds for the full grid and the implied speedup.
+    """
+
+    # Imported here so the statistics functions do not pull in the plotting stack
+    from utilities import Utilities
+    utils = Utilities()
+
+    expenditures, student_counts = synthetic_lea_frame(n_leas)
+    group_columns = ['census_id', 'expenditure_title']
+
+    start = time.perf_counter()
+    batch = change_statistics(expenditures, 'amount', group_columns, windows, student_counts)
+    batch_seconds = time.perf_counter() - start
+
+    # The per-call helpers need the growth_rate column prepared by the caller, as in the notebooks
+    start = time.perf_counter()
+    growth_df = expenditures.sort_values(group_columns + ['year'])
+    growth_df['growth_rate'] = growth_df.groupby(group_columns)['amount'].pct_change() * 100
+    # pct_change() turns growth from zero into inf; change_statistics() leaves it undefined
+    growth_df['growth_rate'] = growth_df['growth_rate'].replace([np.inf, -np.inf], np.nan)
+    prepare_seconds = time.perf_counter() - start
+
+    rng = np.random.default_rng(1)
+    sample = batch.iloc[rng.choice(len(batch), size=min(sample_calls, len(batch)), replace=False)]
+    start = time.perf_counter()
+    # get_single_value_from_df() prints a notice for every LEA missing a year
+    with contextlib.redirect_stdout(io.StringIO()):
+        per_call = [per_call_statistics(utils, growth_df, row.census_id, row.expenditure_title, row.start_year, row.end_year)
+                    for row in sample.itertuples(index=False)]
+    per_call_seconds = (time.perf_counter() - start) / len(sample) * len(batch) + prepare_seconds
+
+    for row, expected in zip(sample.itertuples(index=False), per_call):
+        for name, value in expected.items():
+            value = np.nan if value is None else value
+            assert np.isclose(getattr(row, name), value, equal_nan=True), (row, name, value)
+
+    results = pd.DataFrame([{'path': 'per_call_helpers', 'groups_x_windows': len(batch), 'seconds': per_call_seconds},
+                            {'path': 'change_statistics', 'groups_x_windows': len(batch), 'seconds': batch_seconds}])
+    results['speedup'] = per_call_seconds / results['seconds']
+    return results
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Benchmark change_statistics() against the per-call Utilities helpers.")
+    parser.add_argument('--leas', type=int, default=13_000, help="Number of synthetic LEAs (default: 13,000).")
+    parser.add_argument('--sample-calls', type=int, default=200,
+                        help="Per-call combinations timed before extrapolating (default: 200).")
+    args = parser.parse_args(argv)
+
+    results = benchmark_change_statistics(args.leas, sample_calls=args.sample_calls)
+    print(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,237 @@
+import time
+import argparse
+from typing import List, Optional, Sequence, Tuple, Union, TYPE_CHECKING
+import numpy as np
+import pandas as pd
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+RENDER_MODES = ('default', 'scalable')
+
+# Scatter and line traces switch to WebGL (Scattergl) above this many plotted points
+WEBGL_POINT_THRESHOLD = 5_000
+
+# Points kept per line when a series is downsampled
+MAX_POINTS_PER_TRACE = 2_000
+
+
+############################## Reduce to Plotted Granularity ##############################
+
+def plot_keys(x: str, color: Optional[str] = None, facet_col: Optional[str] = None) -> List[str]:
+    """
+    Columns identifying one plotted mark: the facet, the color series and the x position.
+    """
+
+    return list(dict.fromkeys(col for col in (facet_col, color, x) if col is not None))
+
+
+def hover_columns(hover_data: Optional[Union[List[str], dict]]) -> List[str]:
+    if hover_data is None:
+        return []
+    if isinstance(hover_data, dict):
+        return [col for col, shown in hover_data.items() if shown is not False]
+    return list(hover_data)
+
+
+def aggregate_for_plot(df: pd.DataFrame, x: str, y: str, color: Optional[str] = None, facet_col: Optional[str] = None,
+                       hover_data: Optional[Union[List[str], dict]] = None,
+                       agg_func: str = 'sum') -> Tuple[pd.DataFrame, Optional[Union[List[str], dict]]]:
+    """
+    Collapses a frame to one row per plotted mark (facet, color, x), aggregating y with agg_func.
+
+    Stacked bars of many LEAs and one bar of their sum look the same, but the latter is one point instead of
+    thousands. Hover columns that are constant within every mark are kept, numeric ones are aggregated like y,
+    and any other hover column is dropped because it would only show one of the collapsed rows.
+
+    Parameters:
+    df (pd.DataFrame): Rows to plot, e.g. LEA-level expenditures.
+    x, y, color, facet_col (str): Columns as passed to the chart helper.
+    hover_data (list or dict, optional): Hover columns as passed to the chart helper.
+    agg_func (str): Aggregation applied to y (and numeric hover columns), e.g. 'sum' or 'mean'.
+
+    Returns:
+    tuple: (aggregated frame, hover_data restricted to the columns still available).
+    """
+
+    keys = plot_keys(x, color, facet_col)
+    if not df.duplicated(keys).any():
+        return df, hover_data
+
+    grouped = df.groupby(keys, sort=False, observed=True, dropna=False)
+    aggregations = {y: agg_func}
+    for col in hover_columns(hover_data):
+        if col in keys or col == y:
+            continue
+        if (grouped[col].nunique(dropna=False) <= 1).all():
+            aggregations[col] = 'first'
+        elif pd.api.types.is_numeric_dtype(df[col]):
+            aggregations[col] = agg_func
+
+    reduced = grouped.agg(aggregations).reset_index()
+    if isinstance(hover_data, dict):
+        hover_data = {col: shown for col, shown in hover_data.items() if col in reduced.columns}
+    elif hover_data is not None:
+        hover_data = [col for col in hover_data if col in reduced.columns]
+    return reduced, hover_data
+
+
+def downsample_lines(df: pd.DataFrame, x: str, y: str, series_keys: Sequence[str],
+                     max_points: int = MAX_POINTS_PER_TRACE) -> pd.DataFrame:
+    """
+    Caps every line at about max_points points with min/max decimation.
+
+    Each series longer than max_points is split into max_points / 2 consecutive buckets along x, and only the
+    lowest and highest point of each bucket are kept, so peaks and troughs survive. Shorter series are untouched.
+
+    Returns:
+    pd.DataFrame: The kept rows, ordered by series and x.
+    """
+
+    series_keys = list(series_keys)
+    ordered = df.sort_values(series_keys + [x], kind='stable').reset_index(drop=True)
+    if series_keys:
+        by_series = ordered.groupby(series_keys, sort=False, observed=True, dropna=False)
+        position, size = by_series.cumcount().to_numpy(), by_series[x].transform('size').to_numpy()
+    else:
+        position, size = np.arange(len(ordered)), np.full(len(ordered), len(ordered))
+
+    long_series = size > max_points
+    if not long_series.any():
+        return ordered
+
+    n_buckets = max(max_points // 2, 1)
+    long_rows = ordered[long_series].assign(_bucket=position[long_series] * n_buckets // size[long_series])
+    long_rows = long_rows[long_rows[y].notna()]
+    by_bucket = long_rows.groupby(series_keys + ['_bucket'], sort=False, observed=True, dropna=False)[y]
+    kept = np.union1d(by_bucket.idxmin().dropna().to_numpy(), by_bucket.idxmax().dropna().to_numpy())
+
+    keep = ~long_series
+    keep[kept.astype(np.int64)] = True
+    return ordered[keep]
+
+
+def line_render_mode(n_points: int, webgl_threshold: int = WEBGL_POINT_THRESHOLD) -> str:
+    """
+    Returns the px.line render_mode for a chart of n_points points.
+    """
+
+    return 'webgl' if n_points > webgl_threshold else 'svg'
+
+
+############################## Combine & Measure ##############################
+
+def combine_figures(figures: Sequence['go.Figure'], subplot_titles: Sequence[str],
+                    horizontal_spacing: float = 0.1) -> 'go.Figure':
+    """
+    Places every trace of each figure in its own column of a one-row subplot figure.
+
+    All traces are added in a single add_traces() call, so the figure is validated and relaid once instead of
+    once per trace.
+    """
+
+    # Imported here so that the data reduction helpers do not load Plotly
+    from plotly.subplots import make_subplots
+
+    combined_fig = make_subplots(rows=1, cols=len(figures), subplot_titles=subplot_titles,
+                                 horizontal_spacing=horizontal_spacing)
+
+    traces, cols = [], []
+    for col, fig in enumerate(figures, start=1):
+        traces += list(fig.data)
+        cols += [col] * len(fig.data)
+    if traces:
+        combined_fig.add_traces(traces, rows=[1] * len(traces), cols=cols)
+    return combined_fig
+
+
+def count_points(fig: 'go.Figure') -> int:
+    """
+    Number of plotted points over all traces.
+    """
+
+    total = 0
+    for trace in fig.data:
+        values = getattr(trace, 'x', None)
+        if values is None:
+            values = getattr(trace, 'y', None)
+        total += len(values) if values is not None else 0
+    return total
+
+
+def figure_stats(fig: 'go.Figure', name: str, build_seconds: float) -> dict:
+    """
+    Size and cost of a figure: traces, points, build time and the size of its JSON (what a notebook output stores).
+    """
+
+    # Imported here so that the data reduction helpers do not load Plotly
+    import plotly.io as pio
+
+    return {'figure': name,
+            'traces': len(fig.data),
+            'points': count_points(fig),
+            'build_seconds': build_seconds,
+            'json_bytes': len(pio.to_json(fig, validate=False))}
+
+
+def format_stats(stats: dict) -> str:
+    return (f"{stats['figure']}: {stats['traces']:,} traces, {stats['points']:,} points, "
+            f"built in {stats['build_seconds']:.2f}s, {stats['json_bytes'] / 1e6:.2f} MB serialized")
+
+
+############################## Benchmark ##############################
+
+def synthetic_chart_frame(n_leas: int = 13_000, seed: int = 0) -> pd.DataFrame:
+    """
+    LEA-level expenditures with a region per LEA, shaped like the frames the notebooks chart.
+    """
+
+    # Imported here to keep plotting independent of the statistics module
+    from change_statistics import synthetic_lea_frame
+    from region import Region
+
+    expenditures, student_counts = synthetic_lea_frame(n_leas, seed=seed)
+    rng = np.random.default_rng(seed)
+    census_ids = expenditures['census_id'].unique()
+    regions = pd.Series(np.array([region.value for region in Region])[rng.integers(0, len(Region), len(census_ids))],
+                        index=census_ids)
+    expenditures['region'] = expenditures['census_id'].map(regions)
+    return expenditures.merge(student_counts, on=['census_id', 'year'], how='left')
+
+
+def benchmark_rendering(n_leas: int = 13_000) -> pd.DataFrame:
+    """
+    Builds the bar grid, line grid and combined figure from LEA-level rows in the default and scalable modes.
+
+    Returns:
+    pd.DataFrame: figure_stats() of every figure, with the mode.
+    """
+
+    # Imported here because utilities_charts imports this module
+    from utilities_charts import ChartUtilities
+
+    utils = ChartUtilities()
+    df = synthetic_chart_frame(n_leas)
+    arguments = dict(x='year', y='amount', color='expenditure_title', facet_col='region', facet_col_wrap=2,
+                     hover_data=['student_count'])
+
+    for mode in RENDER_MODES:
+        bar = utils.make_bar_chart_grid(df, title=f'Bar grid ({mode})', render_mode=mode, report=True, **arguments)
+        line = utils.make_line_plot_grid(df, title=f'Line grid ({mode})', render_mode=mode, report=True, **arguments)
+        utils.create_combined_figure(bar, line, title=f'Combined ({mode})', subplot_titles=('Bars', 'Lines'), report=True)
+
+    return utils.render_report()
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Compare chart build time and size for LEA-level data.")
+    parser.add_argument('--leas', type=int, default=13_000, help="Number of synthetic LEAs (default: 13,000).")
+    args = parser.parse_args(argv)
+
+    results = benchmark_rendering(args.leas)
+    print(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,287 @@
+import os
+import re
+import json
+import pickle
+import hashlib
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+import pandas as pd
+from instrumentation import stage
+
+
+COLUMN_MAP_PATH = os.path.join("..", 'LEA Local Finance Survey – School District Data 2010 – 2020 – Column Mapping.xlsx')
+CACHE_PATH = os.path.join("..", ".cache", "column_mapping.pkl")
+
+# Bump whenever the compiled layout below changes so stale caches are rebuilt
+CACHE_FORMAT_VERSION = 3
+
+# Target tables of the normalized database, keyed by table name with their schema
+TABLE_SCHEMAS = {
+    'entity': 'entity',
+    'annual_stats': 'entity',
+    'expenditures': 'expenses',
+    'federal_revenue': 'revenue',
+    'state_revenue': 'revenue',
+    'local_revenue': 'revenue'
+}
+
+# Sparse record of the sentinel codes replaced by NaN, one row per census_id, year and column that held one
+SENTINEL_TABLE = ('entity', 'sentinel_codes')
+
+# Columns identifying an LEA: unique per row, so they stay strings instead of categoricals
+IDENTIFIER_COLUMNS = ['census_id', 'lea_id']
+
+# Codes made only of digits were typed by pandas' inference over the whole file when the database was first
+# loaded (lea_id 1 rather than '0000001'), so they keep that representation. census_id is always text: its
+# 'N' rows keep the inferred type a string.
+INTEGER_CODE_PATTERN = r'-?\d+'
+
+SHEET_NAME_PATTERN = re.compile(r'^Column Mapping (\d{2})$')
+
+
+@dataclass
+class ColumnMapping:
+    """
+    Compiled column mapping for one survey year.
+
+    Attributes:
+    year (int): Two-digit survey year.
+    rename_map (dict): Original column name mapped to new column name.
+    read_dtypes (dict): Original column name mapped to the pandas dtype used when reading the raw file.
+    inferred_columns (list): Original names of the codes read as strings and then typed per file (see inferred_dtypes()).
+    column_dtypes (dict): New column name mapped to its dtype in the cleaned frame (the dtype plan).
+    new_types (dict): New column name mapped to the workbook's expected datatype (e.g. 'NUMERIC', 'CHAR(1)').
+    table_columns (dict): Target table mapped to the ordered list of new column names it receives.
+    total_columns (list): New column names starting with 'total_', dropped during normalization.
+    """
+
+    year: int
+    rename_map: Dict[str, str]
+    read_dtypes: Dict[str, object]
+    inferred_columns: List[str]
+    column_dtypes: Dict[str, object]
+    new_types: Dict[str, str]
+    table_columns: Dict[str, List[str]] = field(default_factory=dict)
+    total_columns: List[str] = field(default_factory=list)
+
+
+    @property
+    def numeric_columns(self) -> List[str]:
+        """
+        New names of the NUMERIC columns, the only ones that can hold sentinel codes.
+        """
+
+        return [name for name, expected_type in self.new_types.items()
+                if expected_type == 'NUMERIC' and not name.startswith('total_')]
+
+
+    @property
+    def version(self) -> str:
+        """
+        Content hash of the compiled mapping, used to detect when a year's sheet has changed.
+        """
+
+        content = {'rename_map': self.rename_map,
+                   'new_types': self.new_types,
+                   'table_columns': self.table_columns}
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def compile_sheet(year: int, column_mapping_df: pd.DataFrame) -> ColumnMapping:
+    """
+    Compiles one 'Column Mapping NN' sheet into lookups for the cleaning script.
+
+    Parameters:
+    year (int): Two-digit survey year of the sheet.
+    column_mapping_df (pd.DataFrame): The raw sheet.
+
+    Returns:
+    ColumnMapping: Precomputed rename map, read dtypes and per-table column lists.
+    """
+
+    # Remove White Spaces from Column Names
+    original_names = column_mapping_df['Original Name'].astype(str).str.strip().tolist()
+    new_names = column_mapping_df['New Name'].astype(str).str.strip().tolist()
+    expected_types = column_mapping_df['Type'].astype(str).str.strip().str.upper().tolist()
+    tables = column_mapping_df['Table'].astype(str).str.strip().tolist()
+
+    rename_map = dict(zip(original_names, new_names))
+    new_types = dict(zip(new_names, expected_types))
+    total_columns = [name for name in new_names if name.startswith('total_')]
+
+    # Dtype plan: numeric columns are read as float64 and downcast once sentinels are replaced.
+    # Short codes and _flag columns repeat a handful of values, so they become categoricals;
+    # identifiers and free text stay strings. The survey year is a two-digit integer that the
+    # cleaning step turns into a timestamp. BOOLEAN columns are left to pandas and cast afterwards.
+    column_dtypes = {}
+    for new_name, expected_type in zip(new_names, expected_types):
+        if expected_type == 'NUMERIC':
+            column_dtypes[new_name] = 'float64'
+        elif expected_type == 'DATE':
+            column_dtypes[new_name] = 'int16'
+        elif expected_type == 'TEXT' or new_name in IDENTIFIER_COLUMNS:
+            column_dtypes[new_name] = str
+        elif expected_type.startswith(('CHAR', 'VARCHAR')):
+            column_dtypes[new_name] = 'category'
+    # Categoricals are read as strings and converted afterwards, which pandas' parser does faster
+    read_dtypes = {original_name: str if column_dtypes[new_name] == 'category' else column_dtypes[new_name]
+                   for original_name, new_name in zip(original_names, new_names) if new_name in column_dtypes}
+    inferred_columns = [original_name for original_name, new_name in zip(original_names, new_names)
+                        if column_dtypes.get(new_name) in (str, 'category') and new_name != 'census_id']
+
+    table_columns = {}
+    for table in TABLE_SCHEMAS:
+        columns = [name for name, target in zip(new_names, tables)
+                   if target in [table, 'all'] and not name.startswith('total_')]
+        if table == 'entity':
+            columns = [name for name in columns if name != 'year']
+        elif table == 'annual_stats' and 'year' in columns:
+            columns = [name for name in columns if name != 'year'] + ['year']
+        table_columns[table] = columns
+
+    return ColumnMapping(year=year,
+                         rename_map=rename_map,
+                         read_dtypes=read_dtypes,
+                         inferred_columns=inferred_columns,
+                         column_dtypes=column_dtypes,
+                         new_types=new_types,
+                         table_columns=table_columns,
+                         total_columns=total_columns)
+
+
+def inferred_dtypes(df: pd.DataFrame, columns: List[str]) -> Dict[str, str]:
+    """
+    Types pandas would infer for the given string columns of a whole raw file.
+
+    A column holding only integer codes becomes int64, or float64 if some rows are blank. Other columns stay strings.
+    The chunked reader computes these once per file, so every chunk gets the types of the whole file.
+
+    Parameters:
+    df (pd.DataFrame): The columns of a whole file, read as strings.
+    columns (List[str]): Columns to type, e.g. ColumnMapping.inferred_columns.
+
+    Returns:
+    dict: Column name mapped to 'int64' or 'float64', for the columns that are not left as strings.
+    """
+
+    dtypes = {}
+    for column in columns:
+        if column not in df.columns:
+            continue
+        values = df[column].dropna()
+        if values.str.fullmatch(INTEGER_CODE_PATTERN).all():
+            dtypes[column] = 'float64' if len(values) < len(df) else 'int64'
+    return dtypes
+
+
+def file_sha256(path: str) -> str:
+    """
+    Returns the SHA-256 hex digest of a file.
+    """
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for block in iter(lambda: infile.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ColumnMappingRegistry:
+    """
+    Parses every 'Column Mapping NN' sheet of the workbook once and serves compiled lookups.
+
+    The compiled mappings are pickled to an on-disk cache. The cache is reused while the
+    workbook's size and mtime are unchanged; if those differ, the workbook's hash decides
+    whether the cache is still valid before anything is re-parsed.
+    """
+
+    def __init__(self, workbook_path: str = COLUMN_MAP_PATH, cache_path: Optional[str] = CACHE_PATH):
+        self.workbook_path = workbook_path
+        self.cache_path = cache_path
+        self._mappings = None
+        self.version = None
+
+
+    def load(self) -> 'ColumnMappingRegistry':
+        """
+        Loads compiled mappings from the cache, or compiles and caches them.
+
+        Returns:
+        ColumnMappingRegistry: self, for chaining.
+        """
+
+        stat = os.stat(self.workbook_path)
+        cached = self._read_cache()
+
+        if cached is not None and (cached['size'], cached['mtime']) == (stat.st_size, stat.st_mtime):
+            self._mappings, self.version = cached['mappings'], cached['sha256']
+            return self
+
+        sha256 = file_sha256(self.workbook_path)
+        if cached is not None and cached['sha256'] == sha256:
+            self._mappings, self.version = cached['mappings'], sha256
+        else:
+            self._mappings, self.version = self._compile_workbook(), sha256
+
+        self._write_cache({'format': CACHE_FORMAT_VERSION,
+                           'size': stat.st_size,
+                           'mtime': stat.st_mtime,
+                           'sha256': sha256,
+                           'mappings': self._mappings})
+        return self
+
+
+    def _compile_workbook(self) -> Dict[int, ColumnMapping]:
+        with stage('read_mapping_workbook') as measured:
+            sheets = pd.read_excel(self.workbook_path, sheet_name=None)
+            measured.rows_out = sum(len(sheet) for sheet in sheets.values())
+
+        mappings = {}
+        for sheet_name, column_mapping_df in sheets.items():
+            match = SHEET_NAME_PATTERN.match(sheet_name.strip())
+            if match:
+                year = int(match.group(1))
+                mappings[year] = compile_sheet(year, column_mapping_df)
+        return mappings
+
+
+    def _read_cache(self) -> Optional[dict]:
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return None
+        try:
+            with open(self.cache_path, 'rb') as infile:
+                cached = pickle.load(infile)
+        except Exception as e:
+            print(f"Ignoring unreadable column mapping cache. Error: {e}")
+            return None
+        if cached.get('format') != CACHE_FORMAT_VERSION:
+            return None
+        return cached
+
+
+    def _write_cache(self, payload: dict) -> None:
+        if not self.cache_path:
+            return
+        os.makedirs(os.path.dirname(self.cache_path) or '.', exist_ok=True)
+
+        # Write to a temporary file first so a concurrent reader never sees a partial cache
+        temp_path = f'{self.cache_path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as outfile:
+            pickle.dump(payload, outfile, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self.cache_path)
+
+
+    @property
+    def years(self) -> List[int]:
+        if self._mappings is None:
+            self.load()
+        return sorted(self._mappings)
+
+
+    def __getitem__(self, year: int) -> ColumnMapping:
+        if self._mappings is None:
+            self.load()
+        try:
+            return self._mappings[year]
+        except KeyError:
+            raise KeyError(f"No 'Column Mapping {year}' sheet in {self.workbook_path}") from None
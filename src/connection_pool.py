@@ -0,0 +1,72 @@
+import os
+import json
+import threading
+from typing import Dict, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from psycopg2.pool import ThreadedConnectionPool
+
+
+DB_CREDENTIALS_PATH = os.path.join("..", "LEA_Finance_Survey_DB.json")
+
+MIN_CONNECTIONS = 1
+MAX_CONNECTIONS = 8
+
+_pools: Dict[str, 'ThreadedConnectionPool'] = {}
+_pools_lock = threading.Lock()
+
+
+def load_credentials(credentials_path: str = DB_CREDENTIALS_PATH) -> dict:
+    """
+    Reads database credentials from the JSON file.
+
+    Returns:
+    dict: Keyword arguments for psycopg2.connect().
+    """
+
+    with open(credentials_path) as infile:
+        credentials = json.load(infile)
+
+    return {'dbname': credentials['database'],
+            'user': credentials['user'],
+            'password': credentials['password'],
+            'host': credentials['host'],
+            'port': credentials['port']}
+
+
+def get_pool(credentials_path: str = DB_CREDENTIALS_PATH, minconn: int = MIN_CONNECTIONS,
+             maxconn: int = MAX_CONNECTIONS) -> 'ThreadedConnectionPool':
+    """
+    Returns the process-wide connection pool for a credentials file, creating it on first use.
+
+    The credentials file is read once per process; later calls reuse the pool and its open connections.
+
+    Parameters:
+    credentials_path (str): Path of the JSON credentials file.
+    minconn (int): Connections opened when the pool is created.
+    maxconn (int): Maximum number of connections handed out at the same time.
+
+    Returns:
+    ThreadedConnectionPool: Pool of psycopg2 connections.
+    """
+
+    # Imported here so that modules using the pool's settings do not load the driver
+    from psycopg2.pool import ThreadedConnectionPool
+
+    key = os.path.abspath(credentials_path)
+    with _pools_lock:
+        if key not in _pools or _pools[key].closed:
+            _pools[key] = ThreadedConnectionPool(minconn, maxconn, **load_credentials(credentials_path))
+        return _pools[key]
+
+
+def close_pools() -> None:
+    """
+    Closes every pooled connection of this process.
+    """
+
+    with _pools_lock:
+        for pool in _pools.values():
+            if not pool.closed:
+                pool.closeall()
+        _pools.clear()
@@ -0,0 +1,536 @@
+import os
+import json
+import time
+import argparse
+from enum import Enum
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from aggregate_query import filter_values
+from expenditures import TitleCategory, title_categories
+from instrumentation import configure_worker, current, stage
+from region import STATE_REGIONS
+from zscores import write_parquet
+
+
+SKETCH_PATH = os.path.join("..", "sketches")
+SETTINGS_FILE = 'settings.json'
+
+# Every quantile is within this relative error of the exact cost per student
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+# LEAs with fewer students are left out (e.g. 50, the cut-off of EducationEntityExpenditureAnalysis.sql)
+DEFAULT_MIN_STUDENTS = 1
+
+# One sketch per group; regions and the nation are merged from the state sketches when queried
+GROUP_COLUMNS = ['state', 'year', 'expenditure_title']
+DIMENSIONS = GROUP_COLUMNS + ['region']
+
+DEFAULT_QUANTILES = [0.1, 0.25, 0.5, 0.75, 0.9]
+
+REGION_OF_STATE = {state: region.value for state, region in STATE_REGIONS.items()}
+
+
+############################## Per-Student Costs ##############################
+
+def fiscal_years(year: pd.Series) -> np.ndarray:
+    """
+    Four-digit years of a year column holding either integers or the dates the cleaning script writes.
+    """
+
+    if pd.api.types.is_datetime64_any_dtype(year):
+        return year.dt.year.to_numpy()
+    return year.astype('int64').to_numpy()
+
+
+def cost_rows(expenditures: pd.DataFrame, annual_stats: pd.DataFrame,
+              min_students: int = DEFAULT_MIN_STUDENTS) -> pd.DataFrame:
+    """
+    LEA-level cost per student: each non-zero expenditure amount divided by the LEA's fall membership of the year.
+
+    As in the z-score view, null and zero amounts are left out, and so are LEAs with a missing membership
+    or fewer than min_students students.
+
+    Parameters:
+    expenditures (pd.DataFrame): census_id, state, year, expenditure_title and amount.
+    annual_stats (pd.DataFrame): census_id, year and fall_membership.
+    min_students (int): Smallest fall membership kept.
+
+    Returns:
+    pd.DataFrame: state, year, expenditure_title and cost_per_student, one row per LEA, year and title.
+    """
+
+    amounts = expenditures[expenditures['amount'].notna() & (expenditures['amount'] != 0)]
+    students = pd.Series(annual_stats['fall_membership'].astype('float64').to_numpy(),
+                         index=pd.MultiIndex.from_arrays([annual_stats['census_id'].astype(str).to_numpy(),
+                                                          fiscal_years(annual_stats['year'])]))
+    students = students[~students.index.duplicated()]
+
+    years = fiscal_years(amounts['year'])
+    keys = pd.MultiIndex.from_arrays([amounts['census_id'].astype(str).to_numpy(), years])
+    membership = students.reindex(keys).to_numpy()
+    kept = membership >= max(min_students, 1)
+
+    return pd.DataFrame({'state': amounts['state'].astype(str).to_numpy()[kept],
+                         'year': years[kept].astype('int16'),
+                         'expenditure_title': amounts['expenditure_title'].astype(str).to_numpy()[kept],
+                         'cost_per_student': amounts['amount'].astype('float64').to_numpy()[kept] / membership[kept]})
+
+
+############################## Sketches ##############################
+
+class LogBuckets:
+    """
+    Logarithmic buckets of a relative-error quantile sketch (as in DDSketch).
+
+    Bucket k holds the values in (gamma^(k-1), gamma^k]. Its representative value is within relative_accuracy
+    of every value it holds, whatever the scale, so sketches of small and large LEAs merge without losing accuracy.
+    """
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be between 0 and 1, not {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+
+
+    def index(self, values: np.ndarray) -> np.ndarray:
+        # int32, since fine accuracies give indexes beyond int16 (about 50,000 per decade at 0.0001)
+        return np.ceil(np.log(values) / self._log_gamma).astype('int32')
+
+
+    def value(self, index: np.ndarray) -> np.ndarray:
+        return 2 * self.gamma ** np.asarray(index, dtype='float64') / (self.gamma + 1)
+
+
+class CostDistribution:
+    """
+    Mergeable sketches of the LEA-level cost per student, one per state, year and expenditure title.
+
+    Each sketch counts its costs in logarithmic buckets (see LogBuckets) and keeps the exact count, sum,
+    minimum and maximum. Sketches merge by adding counts, so regional and national quantiles and histograms
+    are computed from the state sketches alone, without the LEA rows. A query only reads the buckets of the
+    sketches it selects.
+
+    Costs of zero or below (negative adjustments) are counted, and rank as zero in quantiles.
+
+    Layout:
+    <root>/settings.json
+    <root>/groups/state=<name>.parquet    (year, expenditure_title, count, zero_count, sum, min, max)
+    <root>/buckets/state=<name>.parquet   (year, expenditure_title, bucket, count)
+
+    Attributes:
+    groups (pd.DataFrame): One row per sketch: the GROUP_COLUMNS, count, zero_count, sum, min and max.
+    buckets (pd.DataFrame): Non-empty buckets of every sketch: the GROUP_COLUMNS, bucket and count.
+    """
+
+    def __init__(self, groups: pd.DataFrame, buckets: pd.DataFrame,
+                 relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, min_students: int = DEFAULT_MIN_STUDENTS):
+        self.log_buckets = LogBuckets(relative_accuracy)
+        self.min_students = min_students
+
+        # Sorted by group, so each sketch's buckets are one slice of the bucket arrays
+        self.groups = groups.sort_values(GROUP_COLUMNS, ignore_index=True)
+        self.buckets = buckets.sort_values(GROUP_COLUMNS + ['bucket'], ignore_index=True)
+        group_index = pd.MultiIndex.from_frame(self.groups[GROUP_COLUMNS])
+        sizes = np.bincount(group_index.get_indexer(pd.MultiIndex.from_frame(self.buckets[GROUP_COLUMNS])),
+                            minlength=len(self.groups))
+        self._stops = np.cumsum(sizes)
+        self._starts = self._stops - sizes
+        self._bucket = self.buckets['bucket'].to_numpy()
+        self._count = self.buckets['count'].to_numpy().astype('float64')
+
+
+    @property
+    def relative_accuracy(self) -> float:
+        return self.log_buckets.relative_accuracy
+
+
+    @classmethod
+    def from_rows(cls, rows: pd.DataFrame, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+                  min_students: int = DEFAULT_MIN_STUDENTS) -> 'CostDistribution':
+        """
+        Builds the sketches of LEA-level costs (see cost_rows()).
+        """
+
+        costs = rows['cost_per_student'].to_numpy()
+        positive = costs > 0
+        grouped = rows.groupby(GROUP_COLUMNS, observed=True, sort=False)['cost_per_student']
+        groups = grouped.agg(count='size', sum='sum', min='min', max='max')
+        groups['zero_count'] = pd.Series(~positive, index=rows.index).groupby(
+            [rows[col] for col in GROUP_COLUMNS], observed=True, sort=False).sum()
+
+        keyed = rows[GROUP_COLUMNS][positive].assign(bucket=LogBuckets(relative_accuracy).index(costs[positive]))
+        buckets = keyed.groupby(GROUP_COLUMNS + ['bucket'], observed=True, sort=False).size().rename('count')
+        return cls(groups.reset_index()[GROUP_COLUMNS + ['count', 'zero_count', 'sum', 'min', 'max']],
+                   buckets.reset_index(), relative_accuracy, min_students)
+
+
+    def merge(self, other: 'CostDistribution') -> 'CostDistribution':
+        """
+        Combines two sets of sketches, e.g. of two state shards. Sketches of the same group are added.
+        """
+
+        if (other.relative_accuracy, other.min_students) != (self.relative_accuracy, self.min_students):
+            raise ValueError("Only sketches built with the same relative accuracy and min_students can be merged")
+
+        groups = pd.concat([self.groups, other.groups], ignore_index=True)
+        groups = groups.groupby(GROUP_COLUMNS, observed=True).agg(count=('count', 'sum'), zero_count=('zero_count', 'sum'),
+                                                                  sum=('sum', 'sum'), min=('min', 'min'),
+                                                                  max=('max', 'max')).reset_index()
+        buckets = pd.concat([self.buckets, other.buckets], ignore_index=True)
+        buckets = buckets.groupby(GROUP_COLUMNS + ['bucket'], observed=True)['count'].sum().reset_index()
+        return CostDistribution(groups, buckets, self.relative_accuracy, self.min_students)
+
+
+    ############################## Persist ##############################
+
+    def save(self, root: str = SKETCH_PATH) -> None:
+        """
+        Writes one file per state and kind, replacing the stored sketches of the states present.
+        """
+
+        write_settings(root, self.relative_accuracy, self.min_students)
+        self.save_shards(root)
+
+
+    def save_shards(self, root: str = SKETCH_PATH) -> None:
+        """
+        Writes the state files only, for workers of build_sketches(), which records the settings once.
+        """
+
+        for kind, frame in (('groups', self.groups), ('buckets', self.buckets)):
+            for state, shard in frame.groupby('state', observed=True):
+                write_parquet(shard.drop(columns='state'), shard_path(root, kind, state))
+
+
+    @classmethod
+    def load(cls, root: str = SKETCH_PATH, states: Optional[List[str]] = None) -> 'CostDistribution':
+        """
+        Reads the stored sketches, of every state or of the given ones.
+        """
+
+        settings = read_settings(root)
+        states = stored_states(root) if states is None else states
+        frames = {}
+        for kind in ('groups', 'buckets'):
+            shards = [pd.read_parquet(shard_path(root, kind, state)).assign(state=state) for state in states
+                      if os.path.exists(shard_path(root, kind, state))]
+            frames[kind] = pd.concat(shards, ignore_index=True) if shards else pd.DataFrame(columns=GROUP_COLUMNS)
+        return cls(frames['groups'], frames['buckets'], settings['relative_accuracy'], settings['min_students'])
+
+
+    ############################## Queries ##############################
+
+    def _select(self, by: List[str], filters: dict) -> Tuple[pd.DataFrame, np.ndarray, np.ndarray]:
+        """
+        Selects the sketches matching the filters and numbers them by their group of the result.
+
+        Returns:
+        tuple: (one row per result group with the by columns and the merged count, zero_count, sum, min and max;
+                result group of every selected bucket; bucket of every selected bucket).
+        """
+
+        unknown = [name for name in list(by) + list(filters) if name not in DIMENSIONS]
+        if unknown:
+            raise ValueError(f"Unknown dimensions {unknown}. Expected some of {DIMENSIONS}")
+
+        groups = self.groups
+        if 'region' in by or 'region' in filters:
+            groups = groups.assign(region=groups['state'].map(REGION_OF_STATE))
+
+        mask = np.ones(len(groups), dtype=bool)
+        for name, value in filters.items():
+            values = filter_values(value)
+            categories = {value for value in values if isinstance(value, TitleCategory)}
+            values = [value.value if isinstance(value, Enum) else value for value in values
+                      if not isinstance(value, TitleCategory)]
+            if categories:
+                values += [title for title in pd.unique(groups[name].astype(str))
+                           if categories & title_categories('expenditures', title)]
+            mask &= groups[name].isin(values).to_numpy()
+
+        positions = np.flatnonzero(mask)
+        selected = groups.iloc[positions]
+        if by:
+            codes = selected.groupby(by, observed=True, sort=True).ngroup().to_numpy()
+        else:
+            codes = np.zeros(len(selected), dtype='int64')
+
+        # Sketch statistics merged with NumPy, which is several times faster than a groupby on these few rows
+        n_groups = codes.max() + 1 if len(codes) else (0 if by else 1)
+        result = selected.iloc[np.unique(codes, return_index=True)[1]][by].reset_index(drop=True)
+        if not by:
+            result = pd.DataFrame(index=range(n_groups))
+        for name in ('count', 'zero_count', 'sum'):
+            result[name] = np.bincount(codes, weights=selected[name].to_numpy(), minlength=n_groups)
+        result = result.astype({'count': 'int64', 'zero_count': 'int64'})
+        for name, reduce, empty in (('min', np.minimum, np.inf), ('max', np.maximum, -np.inf)):
+            merged = np.full(n_groups, empty)
+            reduce.at(merged, codes, selected[name].to_numpy())
+            result[name] = merged
+
+        # Bucket rows of the selected sketches, gathered slice by slice
+        starts, stops = self._starts[positions], self._stops[positions]
+        sizes = stops - starts
+        rows = np.repeat(starts - np.cumsum(sizes) + sizes, sizes) + np.arange(sizes.sum())
+        return result, np.repeat(codes, sizes), rows
+
+
+    def _dense_counts(self, n_groups: int, group_codes: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Merges the selected buckets into one count per result group and bucket.
+
+        Returns:
+        tuple: (counts of shape (groups, buckets), bucket of every column).
+        """
+
+        if len(rows) == 0:
+            return np.zeros((n_groups, 0)), np.zeros(0, dtype='int32')
+        bucket = self._bucket[rows].astype('int64')
+        low, width = bucket.min(), bucket.max() - bucket.min() + 1
+        counts = np.bincount(group_codes * width + (bucket - low), weights=self._count[rows], minlength=n_groups * width)
+        return counts.reshape(n_groups, width), np.arange(low, low + width)
+
+
+    def quantiles(self, quantiles: Optional[List[float]] = None, by: Optional[List[str]] = None,
+                  filters: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Approximate quantiles of the LEA-level cost per student, merged from the selected sketches.
+
+        Example:
+        distribution.quantiles([0.5, 0.9], by=['region', 'year'], filters={'expenditure_title': 'tech_related_equipment'})
+
+        Parameters:
+        quantiles (List[float], optional): Quantiles between 0 and 1, e.g. [0.25, 0.5, 0.75]. Default: DEFAULT_QUANTILES.
+        by (List[str], optional): Dimensions of the result: 'state', 'region', 'year' and 'expenditure_title'. Default: ['year'].
+                                  Empty for one national row.
+        filters (dict, optional): Dimension mapped to a value or list of values to keep. expenditure_title also accepts TitleCategory members.
+
+        Returns:
+        pd.DataFrame: One row per group with count (LEA rows), mean and one column per quantile, e.g. 'p50'.
+                      Each quantile is within the relative accuracy of an exact one, and never outside [min, max].
+        """
+
+        quantiles = quantiles if quantiles is not None else DEFAULT_QUANTILES
+        by = by if by is not None else ['year']
+        result, group_codes, rows = self._select(by, filters if filters is not None else {})
+        counts, bucket = self._dense_counts(len(result), group_codes, rows)
+        cumulative = np.cumsum(counts, axis=1)
+        values = self.log_buckets.value(bucket)
+
+        n = result['count'].to_numpy().astype('float64')
+        zeros = result['zero_count'].to_numpy().astype('float64')
+        lowest, highest = result['min'].to_numpy(), result['max'].to_numpy()
+        estimates = {}
+        for q in quantiles:
+            # Rank among the positive costs; ranks within the zero costs give zero
+            rank = q * (n - 1) - zeros
+            position = (cumulative > rank[:, None]).argmax(axis=1) if len(bucket) else np.zeros(len(n), dtype=int)
+            estimate = np.where(rank < 0, 0.0, values[position] if len(bucket) else 0.0)
+            estimates[f'p{q * 100:g}'] = np.where(n > 0, np.clip(estimate, lowest, highest), np.nan)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = result['sum'].to_numpy() / n
+        return pd.concat([result[by + ['count']].assign(mean=mean), pd.DataFrame(estimates)], axis=1)
+
+
+    def histogram(self, edges: List[float], by: Optional[List[str]] = None, filters: Optional[dict] = None) -> pd.DataFrame:
+        """
+        Number of LEA-level costs per student in each bin, merged from the selected sketches.
+
+        Costs are placed by their bucket's representative value, so a cost within the relative accuracy of an
+        edge may land in the neighbouring bin. Costs outside the edges are not counted.
+
+        Parameters:
+        edges (List[float]): Increasing bin edges, e.g. [0, 100, 200, 500, 1000]. The last bin includes its upper edge.
+        by (List[str], optional): Dimensions of the result (see quantiles()). Default: ['year'].
+        filters (dict, optional): Dimension mapped to a value or list of values to keep.
+
+        Returns:
+        pd.DataFrame: One row per group and bin with the by columns, bin_start, bin_end and count.
+        """
+
+        edges = np.asarray(edges, dtype='float64')
+        by = by if by is not None else ['year']
+        result, group_codes, rows = self._select(by, filters if filters is not None else {})
+        counts, bucket = self._dense_counts(len(result), group_codes, rows)
+
+        # Bin of every bucket column and of the zero costs; -1 is outside the edges
+        n_bins = len(edges) - 1
+        bins = np.clip(np.searchsorted(edges, self.log_buckets.value(bucket), side='right') - 1, -1, n_bins)
+        bins[self.log_buckets.value(bucket) == edges[-1]] = n_bins - 1
+        histogram = np.zeros((len(result), n_bins))
+        inside = (bins >= 0) & (bins < n_bins)
+        np.add.at(histogram.T, bins[inside], counts[:, inside].T)
+        zero_bin = np.searchsorted(edges, 0.0, side='right') - 1
+        if 0 <= zero_bin < n_bins:
+            histogram[:, zero_bin] += result['zero_count'].to_numpy()
+
+        frame = result.loc[np.repeat(np.arange(len(result)), n_bins), by].reset_index(drop=True)
+        return frame.assign(bin_start=np.tile(edges[:-1], len(result)), bin_end=np.tile(edges[1:], len(result)),
+                            count=histogram.ravel())
+
+
+############################## Files ##############################
+
+def shard_path(root: str, kind: str, state: str) -> str:
+    return os.path.join(root, kind, f'state={state}.parquet')
+
+
+def stored_states(root: str = SKETCH_PATH) -> List[str]:
+    directory = os.path.join(root, 'groups')
+    if not os.path.isdir(directory):
+        return []
+    return sorted(name[len('state='):-len('.parquet')] for name in os.listdir(directory)
+                  if name.startswith('state=') and name.endswith('.parquet'))
+
+
+def read_settings(root: str = SKETCH_PATH) -> dict:
+    path = os.path.join(root, SETTINGS_FILE)
+    if not os.path.exists(path):
+        return {'relative_accuracy': DEFAULT_RELATIVE_ACCURACY, 'min_students': DEFAULT_MIN_STUDENTS}
+    with open(path) as infile:
+        return json.load(infile)
+
+
+def write_settings(root: str, relative_accuracy: float, min_students: int) -> None:
+    """
+    Records the settings the stored sketches were built with. Shards built with other settings cannot be merged.
+    """
+
+    settings = {'relative_accuracy': relative_accuracy, 'min_students': min_students}
+    if stored_states(root) and read_settings(root) != settings:
+        raise ValueError(f"Sketches in {root} were built with {read_settings(root)}; rebuild every state "
+                         f"(or use another root) to change them to {settings}")
+    os.makedirs(root, exist_ok=True)
+    path = os.path.join(root, SETTINGS_FILE)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as outfile:
+        json.dump(settings, outfile)
+    os.replace(temp_path, path)
+
+
+############################## Build ##############################
+
+def build_state(state: str, warehouse_path: str, root: str = SKETCH_PATH,
+                relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY, min_students: int = DEFAULT_MIN_STUDENTS) -> int:
+    """
+    Builds and stores the sketches of one state from its partitions of the local Parquet warehouse.
+
+    Returns:
+    int: Number of LEA-level costs sketched.
+    """
+
+    # Imported here because the warehouse loads pyarrow.dataset, which only the build needs
+    from warehouse import ParquetWarehouse
+
+    with stage('build_cost_sketches', state=state) as measured:
+        warehouse = ParquetWarehouse(warehouse_path)
+        expenditures = warehouse.read('expenditures', columns=['census_id', 'fiscal_year', 'state', 'expenditure_title', 'amount'],
+                                      states=[state]).rename(columns={'fiscal_year': 'year'})
+        annual_stats = warehouse.read('annual_stats', columns=['census_id', 'fiscal_year', 'fall_membership'],
+                                      states=[state]).rename(columns={'fiscal_year': 'year'})
+        rows = cost_rows(expenditures, annual_stats, min_students)
+        distribution = CostDistribution.from_rows(rows, relative_accuracy, min_students)
+
+        # A state left without costs drops its old files
+        for kind in ('groups', 'buckets'):
+            if os.path.exists(shard_path(root, kind, state)) and rows.empty:
+                os.remove(shard_path(root, kind, state))
+        distribution.save_shards(root)
+        measured.rows_in = len(expenditures)
+        measured.rows_out = len(distribution.buckets)
+    return len(rows)
+
+
+def build_sketches(states: Optional[List[str]] = None, warehouse_path: Optional[str] = None, root: str = SKETCH_PATH,
+                   workers: int = 1, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY,
+                   min_students: int = DEFAULT_MIN_STUDENTS) -> Dict[str, int]:
+    """
+    Builds the sketches of every state (or the given ones), each state in its own worker process.
+
+    Parameters:
+    states (List[str], optional): States to (re)build. Default: every state of the warehouse.
+    warehouse_path (str, optional): Root of the Parquet warehouse written by the ingestion script.
+    root (str): Directory of the stored sketches.
+    workers (int): Worker processes; states are independent shards.
+    relative_accuracy (float): Relative error of the quantiles, e.g. 0.01 for 1%.
+    min_students (int): Smallest fall membership of the LEAs kept.
+
+    Returns:
+    dict: State mapped to the number of LEA-level costs sketched.
+    """
+
+    # Imported here because the warehouse loads pyarrow.dataset, which only the build needs
+    from warehouse import ParquetWarehouse, WAREHOUSE_PATH
+
+    warehouse_path = warehouse_path or WAREHOUSE_PATH
+    if states is None:
+        states = sorted(ParquetWarehouse(warehouse_path).read('entity', columns=['state'])['state'].dropna().astype(str).unique())
+    # Fails before any work if the stored sketches were built with other settings
+    write_settings(root, relative_accuracy, min_students)
+
+    arguments = (warehouse_path, root, relative_accuracy, min_students)
+    if workers > 1:
+        # Workers record their stages into the same metrics run
+        with ProcessPoolExecutor(max_workers=min(workers, len(states)), initializer=configure_worker,
+                                 initargs=(current().settings,)) as executor:
+            futures = {state: executor.submit(build_state, state, *arguments) for state in states}
+            return {state: future.result() for state, future in futures.items()}
+    return {state: build_state(state, *arguments) for state in states}
+
+
+############################## Command Line ##############################
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build and query sketches of the LEA-level cost per student.")
+    parser.add_argument('--root', default=SKETCH_PATH, help=f"Directory of the stored sketches (default: {SKETCH_PATH}).")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    build_parser = subparsers.add_parser('build', help="Build the sketches from the local Parquet warehouse.")
+    build_parser.add_argument('--states', nargs='+', help="Only these states (default: every state).")
+    build_parser.add_argument('--warehouse', help="Root of the Parquet warehouse (default: ../warehouse).")
+    build_parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                              help="Worker processes, one state at a time each (default: one per CPU).")
+    build_parser.add_argument('--accuracy', type=float, default=DEFAULT_RELATIVE_ACCURACY,
+                              help="Relative error of the quantiles (default: 0.01).")
+    build_parser.add_argument('--min-students', type=int, default=DEFAULT_MIN_STUDENTS,
+                              help="Leave out LEAs with fewer students (default: 1).")
+
+    query_parser = subparsers.add_parser('quantiles', help="Print quantiles of the cost per student.")
+    query_parser.add_argument('--by', nargs='*', default=['year'], help="Dimensions of the result (default: year).")
+    query_parser.add_argument('--years', type=int, nargs='+', help="Only these fiscal years.")
+    query_parser.add_argument('--states', nargs='+', help="Only these states.")
+    query_parser.add_argument('--regions', nargs='+', help="Only these regions.")
+    query_parser.add_argument('--titles', nargs='+', help="Only these expenditure titles.")
+    query_parser.add_argument('--categories', nargs='+', choices=[category.value for category in TitleCategory],
+                              help="Only the titles of these categories.")
+    query_parser.add_argument('--quantiles', type=float, nargs='+', default=DEFAULT_QUANTILES,
+                              help="Quantiles between 0 and 1 (default: 0.1 0.25 0.5 0.75 0.9).")
+    args = parser.parse_args(argv)
+
+    if args.command == 'build':
+        start = time.perf_counter()
+        sketched = build_sketches(args.states, args.warehouse, args.root, args.workers, args.accuracy, args.min_students)
+        print(f"Sketched {sum(sketched.values()):,} LEA-level costs of {len(sketched)} states "
+              f"in {time.perf_counter() - start:.1f}s into {args.root}")
+        return
+
+    filters = {name: values for name, values in (('year', args.years), ('state', args.states), ('region', args.regions))
+               if values}
+    titles = (args.titles or []) + [TitleCategory(category) for category in args.categories or []]
+    if titles:
+        filters['expenditure_title'] = titles
+
+    distribution = CostDistribution.load(args.root)
+    start = time.perf_counter()
+    result = distribution.quantiles(args.quantiles, args.by, filters)
+    print(result.to_string(index=False))
+    print(f"Merged {len(result):,} groups from the stored sketches in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,256 @@
+import re
 from enum import Enum
+from dataclasses import dataclass
+from typing import FrozenSet, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from long_format import LONG_TABLES
 
 class Expenditures(Enum):
     TEACH_SAL_VOC_ED = 'teacher_salaries_vocational_education'
     TECH_SUP_SERV = 'tech_related_supplies_services'
-    TECH_EQUIP = 'tech_related_equipment'
\ No newline at end of file
+    TECH_EQUIP = 'tech_related_equipment'
+
+    @property
+    def categories(self) -> FrozenSet['TitleCategory']:
+        return title_categories('expenditures', self.value)
+
+
+class TitleCategory(Enum):
+    TECH = 'tech'
+    VOCATIONAL = 'vocational'
+    FEDERAL_THRU_STATE = 'federal_thru_state'
+    FEDERAL_DIRECT = 'federal_direct'
+    PANDEMIC_RELIEF = 'pandemic_relief'
+    ARRA = 'arra'
+    SALARIES = 'salaries'
+    EMPLOYEE_BENEFITS = 'employee_benefits'
+    SPECIAL_EDUCATION = 'special_education'
+    DEBT = 'debt'
+    FUNDING_PROGRAM = 'funding_program'
+
+
+# Revenue titles selected by revenue.funding_view (SQL Queries/Funding_View.sql)
+FUNDING_PROGRAM_TITLES = {
+    'federal_revenue': ('math_science_teacher_quality_thru_state', '21st_century_learning_centers_thru_state',
+                        'student_support_academic_enrich_thru_state', 'education_stabilization_fund_esf_rem_grant',
+                        'title_I_thru_state', 'bilingual_education_thru_state',
+                        'education_stabilization_fund_esf_rwp_grant', 'effective_instruction_support_thru_state',
+                        'voc_tech_education_thru_state', 'indiv_with_disabilities_thru_state',
+                        'esser_fund', 'geer_fund'),
+    'state_revenue': ('bilingual_education_state', 'compensatory_basic_skills_programs',
+                      'vocational_education_programs', 'general_formula_assistance', 'special_education_programs')
+}
+
+# Category rules matched against title names; None applies to every long table.
+# TECH and VOCATIONAL cover what the notebooks selected with ILIKE '%tech%' / '%vocation%'.
+CATEGORY_RULES = {
+    TitleCategory.TECH: (None, re.compile(r'(^|_)tech(_|$)')),
+    TitleCategory.VOCATIONAL: (None, re.compile(r'(^|_)voc(ational)?(_|$)')),
+    TitleCategory.FEDERAL_THRU_STATE: ('federal_revenue', re.compile(r'_thru_state$')),
+    TitleCategory.FEDERAL_DIRECT: ('federal_revenue', re.compile(r'_direct$')),
+    TitleCategory.PANDEMIC_RELIEF: (None, re.compile(r'^(cares_act|esser|geer|education_stabilization|coronavirus)')),
+    TitleCategory.ARRA: (None, re.compile(r'^arra_')),
+    TitleCategory.SALARIES: (None, re.compile(r'salaries')),
+    TitleCategory.EMPLOYEE_BENEFITS: (None, re.compile(r'^employee_benefits')),
+    TitleCategory.SPECIAL_EDUCATION: (None, re.compile(r'special_education')),
+    TitleCategory.DEBT: (None, re.compile(r'(^|_)debt(_|$)'))
+}
+
+
+def title_categories(table: str, name: str) -> FrozenSet[TitleCategory]:
+    """
+    Returns the categories a title belongs to.
+    """
+
+    categories = {category for category, (rule_table, pattern) in CATEGORY_RULES.items()
+                  if rule_table in (None, table) and pattern.search(name)}
+    if name in FUNDING_PROGRAM_TITLES.get(table, ()):
+        categories.add(TitleCategory.FUNDING_PROGRAM)
+    return frozenset(categories)
+
+
+@dataclass(frozen=True)
+class Title:
+    """
+    One expenditure or revenue title of the long-format tables.
+
+    Attributes:
+    code (int): Small-integer code stored in the tables' title_code column.
+    table (str): Long table the title belongs to (e.g. 'expenditures', 'state_revenue').
+    name (str): Title as stored in expenditure_title / revenue_title.
+    categories (frozenset): TitleCategory members of the title.
+    """
+
+    code: int
+    table: str
+    name: str
+    categories: FrozenSet[TitleCategory]
+
+
+class TitleRegistry:
+    """
+    Dictionary of every expenditure and revenue title, keyed by small-integer codes.
+
+    Codes are assigned in workbook order (table, then the first survey year a title appears in) and
+    never change once assigned: titles new to a later workbook are appended with the next free code.
+    The database keeps the same dictionary in its title dimension table.
+    """
+
+    def __init__(self, titles: Iterable[Title] = ()):
+        self._by_key = {}
+        self._by_code = {}
+        for title in titles:
+            self._by_key[(title.table, title.name)] = title
+            self._by_code[title.code] = title
+
+
+    @classmethod
+    def from_mappings(cls, registry, tables: Iterable[str] = tuple(LONG_TABLES),
+                      existing: Optional['TitleRegistry'] = None) -> 'TitleRegistry':
+        """
+        Builds the registry from a ColumnMappingRegistry.
+
+        Parameters:
+        registry (ColumnMappingRegistry): Compiled column mappings.
+        tables (iterable of str): Long tables whose measure columns are titles, in code order (default: LONG_TABLES).
+        existing (TitleRegistry, optional): Registry whose codes are kept (e.g. read from the database).
+
+        Returns:
+        TitleRegistry: Every title of every survey year.
+        """
+
+        titles = cls(existing or ())
+        for table in tables:
+            for year in registry.years:
+                for col in registry[year].table_columns[table]:
+                    if col not in ('census_id', 'year') and not col.endswith('_flag'):
+                        titles.add(table, col)
+        return titles
+
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> 'TitleRegistry':
+        """
+        Builds the registry from the rows of the title dimension table (see to_frame()).
+        """
+
+        return cls(Title(int(row.title_code), row.table_name, row.title,
+                         frozenset(TitleCategory(category) for category in row.categories))
+                   for row in df.itertuples(index=False))
+
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Returns the registry as title dimension rows: title_code, table_name, title and categories.
+        """
+
+        return pd.DataFrame([{'title_code': title.code, 'table_name': title.table, 'title': title.name,
+                              'categories': sorted(category.value for category in title.categories)}
+                             for title in self], columns=['title_code', 'table_name', 'title', 'categories'])
+
+
+    def add(self, table: str, name: str) -> Title:
+        """
+        Returns the title, registering it with the next free code if it is new.
+        """
+
+        if (table, name) not in self._by_key:
+            title = Title(max(self._by_code, default=0) + 1, table, name, title_categories(table, name))
+            self._by_key[(table, name)] = title
+            self._by_code[title.code] = title
+        return self._by_key[(table, name)]
+
+
+    def __iter__(self):
+        return iter(sorted(self._by_code.values(), key=lambda title: title.code))
+
+
+    def __len__(self) -> int:
+        return len(self._by_code)
+
+
+    def __contains__(self, key) -> bool:
+        return key in self._by_key
+
+
+    def title(self, code: int) -> Title:
+        return self._by_code[code]
+
+
+    def code(self, table: str, name) -> int:
+        """
+        Returns the code of a title. name may be a title string or an Expenditures member.
+        """
+
+        name = name.value if isinstance(name, Enum) else name
+        return self._by_key[(table, name)].code
+
+
+    def codes(self, table: Optional[str] = None, categories: Iterable[TitleCategory] = (),
+              names: Iterable = ()) -> List[int]:
+        """
+        Returns the sorted codes of the titles in any of the given categories or with any of the given names.
+
+        Parameters:
+        table (str, optional): Only titles of this long table.
+        categories (iterable of TitleCategory): Categories to select.
+        names (iterable of str or Expenditures): Titles to select by name.
+
+        Returns:
+        list: Matching title codes.
+        """
+
+        categories = set(categories)
+        names = {name.value if isinstance(name, Enum) else name for name in names}
+        return sorted(title.code for title in self
+                      if (table is None or title.table == table)
+                      and (title.categories & categories or title.name in names))
+
+
+    def encode(self, table: str, names) -> np.ndarray:
+        """
+        Maps an array of title names to their codes (int16). Unknown titles raise a KeyError.
+        """
+
+        table_titles = [title for title in self if title.table == table]
+        index = pd.Index([title.name for title in table_titles])
+        positions = index.get_indexer(pd.Index(np.asarray(names, dtype=object)))
+        if (positions < 0).any():
+            unknown = sorted(set(np.asarray(names, dtype=object)[positions < 0]))
+            raise KeyError(f"Titles not in the {table} registry: {unknown}")
+        return np.array([title.code for title in table_titles], dtype=np.int16)[positions]
+
+
+    def decode(self, codes) -> np.ndarray:
+        """
+        Maps an array of title codes back to their names.
+        """
+
+        lookup = {code: title.name for code, title in self._by_code.items()}
+        return np.array([lookup[code] for code in np.asarray(codes).tolist()], dtype=object)
+
+
+    def mask(self, df: pd.DataFrame, table: str, categories: Iterable[TitleCategory] = (),
+             names: Iterable = (), title_column: Optional[str] = None) -> pd.Series:
+        """
+        Boolean mask of the rows of a long-format frame whose title is selected (see codes()).
+
+        Uses the title_code column when the frame has one, otherwise the table's title column.
+        """
+
+        codes = self.codes(table, categories, names)
+        if 'title_code' in df.columns:
+            return df['title_code'].isin(codes)
+        title_column = title_column or LONG_TABLES[table][1]
+        return df[title_column].isin([self.title(code).name for code in codes])
+
+
+def sql_code_filter(column: str, codes: List[int]) -> str:
+    """
+    Returns a WHERE condition selecting a set of title codes, e.g. "title_code IN (3, 7, 12)".
+    """
+
+    if not codes:
+        return 'FALSE'
+    return f"{column} IN ({', '.join(str(int(code)) for code in codes)})"
@@ -0,0 +1,384 @@
+import os
+import sys
+import json
+import time
+import uuid
+import pstats
+import cProfile
+import argparse
+import itertools
+import threading
+import tracemalloc
+from typing import Iterable, Iterator, List, Optional
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+METRICS_PATH = os.path.join("..", "metrics", "ingestion.jsonl")
+
+# ru_maxrss is reported in kilobytes on Linux and in bytes on macOS
+RSS_UNIT = 1 if sys.platform == 'darwin' else 1024
+
+PROFILE_TOP_FUNCTIONS = 15
+
+
+def max_rss_bytes() -> Optional[int]:
+    """
+    High-water mark of the process's resident set size, or None where the platform does not report it.
+    """
+
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * RSS_UNIT
+
+
+class NullStage:
+    """
+    Stage handed out while instrumentation is disabled: entering, leaving and setting rows_out cost nothing.
+    """
+
+    rows_out = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setattr__(self, name, value):
+        pass
+
+    def set(self, **labels) -> None:
+        pass
+
+
+NULL_STAGE = NullStage()
+
+
+class Stage:
+    """
+    One measured stage. Set rows_out (and any extra field through labels) before the with block ends.
+    """
+
+    def __init__(self, instrumentation: 'Instrumentation', name: str, rows_in: Optional[int], labels: dict):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.rows_in = rows_in
+        self.rows_out = None
+        self.labels = labels
+        self.child_peak = 0
+
+
+    def set(self, **labels) -> None:
+        """
+        Adds fields known only once the stage has run, e.g. whether a result came from a cache.
+        """
+
+        self.labels.update(labels)
+
+
+    def __enter__(self):
+        self.instrumentation._start(self)
+        return self
+
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.instrumentation._finish(self, failed=exc_type is not None)
+        return False
+
+
+class Instrumentation:
+    """
+    Records wall time, CPU time, memory and rows in and out per stage as JSON lines.
+
+    Disabled unless a path or stream is given; stage() then returns a shared no-op object, so instrumented
+    code pays one method call per stage. Every record carries the run id and process id, so lines appended
+    by worker processes of the same run can be told apart and grouped.
+
+    Each thread nests its own stages: a stage opened in a worker thread (e.g. the queries of run_query_batch)
+    has no parent and inherits no labels. Only one stage at a time is profiled, in the thread that opened it,
+    and tracemalloc peaks are per process, so stages running in threads at the same time share them.
+
+    Parameters:
+    path (str, optional): JSON lines file, appended to.
+    stream (file, optional): Text stream receiving the JSON lines instead, e.g. sys.stderr.
+    trace_memory (bool): Also record the tracemalloc peak of each stage. Slows allocation-heavy code noticeably.
+    profile_stage (str, optional): Run this stage under cProfile and dump the statistics to profile_dir.
+    profile_dir (str, optional): Directory of the .prof files (default: next to path).
+    run_id (str, optional): Identifier of the run (default: a random one). Pass the parent's to worker processes.
+    """
+
+    def __init__(self, path: Optional[str] = None, stream=None, trace_memory: bool = False,
+                 profile_stage: Optional[str] = None, profile_dir: Optional[str] = None, run_id: Optional[str] = None):
+        self.path = path
+        self.stream = stream
+        self.trace_memory = trace_memory
+        self.profile_stage = profile_stage
+        self.profile_dir = profile_dir or os.path.dirname(path or METRICS_PATH)
+        self.run_id = run_id or uuid.uuid4().hex[:12]
+        self.enabled = path is not None or stream is not None or profile_stage is not None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._profiler = None
+        self._profiled_stage = None
+        self._file = None
+
+        if trace_memory and self.enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+
+    @property
+    def settings(self) -> dict:
+        """
+        Keyword arguments recreating this instrumentation in a worker process (see configure()).
+        """
+
+        return {'path': self.path, 'trace_memory': self.trace_memory, 'profile_stage': self.profile_stage,
+                'profile_dir': self.profile_dir, 'run_id': self.run_id}
+
+
+    @property
+    def _stack(self) -> List[Stage]:
+        # Open stages of the calling thread, innermost last
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+
+    def stage(self, name: str, rows_in: Optional[int] = None, **labels):
+        """
+        Context manager measuring one stage.
+
+        Parameters:
+        name (str): Stage name, e.g. 'replace_sentinels'.
+        rows_in (int, optional): Rows going into the stage.
+        labels: Extra fields of the record, e.g. year=20 or table='expenditures'.
+
+        Returns:
+        Stage: Set its rows_out attribute inside the with block.
+        """
+
+        if not self.enabled:
+            return NULL_STAGE
+        return Stage(self, name, rows_in, labels)
+
+
+    def _start(self, stage: Stage) -> None:
+        if self.trace_memory:
+            # The parent's peak so far is kept before the peak is reset for the nested stage
+            if self._stack:
+                self._stack[-1].child_peak = max(self._stack[-1].child_peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        if self._stack:
+            # Nested stages inherit the labels of their parent, e.g. the year of an insert
+            stage.labels = {**self._stack[-1].labels, **stage.labels}
+        self._stack.append(stage)
+
+        stage.started_at = time.time()
+        stage.max_rss_before = max_rss_bytes()
+        if stage.name == self.profile_stage:
+            with self._lock:
+                if self._profiled_stage is None:
+                    self._profiler = self._profiler or cProfile.Profile()
+                    self._profiled_stage = stage
+                    self._profiler.enable()
+        stage.cpu_start = time.process_time()
+        stage.wall_start = time.perf_counter()
+
+
+    def _finish(self, stage: Stage, failed: bool = False) -> None:
+        wall_seconds = time.perf_counter() - stage.wall_start
+        cpu_seconds = time.process_time() - stage.cpu_start
+        if self._profiled_stage is stage:
+            with self._lock:
+                self._profiler.disable()
+                self._dump_profile(stage)
+                self._profiled_stage = None
+        self._stack.pop()
+
+        max_rss = max_rss_bytes()
+        record = {'run': self.run_id, 'pid': os.getpid(), 'stage': stage.name,
+                  'parent': self._stack[-1].name if self._stack else None, **stage.labels,
+                  'started_at': stage.started_at,
+                  'wall_seconds': wall_seconds,
+                  'cpu_seconds': cpu_seconds,
+                  'max_rss_mb': max_rss / 1e6 if max_rss is not None else None,
+                  'rss_growth_mb': (max_rss - stage.max_rss_before) / 1e6 if max_rss is not None else None,
+                  'rows_in': stage.rows_in,
+                  'rows_out': stage.rows_out}
+        if self.trace_memory:
+            peak = max(tracemalloc.get_traced_memory()[1], stage.child_peak)
+            record['tracemalloc_peak_mb'] = peak / 1e6
+            if self._stack:
+                self._stack[-1].child_peak = max(self._stack[-1].child_peak, peak)
+        if failed:
+            record['failed'] = True
+        self.emit(record)
+
+
+    def _discard(self, stage: Stage) -> None:
+        if self._profiled_stage is stage:
+            with self._lock:
+                self._profiler.disable()
+                self._profiled_stage = None
+        self._stack.pop()
+
+
+    def _dump_profile(self, stage: Stage) -> None:
+        # Statistics accumulate over every occurrence of the stage in this process; the file is rewritten each time
+        path = os.path.join(self.profile_dir, f'{stage.name}-{os.getpid()}.prof')
+        if not os.path.exists(path):
+            os.makedirs(self.profile_dir or '.', exist_ok=True)
+            print(f"Profiling stage '{stage.name}' into {path}")
+        self._profiler.dump_stats(path)
+
+
+    def emit(self, record: dict) -> None:
+        """
+        Writes one record as a JSON line.
+        """
+
+        line = json.dumps(record, default=str) + '\n'
+        # Stages of worker threads finish concurrently
+        with self._lock:
+            if self.stream is not None:
+                self.stream.write(line)
+                self.stream.flush()
+            elif self.path is not None:
+                if self._file is None:
+                    os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+                    # Line-buffered appends, so records of concurrent worker processes do not interleave
+                    self._file = open(self.path, 'a', buffering=1)
+                self._file.write(line)
+
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Instrumentation used by the module-level stage(); disabled until configure() is called
+_INSTRUMENTATION = Instrumentation()
+
+
+def configure(**settings) -> Instrumentation:
+    """
+    Replaces the process-wide instrumentation. Also used as a ProcessPoolExecutor initializer with
+    current().settings, so worker processes record into the same run.
+
+    Returns:
+    Instrumentation: The new instrumentation.
+    """
+
+    global _INSTRUMENTATION
+    _INSTRUMENTATION.close()
+    _INSTRUMENTATION = Instrumentation(**settings)
+    return _INSTRUMENTATION
+
+
+def configure_worker(settings: dict) -> None:
+    """
+    ProcessPoolExecutor initializer: records into the run of the parent's current().settings.
+    """
+
+    configure(**settings)
+
+
+def current() -> Instrumentation:
+    return _INSTRUMENTATION
+
+
+def stage(name: str, rows_in: Optional[int] = None, **labels):
+    """
+    Measures a stage with the process-wide instrumentation (see Instrumentation.stage()).
+    """
+
+    return _INSTRUMENTATION.stage(name, rows_in, **labels)
+
+
+def measure_iter(name: str, iterable: Iterable, **labels) -> Iterable:
+    """
+    Measures producing each item of an iterable (e.g. reading the chunks of a file) as its own stage,
+    with a 'chunk' number and the item's length as rows_out. Returns the iterable itself when disabled.
+    """
+
+    if not _INSTRUMENTATION.enabled:
+        return iterable
+    return _measured_items(_INSTRUMENTATION, name, iterable, labels)
+
+
+def _measured_items(instrumentation: Instrumentation, name: str, iterable: Iterable, labels: dict) -> Iterator:
+    iterator = iter(iterable)
+    for chunk in itertools.count():
+        measured = Stage(instrumentation, name, None, {**labels, 'chunk': chunk})
+        instrumentation._start(measured)
+        try:
+            item = next(iterator)
+        except StopIteration:
+            instrumentation._discard(measured)
+            return
+        except BaseException:
+            instrumentation._finish(measured, failed=True)
+            raise
+        measured.rows_out = len(item) if hasattr(item, '__len__') else None
+        instrumentation._finish(measured)
+        yield item
+
+
+############################## Read Metrics ##############################
+
+def read_metrics(path: str = METRICS_PATH, run: Optional[str] = None) -> pd.DataFrame:
+    """
+    Reads a JSON lines metrics file, optionally only one run (the latest with run='latest').
+    """
+
+    records = pd.read_json(path, lines=True)
+    if run == 'latest':
+        run = records['run'].iloc[-1]
+    return records[records['run'] == run] if run is not None else records
+
+
+def summarize_metrics(records: pd.DataFrame, by: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Totals per stage (or the columns in by): calls, wall and CPU seconds, rows, and the largest memory figures.
+    """
+
+    by = by if by is not None else ['stage']
+
+    aggregations = {'calls': ('stage', 'size'),
+                    'wall_seconds': ('wall_seconds', 'sum'),
+                    'cpu_seconds': ('cpu_seconds', 'sum'),
+                    'rows_in': ('rows_in', 'sum'),
+                    'rows_out': ('rows_out', 'sum'),
+                    'max_rss_mb': ('max_rss_mb', 'max')}
+    if 'tracemalloc_peak_mb' in records.columns:
+        aggregations['tracemalloc_peak_mb'] = ('tracemalloc_peak_mb', 'max')
+    summary = records.groupby(by, dropna=False).agg(**aggregations)
+    return summary.sort_values('wall_seconds', ascending=False)
+
+
+def print_profile(path: str, top: int = PROFILE_TOP_FUNCTIONS) -> None:
+    pstats.Stats(path).sort_stats('cumulative').print_stats(top)
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Summarize stage metrics written by the ingestion script.")
+    parser.add_argument('path', nargs='?', default=METRICS_PATH, help=f"Metrics file (default: {METRICS_PATH}).")
+    parser.add_argument('--run', help="Only this run id, or 'latest'.")
+    parser.add_argument('--by', nargs='+', default=['stage'], help="Group by these fields (default: stage).")
+    parser.add_argument('--profile', help="Print the top functions of a .prof file written for --profile-stage.")
+    args = parser.parse_args(argv)
+
+    if args.profile:
+        print_profile(args.profile)
+        return
+    print(summarize_metrics(read_metrics(args.path, args.run), args.by).to_string())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,180 @@
+import os
+import json
+from datetime import datetime
+from typing import Dict, Optional
+from column_mapping import ColumnMapping, SENTINEL_TABLE, TABLE_SCHEMAS, file_sha256
+
+
+MANIFEST_DDL = """
+CREATE SCHEMA IF NOT EXISTS etl;
+CREATE TABLE IF NOT EXISTS etl.load_manifest (
+    survey_year INTEGER PRIMARY KEY,
+    file_name TEXT NOT NULL,
+    file_sha256 TEXT NOT NULL,
+    mapping_version TEXT NOT NULL,
+    rows_loaded JSONB,
+    loaded_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+ALTER TABLE etl.load_manifest ADD COLUMN IF NOT EXISTS load_options JSONB;
+"""
+
+UPSERT_MANIFEST_SQL = """
+INSERT INTO etl.load_manifest (survey_year, file_name, file_sha256, mapping_version, load_options, rows_loaded, loaded_at)
+VALUES (%s, %s, %s, %s, %s, %s, now())
+ON CONFLICT (survey_year) DO UPDATE
+SET file_name = EXCLUDED.file_name,
+    file_sha256 = EXCLUDED.file_sha256,
+    mapping_version = EXCLUDED.mapping_version,
+    load_options = EXCLUDED.load_options,
+    rows_loaded = EXCLUDED.rows_loaded,
+    loaded_at = EXCLUDED.loaded_at;
+"""
+
+# Pipeline options that change which rows or columns a year loads, recorded with each manifest entry
+FINGERPRINT_OPTIONS = ('drop_empty_measures', 'title_codes')
+
+# Tables holding one row set per survey year; entity rows are shared across years and never deleted
+YEARLY_TABLES = {table: schema for table, schema in TABLE_SCHEMAS.items() if table != 'entity'}
+YEARLY_TABLES[SENTINEL_TABLE[1]] = SENTINEL_TABLE[0]
+
+
+class LoadManifest:
+    """
+    Tracks which raw file, mapping sheet and pipeline options each loaded survey year came from.
+
+    The manifest lives in etl.load_manifest, next to the data it describes, so a year's rows
+    and its manifest entry are always replaced in the same transaction.
+    """
+
+    def __init__(self, engine, raw_data_dir: str):
+        self.engine = engine
+        self.raw_data_dir = raw_data_dir
+        self._entries = None
+
+
+    def ensure_table(self) -> None:
+        conn = self.engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(MANIFEST_DDL)
+            conn.commit()
+            cur.close()
+        finally:
+            conn.close()
+
+
+    @property
+    def entries(self) -> Dict[int, dict]:
+        """
+        Manifest rows keyed by two-digit survey year.
+        """
+
+        if self._entries is None:
+            self.ensure_table()
+            conn = self.engine.raw_connection()
+            try:
+                cur = conn.cursor()
+                cur.execute("SELECT survey_year, file_name, file_sha256, mapping_version, load_options "
+                            "FROM etl.load_manifest;")
+                self._entries = {row[0]: {'file_name': row[1], 'file_sha256': row[2], 'mapping_version': row[3],
+                                          'load_options': row[4]}
+                                 for row in cur.fetchall()}
+                cur.close()
+            finally:
+                conn.close()
+        return self._entries
+
+
+    def fingerprint(self, i: int, mapping: ColumnMapping, options: Optional[dict] = None) -> dict:
+        """
+        Identifies the inputs of one survey year.
+
+        Parameters:
+        i (int): Two-digit survey year.
+        mapping (ColumnMapping): Compiled column mapping for the survey year.
+        options (dict, optional): Pipeline options of the run, e.g. {'drop_empty_measures': True, 'title_codes': False}.
+            Only the FINGERPRINT_OPTIONS are kept; missing ones count as False.
+
+        Returns:
+        dict: file_name, file_sha256, mapping_version and load_options of the year.
+        """
+
+        options = options or {}
+        file_name = f'sdf{i}.txt'
+        return {'file_name': file_name,
+                'file_sha256': file_sha256(os.path.join(self.raw_data_dir, file_name)),
+                'mapping_version': mapping.version,
+                'load_options': {name: bool(options.get(name, False)) for name in FINGERPRINT_OPTIONS}}
+
+
+    def is_current(self, i: int, fingerprint: dict) -> bool:
+        """
+        Returns True if survey year i was last loaded from exactly these inputs and options.
+
+        Years loaded before the options were recorded have none, so they count as changed and are loaded once more.
+        """
+
+        return self.entries.get(i) == fingerprint
+
+
+    def replace_year_hooks(self, i: int, fingerprint: dict) -> tuple:
+        """
+        Builds the before_load/after_load hooks that make a copy_load() replace a year atomically.
+
+        before_load deletes the year's existing rows from every yearly table; after_load writes
+        the new manifest row. Both run inside the load's transaction. The in-memory entry is only
+        updated by mark_loaded(), once the load has committed.
+
+        Parameters:
+        i (int): Two-digit survey year.
+        fingerprint (dict): Output of fingerprint() for the year.
+
+        Returns:
+        tuple: (before_load, after_load) callables for copy_load().
+        """
+
+        year = datetime(2000 + i, 1, 1)
+
+        def before_load(cur):
+            for table_name, schema_name in YEARLY_TABLES.items():
+                cur.execute(f'DELETE FROM "{schema_name}"."{table_name}" WHERE year = %s;', (year,))
+
+        def after_load(cur, rows_copied):
+            cur.execute(UPSERT_MANIFEST_SQL, (i, fingerprint['file_name'], fingerprint['file_sha256'],
+                                              fingerprint['mapping_version'], json.dumps(fingerprint['load_options']),
+                                              json.dumps(rows_copied)))
+
+        return before_load, after_load
+
+
+    def mark_loaded(self, i: int, fingerprint: dict) -> None:
+        """
+        Records survey year i as loaded from these inputs. Call only after the load's transaction has committed.
+        """
+
+        self.entries[i] = dict(fingerprint)
+
+
+def plan_incremental_years(manifest: LoadManifest, years, registry,
+                           options: Optional[dict] = None) -> Dict[int, Optional[dict]]:
+    """
+    Splits survey years into the ones that need loading and the ones that are unchanged.
+
+    Parameters:
+    manifest (LoadManifest): Manifest of the target database.
+    years (iterable of int): Two-digit survey years requested.
+    registry (ColumnMappingRegistry): Compiled column mappings.
+    options (dict, optional): Pipeline options of the run (see LoadManifest.fingerprint()).
+
+    Returns:
+    dict: Survey year mapped to its fingerprint for years that must be (re)loaded, in year order.
+    """
+
+    changed = {}
+    for i in years:
+        fingerprint = manifest.fingerprint(i, registry[i], options)
+        if manifest.is_current(i, fingerprint):
+            print(f"20{i} School Year is unchanged since its last load; skipping")
+        else:
+            changed[i] = fingerprint
+    return changed
@@ -0,0 +1,162 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, List
+
+
+# Long-format tables with their schema, title column and measure column
+LONG_TABLES = {
+    'expenditures': ('expenses', 'expenditure_title', 'amount'),
+    'local_revenue': ('revenue', 'revenue_title', 'revenue'),
+    'state_revenue': ('revenue', 'revenue_title', 'revenue'),
+    'federal_revenue': ('revenue', 'revenue_title', 'revenue')
+}
+
+ID_COLUMNS = ['census_id', 'year']
+
+# Dtypes the cleaning script may store amounts in; the normalized tables get float64
+COMPACT_AMOUNT_DTYPES = ('float32', 'Int32')
+
+
+def melt_df(df, schema, columns_to_use):
+    new_columns = []
+    new_df = df[columns_to_use].copy()
+    id_vars = ['census_id', 'year'] + [col for col in new_df.columns if col.endswith('_flag')]
+
+    if schema == 'expenses':
+        new_df = pd.melt(new_df, id_vars=id_vars, var_name='expenditure_title', value_name='amount')
+        new_columns = ['expenditure_title', 'amount']
+    elif schema == 'revenue':
+        new_df = pd.melt(new_df, id_vars=id_vars, var_name='revenue_title', value_name='revenue')
+        new_columns = ['revenue_title', 'revenue']
+
+    remaining_columns = [col for col in id_vars if col not in new_columns]
+    ordered_columns = remaining_columns[:2] + new_columns + remaining_columns[2:]
+    new_df = new_df[ordered_columns]
+    return new_df
+
+
+def plain_columns(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Copies part of a cleaned wide frame with float64 amounts and string codes, the column types
+    its database and warehouse tables were created with.
+    """
+
+    dtypes = {}
+    for col in df.columns:
+        if df[col].dtype.name in COMPACT_AMOUNT_DTYPES:
+            dtypes[col] = np.float64
+        elif isinstance(df[col].dtype, pd.CategoricalDtype):
+            dtypes[col] = df[col].cat.categories.dtype
+    return df.astype(dtypes)
+
+
+def take_column(df: pd.DataFrame, col: str, row_index: np.ndarray, cache: dict, categorical: bool = False):
+    """
+    Repeats a wide column along a long table's row index.
+
+    With categorical=True the column is factorized once and only its small integer codes are repeated.
+    """
+
+    if col not in cache:
+        cache[col] = pd.Categorical(df[col]) if categorical else df[col].array
+    return cache[col].take(row_index)
+
+
+def wide_to_long(df: pd.DataFrame, table_columns: Dict[str, List[str]], drop_empty: bool = False,
+                 categorical: bool = True, titles=None) -> Dict[str, pd.DataFrame]:
+    """
+    Builds the four long-format tables from a cleaned wide frame in one pass.
+
+    The measure columns of all four tables are pulled into a single NumPy block once. Each table is
+    then assembled from flat index arrays. Rows are only materialized after the optional null/zero
+    filter, so dropped measures never cost memory in the id columns.
+
+    With drop_empty=False and categorical=False the output equals melt_df() row for row.
+
+    Parameters:
+    df (pd.DataFrame): Cleaned wide frame (after renaming, total_ removal and sentinel replacement).
+    table_columns (dict): Table name mapped to its column list (ColumnMapping.table_columns).
+    drop_empty (bool): Drop rows whose measure is null or zero.
+    categorical (bool): Store the title and _flag columns as categoricals instead of strings.
+    titles (TitleRegistry, optional): Also add a title_code column with each title's dictionary code.
+
+    Returns:
+    dict: Table name mapped to its long-format DataFrame, for every table in LONG_TABLES.
+    """
+
+    # Split each table's columns into id columns (kept on every row) and measure columns (melted)
+    layouts = {}
+    all_measures = []
+    for table in LONG_TABLES:
+        columns = table_columns[table]
+        flag_columns = [col for col in columns if col.endswith('_flag')]
+        measures = [col for col in columns if col not in ID_COLUMNS and col not in flag_columns]
+        layouts[table] = (flag_columns, measures, len(all_measures))
+        all_measures += measures
+
+    n_rows = len(df)
+    # float64 whatever the cleaned frame downcast, so every chunk produces the same measure type
+    values = df[all_measures].to_numpy(dtype=np.float64, na_value=np.nan)
+    id_arrays = {}
+
+    tables = {}
+    for table, (schema, title_column, value_column) in LONG_TABLES.items():
+        flag_columns, measures, offset = layouts[table]
+
+        # Column-major flattening gives the same row order as pd.melt
+        flat_values = values[:, offset:offset + len(measures)].ravel(order='F')
+        title_codes = np.repeat(np.arange(len(measures), dtype=np.int32), n_rows)
+        row_index = np.tile(np.arange(n_rows), len(measures))
+
+        if drop_empty:
+            keep = ~pd.isna(flat_values) & (flat_values != 0)
+            flat_values, title_codes, row_index = flat_values[keep], title_codes[keep], row_index[keep]
+
+        if categorical:
+            title_values = pd.Categorical.from_codes(title_codes, categories=measures)
+        else:
+            title_values = np.asarray(measures, dtype=object)[title_codes]
+
+        long_table = {}
+        for col in ID_COLUMNS:
+            long_table[col] = take_column(df, col, row_index, id_arrays)
+        long_table[title_column] = title_values
+        if titles is not None:
+            long_table['title_code'] = titles.encode(table, measures)[title_codes]
+        long_table[value_column] = flat_values
+        for col in flag_columns:
+            long_table[col] = take_column(df, col, row_index, id_arrays, categorical)
+
+        tables[table] = pd.DataFrame(long_table)
+
+    return tables
+
+
+def verify_wide_to_long(df: pd.DataFrame, table_columns: Dict[str, List[str]]) -> None:
+    """
+    Checks that wide_to_long() reproduces melt_df() for a cleaned wide frame.
+
+    The dense output must match melt_df() exactly. The sparse output must match melt_df() after
+    its null and zero measures are dropped.
+
+    Parameters:
+    df (pd.DataFrame): Cleaned wide frame.
+    table_columns (dict): Table name mapped to its column list (ColumnMapping.table_columns).
+
+    Raises:
+    AssertionError: If any table differs.
+    """
+
+    df = plain_columns(df)
+    dense = wide_to_long(df, table_columns, drop_empty=False, categorical=False)
+    sparse = wide_to_long(df, table_columns, drop_empty=True, categorical=True)
+
+    for table, (schema, title_column, value_column) in LONG_TABLES.items():
+        expected = melt_df(df, schema, table_columns[table])
+
+        # pd.melt's title dtype depends on the pandas version (object or str), so columns are compared by value
+        string_dtypes = {col: expected[col].dtype for col in expected.columns if col != value_column and col != 'year'}
+        pd.testing.assert_frame_equal(dense[table].astype(string_dtypes), expected)
+
+        expected = expected[expected[value_column].notna() & (expected[value_column] != 0)].reset_index(drop=True)
+        pd.testing.assert_frame_equal(sparse[table].astype(string_dtypes), expected)
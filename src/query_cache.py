@@ -0,0 +1,241 @@
+import os
+import re
+import uuid
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Union
+import pandas as pd
+
+
+QUERY_CACHE_DIR = os.path.join("..", ".cache", "query_results")
+DATA_VERSION_PATH = os.path.join("..", ".cache", "data_version")
+
+DEFAULT_MAX_MEMORY_BYTES = 512 * 1024 ** 2
+DEFAULT_MAX_DISK_BYTES = 2 * 1024 ** 3
+
+# Only statements that read data are cached
+CACHEABLE_PREFIXES = ('select', 'with', 'values', 'table')
+
+
+def bump_data_version(path: str = DATA_VERSION_PATH) -> str:
+    """
+    Marks the loaded data as changed, invalidating every cached query result.
+
+    Called by every writer to the database (ingestion script, COPY loader, z-score writer and schema
+    changes) once its transaction has committed.
+
+    Returns:
+    str: The new data version.
+    """
+
+    version = uuid.uuid4().hex
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'w') as outfile:
+        outfile.write(version)
+    os.replace(temp_path, path)
+    return version
+
+
+def current_data_version(path: str = DATA_VERSION_PATH) -> str:
+    try:
+        with open(path) as infile:
+            return infile.read().strip()
+    except FileNotFoundError:
+        return ''
+
+
+def normalize_sql(query: str) -> str:
+    """
+    Normalizes SQL text so formatting-only differences map to the same cache key.
+
+    Comments are removed, whitespace outside string literals is collapsed and trailing semicolons are dropped.
+    Case is kept because string literals are case-sensitive.
+    """
+
+    # Split on single-quoted literals so their content is left untouched
+    parts = re.split(r"('(?:[^']|'')*')", query)
+    for index in range(0, len(parts), 2):
+        text = re.sub(r'--[^\n]*', ' ', parts[index])
+        text = re.sub(r'/\*.*?\*/', ' ', text, flags=re.DOTALL)
+        parts[index] = re.sub(r'\s+', ' ', text)
+    return ''.join(parts).strip().rstrip(';').strip()
+
+
+class QueryCache:
+    """
+    Size-bounded LRU cache of query results, with optional persistence on disk.
+
+    Entries are keyed by the database queried, normalized SQL text and parameters, and tagged with the data version written by
+    bump_data_version(). When the version changes, every cached entry is dropped. Disk entries are
+    pickled DataFrames (protocol 5), which round-trip dtypes exactly and load without parsing.
+    """
+
+    def __init__(self, max_memory_bytes: int = DEFAULT_MAX_MEMORY_BYTES, cache_dir: Optional[str] = QUERY_CACHE_DIR,
+                 max_disk_bytes: int = DEFAULT_MAX_DISK_BYTES, data_version_path: str = DATA_VERSION_PATH):
+        self.max_memory_bytes = max_memory_bytes
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.data_version_path = data_version_path
+        self._entries = OrderedDict()
+        self._memory_bytes = 0
+        self._version = None
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+
+    def is_cacheable(self, query: str) -> bool:
+        return normalize_sql(query).lower().startswith(CACHEABLE_PREFIXES)
+
+
+    def key(self, query: str, params: Optional[Union[tuple, dict]] = None, database: str = '') -> str:
+        normalized = normalize_sql(query)
+        params_repr = repr(sorted(params.items())) if isinstance(params, dict) else repr(params)
+        return hashlib.sha256(f'{database}\x00{normalized}\x00{params_repr}'.encode('utf-8')).hexdigest()
+
+
+    def get(self, query: str, params: Optional[Union[tuple, dict]] = None, database: str = '') -> Optional[pd.DataFrame]:
+        """
+        Returns a copy of the cached result of a query on a database (e.g. utilities_db.database_identity()), or None.
+        """
+
+        key = self.key(query, params, database)
+        with self._lock:
+            self._check_version()
+
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0].copy()
+
+            df = self._read_disk(key)
+            if df is not None:
+                self._remember(key, df)
+                self.hits += 1
+                return df.copy()
+
+            self.misses += 1
+            return None
+
+
+    def data_version(self) -> str:
+        """
+        Current data version. Take it before running a query and pass it to put() with the result.
+        """
+
+        with self._lock:
+            self._check_version()
+            return self._version
+
+
+    def put(self, query: str, params: Optional[Union[tuple, dict]], df: pd.DataFrame, database: str = '',
+            version: Optional[str] = None) -> None:
+        """
+        Stores the result of a query on a database in memory and, if enabled, on disk.
+
+        version is the data_version() taken before the query ran. If the data has changed since, the result
+        may predate the change and is not stored.
+        """
+
+        key = self.key(query, params, database)
+        with self._lock:
+            self._check_version()
+            if version is not None and version != self._version:
+                return
+            self._remember(key, df.copy())
+            self._write_disk(key, df)
+
+
+    def clear(self) -> None:
+        """
+        Drops every cached result, in memory and on disk.
+        """
+
+        with self._lock:
+            self._entries.clear()
+            self._memory_bytes = 0
+            if self.cache_dir and os.path.isdir(self.cache_dir):
+                for filename in os.listdir(self.cache_dir):
+                    if filename.endswith('.pkl'):
+                        os.remove(os.path.join(self.cache_dir, filename))
+
+
+    def _check_version(self) -> None:
+        version = current_data_version(self.data_version_path)
+        if self._version is None:
+            self._version = version
+        elif version != self._version:
+            self.clear()
+            self._version = version
+
+
+    def _remember(self, key: str, df: pd.DataFrame) -> None:
+        size = int(df.memory_usage(deep=True).sum())
+        if size > self.max_memory_bytes:
+            return
+        if key in self._entries:
+            self._memory_bytes -= self._entries.pop(key)[1]
+        self._entries[key] = (df, size)
+        self._memory_bytes += size
+
+        # Evict least recently used results until the memory bound holds
+        while self._memory_bytes > self.max_memory_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._memory_bytes -= evicted_size
+
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f'{key}.pkl')
+
+
+    def _read_disk(self, key: str) -> Optional[pd.DataFrame]:
+        if not self.cache_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, 'rb') as infile:
+                payload = pickle.load(infile)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Ignoring unreadable cached result {path}. Error: {e}")
+            return None
+
+        if payload.get('data_version') != self._version:
+            os.remove(path)
+            return None
+
+        # Touch the file so disk eviction sees it as recently used
+        os.utime(path)
+        return payload['frame']
+
+
+    def _write_disk(self, key: str, df: pd.DataFrame) -> None:
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+        path = self._disk_path(key)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        with open(temp_path, 'wb') as outfile:
+            pickle.dump({'data_version': self._version, 'frame': df}, outfile, protocol=5)
+        os.replace(temp_path, path)
+        self._evict_disk()
+
+
+    def _evict_disk(self) -> None:
+        files = []
+        for filename in os.listdir(self.cache_dir):
+            if filename.endswith('.pkl'):
+                stat = os.stat(os.path.join(self.cache_dir, filename))
+                files.append((stat.st_mtime, stat.st_size, filename))
+
+        total = sum(size for _, size, _ in files)
+        for _, size, filename in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, filename))
+            total -= size
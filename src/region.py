@@ -4,4 +4,23 @@ class Region(Enum):
     MIDWEST = 'Midwest'
     NORTHEAST = 'Northeast'
     SOUTH = 'South'
-    WEST = 'West'
\ No newline at end of file
+    WEST = 'West'
+
+
+# State name (as in entity.state) mapped to its census region
+STATE_REGIONS = {
+    'Alabama': Region.SOUTH, 'Alaska': Region.WEST, 'Arizona': Region.WEST, 'Arkansas': Region.SOUTH,
+    'California': Region.WEST, 'Colorado': Region.WEST, 'Connecticut': Region.NORTHEAST, 'Delaware': Region.SOUTH,
+    'District of Columbia': Region.SOUTH, 'Florida': Region.SOUTH, 'Georgia': Region.SOUTH, 'Hawaii': Region.WEST,
+    'Idaho': Region.WEST, 'Illinois': Region.MIDWEST, 'Indiana': Region.MIDWEST, 'Iowa': Region.MIDWEST,
+    'Kansas': Region.MIDWEST, 'Kentucky': Region.SOUTH, 'Louisiana': Region.SOUTH, 'Maine': Region.NORTHEAST,
+    'Maryland': Region.SOUTH, 'Massachusetts': Region.NORTHEAST, 'Michigan': Region.MIDWEST,
+    'Minnesota': Region.MIDWEST, 'Mississippi': Region.SOUTH, 'Missouri': Region.MIDWEST, 'Montana': Region.WEST,
+    'Nebraska': Region.MIDWEST, 'Nevada': Region.WEST, 'New Hampshire': Region.NORTHEAST,
+    'New Jersey': Region.NORTHEAST, 'New Mexico': Region.WEST, 'New York': Region.NORTHEAST,
+    'North Carolina': Region.SOUTH, 'North Dakota': Region.MIDWEST, 'Ohio': Region.MIDWEST, 'Oklahoma': Region.SOUTH,
+    'Oregon': Region.WEST, 'Pennsylvania': Region.NORTHEAST, 'Rhode Island': Region.NORTHEAST,
+    'South Carolina': Region.SOUTH, 'South Dakota': Region.MIDWEST, 'Tennessee': Region.SOUTH, 'Texas': Region.SOUTH,
+    'Utah': Region.WEST, 'Vermont': Region.NORTHEAST, 'Virginia': Region.SOUTH, 'Washington': Region.WEST,
+    'West Virginia': Region.SOUTH, 'Wisconsin': Region.MIDWEST, 'Wyoming': Region.WEST
+}
@@ -0,0 +1,521 @@
+import os
+import json
+import time
+import hashlib
+import inspect
+import argparse
+import importlib
+from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+import pandas as pd
+import plotly
+import plotly.io as pio
+import plotly.express as px
+import plotly.graph_objects as go
+from utilities import Utilities, NamedQuery
+
+
+REPORT_PATH = os.path.join("..", "reports")
+PLOTLY_JS_FILE = 'plotly.min.js'
+MANIFEST_FILE = 'manifest.json'
+
+# Bump whenever the page layout or fragment format changes so every figure is rebuilt
+REPORT_FORMAT_VERSION = 1
+
+SECTIONS = {'national': 'National Level Analysis', 'regional': 'Regional Level Analysis'}
+
+# Modules behind the Utilities helpers the figures call; editing one of them rebuilds every figure
+FIGURE_HELPER_MODULES = ['utilities_core', 'utilities_charts', 'chart_rendering', 'change_statistics', 'aggregate_cube']
+
+
+############################## Inputs ##############################
+
+# Frames shared by the report figures, loaded once per build: from the database when reachable and the
+# query succeeds, from the CSV export at the repository root otherwise (as in the notebooks)
+TECH_VOCATIONAL_QUERY = """
+SELECT
+    state,
+    region,
+    expenditure_title,
+    year,
+    SUM(amount) AS amount,
+    AVG(amount_z_score) AS amount_z_score_avg
+FROM expenses.expenditure_zscores_by_state_year
+WHERE expenditure_title ILIKE '%tech%'
+OR expenditure_title ILIKE '%vocation%'
+GROUP BY state, region, year, expenditure_title
+ORDER BY state, year, expenditure_title;
+"""
+
+STUDENT_COUNTS_QUERY = """
+SELECT
+    e.state,
+    e.region,
+    DATE_PART('year', stats.year) AS year,
+    SUM(stats.fall_membership) AS student_count
+FROM entity.annual_stats AS stats
+INNER JOIN entity.entity as e
+    ON stats.census_id = e.census_id
+GROUP BY e.state, e.region, stats.year
+ORDER BY e.state, stats.year;
+"""
+
+INPUTS = {
+    'tech_vocational_expenditures': NamedQuery(TECH_VOCATIONAL_QUERY,
+                                               os.path.join("..", 'tech_vocational_expenditures_2010_to_2020.csv'),
+                                               {'year': int, 'amount': 'float64', 'amount_z_score_avg': 'float64'}),
+    'student_counts_by_state_year': NamedQuery(STUDENT_COUNTS_QUERY, os.path.join("..", 'student_counts_by_state.csv'),
+                                               {'year': int, 'student_count': int}),
+    'funding_data': NamedQuery("SELECT * FROM revenue.funding_view;", None, {'year': int})
+}
+
+
+def load_inputs(utils: Utilities, names: List[str], use_database: bool = True) -> Tuple[Dict[str, pd.DataFrame], Dict[str, str]]:
+    """
+    Loads the inputs concurrently, each from the database or its CSV export (see Utilities.run_query_batch()).
+
+    Inputs that can be loaded from neither are left out; the figures needing them are skipped.
+
+    Returns:
+    tuple: (input name mapped to its frame, input name mapped to its source: 'database' or the CSV path).
+    """
+
+    results = utils.run_query_batch({name: INPUTS[name] for name in names}, use_database=use_database)
+    frames, sources = {}, {}
+    for name, result in results.items():
+        if result.source is None or result.frame.empty:
+            print(f"Input '{name}' is not available; figures using it are skipped")
+            continue
+        frames[name] = result.frame
+        sources[name] = 'database' if result.source in ('database', 'cache') else result.source
+
+    return frames, sources
+
+
+def frame_fingerprint(df: pd.DataFrame) -> str:
+    """
+    Content hash of a frame: its column names, dtypes and every value.
+    """
+
+    digest = hashlib.sha256()
+    digest.update(json.dumps([[col, str(dtype)] for col, dtype in df.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+############################## Shared Derivations ##############################
+
+def statewise_with_student_counts(frames: dict) -> pd.DataFrame:
+    df = pd.merge(frames['student_counts_by_state_year'], frames['tech_vocational_expenditures'],
+                  how='inner', on=['state', 'year'], validate="many_to_many")
+    df['cost_per_student'] = df['amount'] / df['student_count']
+    return df
+
+
+def yearly_cost_per_student_by_title(frames: dict) -> pd.DataFrame:
+    df = statewise_with_student_counts(frames).groupby(['year', 'expenditure_title'])['cost_per_student'].sum().reset_index()
+    df = df.sort_values(by=['expenditure_title', 'year'])
+    df['growth_rate'] = df.groupby('expenditure_title')['cost_per_student'].pct_change() * 100
+    return df
+
+
+def regionwise_expenditures(frames: dict) -> pd.DataFrame:
+    expenditures = frames['tech_vocational_expenditures'].groupby(['region', 'year', 'expenditure_title'])['amount'].sum().reset_index()
+    student_counts = frames['student_counts_by_state_year'].groupby(['region', 'year'])['student_count'].sum().reset_index()
+    df = expenditures.merge(student_counts, how='inner', on=['region', 'year'], sort=True)
+    df['cost_per_student'] = df['amount'] / df['student_count']
+    return df
+
+
+def regionwise_totals(frames: dict) -> pd.DataFrame:
+    df = regionwise_expenditures(frames).groupby(['region', 'year'])['amount'].sum().reset_index()
+    df = df.sort_values(by=['region', 'year'])
+    df['yearly_difference'] = df.groupby('region')['amount'].diff()
+    df['growth_rate'] = df.groupby('region')['amount'].pct_change() * 100
+    return df
+
+
+def yearly_funding(funding: pd.DataFrame) -> pd.DataFrame:
+    return funding[['year', 'revenue_amount']].groupby('year')['revenue_amount'].sum().reset_index()
+
+
+############################## Figures ##############################
+
+def expenditures_comparison(frames: dict, utils: Utilities) -> go.Figure:
+    statewise = statewise_with_student_counts(frames)
+    total_expenditures_yearly = statewise.groupby('year')['amount'].sum().reset_index()
+    total_line = px.line(total_expenditures_yearly, x='year', y='amount',
+                         title='Tech and Vocational Education Expenditures Over Time')
+    title_line = px.line(statewise.groupby(['year', 'expenditure_title'])['amount'].sum().reset_index(),
+                         x='year', y='amount', color='expenditure_title', title='Expenditures by Title Over Time')
+
+    fig = utils.create_combined_figure(total_line, title_line, 'Tech and Vocational Education Expenditures Comparison',
+                                       ('Total Expenditures Over Time', 'Expenditures by Title Over Time'))
+    total_2015 = utils.get_year_total(total_expenditures_yearly, 2015, 'amount')
+    fig.add_annotation(x=2015, y=total_2015 - 100000000, xref="x", yref="y", text="NCLB End, ESSA Start",
+                       showarrow=True, arrowhead=5, ax=60, ay=50)
+    return fig
+
+
+def cost_per_student_comparison(frames: dict, utils: Utilities) -> go.Figure:
+    by_title = yearly_cost_per_student_by_title(frames)
+    annual_total = by_title.groupby('year')['cost_per_student'].sum().reset_index()
+    total_line = px.line(annual_total, x='year', y='cost_per_student', title='Tech and Vocational Cost per Student by Year')
+    title_line = px.line(by_title, x='year', y='cost_per_student', color='expenditure_title',
+                         title='Tech and Vocational Cost per Student by Year & Expenditure Title')
+    return utils.create_combined_figure(total_line, title_line, 'Tech and Vocational Education Costs per Student Comparison',
+                                        ('Tech & Vocational Cost per Student Over Time',
+                                         'Tech & Vocational Cost per Student by Title Over Time'))
+
+
+def cost_per_student_growth(frames: dict, utils: Utilities) -> go.Figure:
+    return px.line(yearly_cost_per_student_by_title(frames), x='year', y='growth_rate', color='expenditure_title',
+                   title='Tech and Vocational Cost per Student Growth Rate Trends by Year & Expenditure Title')
+
+
+def student_population(frames: dict, utils: Utilities) -> go.Figure:
+    by_year = frames['student_counts_by_state_year'][['year', 'student_count']].groupby('year')['student_count'].sum().reset_index()
+    by_year['difference_from_prev_year'] = by_year['student_count'].diff()
+
+    population_bar = px.bar(by_year, x='year', y='student_count', log_y=True, title='Student Population by Year')
+    waterfall = go.Figure(go.Waterfall(name="Year to Year Changes in Student Population", orientation="v",
+                                       measure=["relative"] * len(by_year), x=by_year['year'],
+                                       textposition="outside", y=by_year['difference_from_prev_year']))
+    fig = utils.create_combined_figure(population_bar, waterfall, "Student Population Trends Over Time",
+                                       ('Student Population by Year', 'Student Population Change from Previous Year'))
+    fig.update_yaxes(type="log", row=1, col=1)
+    return fig
+
+
+def funding_by_source(frames: dict, utils: Utilities) -> go.Figure:
+    funding = frames['funding_data']
+    federal_line = px.line(yearly_funding(funding[funding['funding_source'] == 'federal']), x='year', y='revenue_amount',
+                           color_discrete_sequence=['grey'], title='Federal Revenue Trends Over Time')
+    state_line = px.line(yearly_funding(funding[funding['funding_source'] == 'state']), x='year', y='revenue_amount',
+                         title='State Revenue Trends Over Time')
+    return utils.create_combined_figure(federal_line, state_line, 'Funding Trends Over Time by Funding Source',
+                                        ('Federal Revenue Trends', 'State Revenue Trends'))
+
+
+def expenditure_vs_funding(frames: dict, utils: Utilities) -> go.Figure:
+    expenditures_line = px.line(statewise_with_student_counts(frames).groupby('year')['amount'].sum().reset_index(),
+                                x='year', y='amount', title='Tech and Vocational Education Expenditures Over Time')
+    funding_line = px.line(yearly_funding(frames['funding_data']), x='year', y='revenue_amount',
+                           title='Total Revenue Trends Over Time')
+    return utils.create_combined_figure(expenditures_line, funding_line, "National Trends in Expenditures & Funding Over Time",
+                                        ('Total Tech & Vocational Expenditures', 'Total Funding (Federal & State Sourced)'))
+
+
+def national_vs_regional(frames: dict, utils: Utilities) -> go.Figure:
+    totals = regionwise_totals(frames)
+    national_line = px.line(totals.groupby('year')['amount'].sum().reset_index(), x='year', y='amount',
+                            title='Tech and Vocational Education Expenditures Over Time')
+    regional_line = px.line(totals, x='year', y='amount', color='region',
+                            title='Tech and Vocational Education Expenditures by Region Over Time',
+                            hover_data={'yearly_difference': ':.2f', 'growth_rate': ':.2f'})
+    return utils.create_combined_figure(national_line, regional_line,
+                                        title='National vs Regionwise Tech & Vocational Education Trends',
+                                        subplot_titles=('National', 'Regional'))
+
+
+def regional_trends_by_title(frames: dict, utils: Utilities) -> go.Figure:
+    df = regionwise_expenditures(frames).sort_values(by=['region', 'expenditure_title', 'year'])
+    df['yearly_difference'] = df.groupby(['region', 'expenditure_title'])['amount'].diff()
+    df['growth_rate'] = df.groupby(['region', 'expenditure_title'])['amount'].pct_change() * 100
+    return utils.make_line_plot_grid(df, x='year', y='amount', color='expenditure_title', facet_col='region',
+                                     facet_col_wrap=2, title='Regionwise Expensiture Trends by Title',
+                                     hover_data=['yearly_difference', 'growth_rate'])
+
+
+def regional_growth(frames: dict, utils: Utilities) -> go.Figure:
+    totals = regionwise_totals(frames)
+    fig = utils.make_line_plot_grid(totals, x='year', y='growth_rate', color='region', facet_col='region',
+                                    facet_col_wrap=2,
+                                    title='Tech and Vocational Education Expenditure Growth by Region Over Time',
+                                    hover_data=['yearly_difference'])
+    fig.update_traces(hovertemplate="<br>".join(["Year: %{x}",
+                                                 "Growth Rate: %{y:.2f}%",
+                                                 "Yearly Difference: %{customdata[0]:.2f}"]))
+    return fig
+
+
+@dataclass(frozen=True)
+class ReportFigure:
+    """
+    One figure of the report.
+
+    Attributes:
+    name (str): File-safe identifier, also the figure's div id.
+    section (str): Page the figure appears on (a key of SECTIONS).
+    inputs (tuple): Names of the INPUTS the figure is built from; a change to any of them rebuilds it.
+    build (callable): build(frames, utils) -> go.Figure.
+    """
+
+    name: str
+    section: str
+    inputs: Tuple[str, ...]
+    build: Callable[[dict, Utilities], go.Figure]
+
+
+EXPENDITURE_INPUTS = ('tech_vocational_expenditures', 'student_counts_by_state_year')
+
+FIGURES = [
+    ReportFigure('expenditures_comparison', 'national', EXPENDITURE_INPUTS, expenditures_comparison),
+    ReportFigure('cost_per_student_comparison', 'national', EXPENDITURE_INPUTS, cost_per_student_comparison),
+    ReportFigure('cost_per_student_growth', 'national', EXPENDITURE_INPUTS, cost_per_student_growth),
+    ReportFigure('student_population', 'national', ('student_counts_by_state_year',), student_population),
+    ReportFigure('funding_by_source', 'national', ('funding_data',), funding_by_source),
+    ReportFigure('expenditure_vs_funding', 'national', EXPENDITURE_INPUTS + ('funding_data',), expenditure_vs_funding),
+    ReportFigure('national_vs_regional', 'regional', EXPENDITURE_INPUTS, national_vs_regional),
+    ReportFigure('regional_trends_by_title', 'regional', EXPENDITURE_INPUTS, regional_trends_by_title),
+    ReportFigure('regional_growth', 'regional', EXPENDITURE_INPUTS, regional_growth)
+]
+
+FIGURES_BY_NAME = {figure.name: figure for figure in FIGURES}
+
+
+def referenced_names(code) -> set:
+    """
+    Global names a code object uses, including those of its nested functions, lambdas and comprehensions.
+    """
+
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            names |= referenced_names(constant)
+    return names
+
+
+def build_sources(build: Callable) -> List[str]:
+    """
+    Source of a build function and of every function of this module it calls, directly or through other helpers
+    (e.g. regional_growth -> regionwise_totals -> regionwise_expenditures).
+    """
+
+    functions, pending = {}, [build]
+    while pending:
+        function = pending.pop()
+        if function.__name__ in functions:
+            continue
+        functions[function.__name__] = function
+        for name in referenced_names(function.__code__):
+            helper = globals().get(name)
+            if inspect.isfunction(helper) and helper.__module__ == __name__:
+                pending.append(helper)
+    return [inspect.getsource(functions[name]) for name in sorted(functions)]
+
+
+def figure_key(figure: ReportFigure, fingerprints: Dict[str, str]) -> str:
+    """
+    Build key of a figure: its inputs' fingerprints, the source of its build function and the helpers it calls,
+    the source of the Utilities modules and the plotly version.
+    """
+
+    content = {'inputs': {name: fingerprints[name] for name in figure.inputs},
+               'source': build_sources(figure.build),
+               'helpers': {name: inspect.getsource(importlib.import_module(name)) for name in FIGURE_HELPER_MODULES},
+               'plotly': plotly.__version__,
+               'format': REPORT_FORMAT_VERSION}
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+############################## Rendering ##############################
+
+# Frames of the current build, set once per worker process by init_worker()
+_FRAMES = {}
+
+
+def init_worker(frames: Dict[str, pd.DataFrame]) -> None:
+    global _FRAMES
+    _FRAMES = frames
+
+
+def render_figure(name: str) -> dict:
+    """
+    Builds one figure from the worker's frames and serializes it to an HTML fragment without plotly.js.
+
+    Returns:
+    dict: name, html, build_seconds, serialize_seconds and bytes.
+    """
+
+    figure = FIGURES_BY_NAME[name]
+    start = time.perf_counter()
+    fig = figure.build({input_name: _FRAMES[input_name] for input_name in figure.inputs}, Utilities())
+    built = time.perf_counter()
+    html = pio.to_html(fig, full_html=False, include_plotlyjs=False, div_id=name)
+    return {'name': name, 'html': html,
+            'build_seconds': built - start,
+            'serialize_seconds': time.perf_counter() - built,
+            'bytes': len(html.encode())}
+
+
+def write_text(path: str, text: str) -> None:
+    # Written under a temporary name first, so an interrupted build never leaves half a file
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as outfile:
+        outfile.write(text)
+    os.replace(tmp_path, path)
+
+
+def page_html(title: str, fragments: List[str], links: str = '') -> str:
+    body = '\n'.join(f'<div class="figure">{fragment}</div>' for fragment in fragments)
+    return (f'<!DOCTYPE html>\n<html>\n<head>\n<meta charset="utf-8">\n<title>{title}</title>\n'
+            f'<script src="{PLOTLY_JS_FILE}"></script>\n</head>\n<body>\n<h1>{title}</h1>\n{links}\n{body}\n</body>\n</html>\n')
+
+
+############################## Report Builder ##############################
+
+class ReportBuilder:
+    """
+    Builds the analysis figures into a static HTML bundle.
+
+    Layout:
+    <root>/plotly.min.js               one copy, referenced by every page
+    <root>/index.html                  links to the section pages
+    <root>/<section>.html              figures of one section
+    <root>/figures/<name>.html         serialized figure fragments, reused when their inputs are unchanged
+    <root>/manifest.json               input fingerprints and per-figure build keys and timings
+    """
+
+    def __init__(self, root: str = REPORT_PATH):
+        self.root = root
+        self.figures_dir = os.path.join(root, 'figures')
+
+
+    def read_manifest(self) -> dict:
+        try:
+            with open(os.path.join(self.root, MANIFEST_FILE)) as infile:
+                return json.load(infile)
+        except (FileNotFoundError, ValueError):
+            return {'figures': {}, 'inputs': {}}
+
+
+    def stale_figures(self, figures: List[ReportFigure], fingerprints: Dict[str, str], manifest: dict) -> List[ReportFigure]:
+        """
+        Figures whose build key changed since the last build, or whose fragment is missing.
+        """
+
+        stale = []
+        for figure in figures:
+            entry = manifest['figures'].get(figure.name, {})
+            fragment_path = os.path.join(self.figures_dir, f'{figure.name}.html')
+            if entry.get('key') != figure_key(figure, fingerprints) or not os.path.exists(fragment_path):
+                stale.append(figure)
+        return stale
+
+
+    def build(self, utils: Optional[Utilities] = None, figure_names: Optional[List[str]] = None, workers: int = 1,
+              force: bool = False, use_database: bool = True) -> pd.DataFrame:
+        """
+        Loads the shared inputs once, rebuilds the figures whose inputs changed across a process pool and
+        rewrites the pages.
+
+        Parameters:
+        utils (Utilities, optional): Used to load the inputs (its query cache applies).
+        figure_names (List[str], optional): Figures to consider. All figures if None.
+        workers (int): Worker processes building and serializing figures. 1 builds in this process.
+        force (bool): Rebuild every figure even if its inputs are unchanged.
+        use_database (bool): Load inputs from the database when reachable; otherwise only from CSV exports.
+
+        Returns:
+        pd.DataFrame: One row per figure with its status ('built', 'unchanged' or 'skipped') and timings.
+                      A figure is skipped when one of its inputs is unavailable; its last built fragment is kept.
+        """
+
+        run_start = time.perf_counter()
+        utils = utils if utils is not None else Utilities()
+        figures = [FIGURES_BY_NAME[name] for name in figure_names] if figure_names else list(FIGURES)
+        os.makedirs(self.figures_dir, exist_ok=True)
+
+        input_names = list(dict.fromkeys(name for figure in figures for name in figure.inputs))
+        frames, sources = load_inputs(utils, input_names, use_database)
+        fingerprints = {name: frame_fingerprint(df) for name, df in frames.items()}
+        load_seconds = time.perf_counter() - run_start
+
+        manifest = self.read_manifest()
+        available = [figure for figure in figures if all(name in frames for name in figure.inputs)]
+        to_build = available if force else self.stale_figures(available, fingerprints, manifest)
+
+        results = self._render([figure.name for figure in to_build], frames, workers)
+        for result in results:
+            write_text(os.path.join(self.figures_dir, f"{result['name']}.html"), result['html'])
+            manifest['figures'][result['name']] = {'key': figure_key(FIGURES_BY_NAME[result['name']], fingerprints),
+                                                   'build_seconds': result['build_seconds'],
+                                                   'serialize_seconds': result['serialize_seconds'],
+                                                   'bytes': result['bytes']}
+
+        manifest['inputs'] = {name: {'fingerprint': fingerprints[name], 'source': sources[name], 'rows': len(frames[name])}
+                              for name in frames}
+        self._write_plotly_js(manifest)
+        self._write_pages()
+        write_text(os.path.join(self.root, MANIFEST_FILE), json.dumps(manifest, indent=2, sort_keys=True))
+
+        built = {result['name']: result for result in results}
+        rows = []
+        for figure in figures:
+            status = 'built' if figure.name in built else 'unchanged' if figure in available else 'skipped'
+            rows.append({'figure': figure.name, 'section': figure.section, 'status': status,
+                         'build_seconds': built.get(figure.name, {}).get('build_seconds'),
+                         'serialize_seconds': built.get(figure.name, {}).get('serialize_seconds'),
+                         'bytes': manifest['figures'].get(figure.name, {}).get('bytes')})
+
+        print(f"Loaded {len(frames)} inputs in {load_seconds:.1f}s, built {len(results)} of {len(figures)} figures, "
+              f"total {time.perf_counter() - run_start:.1f}s (wall clock)")
+        return pd.DataFrame(rows)
+
+
+    def _render(self, names: List[str], frames: Dict[str, pd.DataFrame], workers: int) -> List[dict]:
+        if not names:
+            return []
+        if workers <= 1:
+            init_worker(frames)
+            return [render_figure(name) for name in names]
+
+        # Frames are sent to each worker once, not with every figure
+        with ProcessPoolExecutor(max_workers=min(workers, len(names)), initializer=init_worker, initargs=(frames,)) as executor:
+            return list(executor.map(render_figure, names))
+
+
+    def _write_plotly_js(self, manifest: dict) -> None:
+        path = os.path.join(self.root, PLOTLY_JS_FILE)
+        if manifest.get('plotly') != plotly.__version__ or not os.path.exists(path):
+            write_text(path, plotly.offline.get_plotlyjs())
+            manifest['plotly'] = plotly.__version__
+
+
+    def _write_pages(self) -> None:
+        """
+        Assembles every section page from the fragments on disk, so unchanged figures are not re-serialized.
+        """
+
+        links = ' | '.join(f'<a href="{section}.html">{title}</a>' for section, title in SECTIONS.items())
+        for section, title in SECTIONS.items():
+            fragments = []
+            for figure in FIGURES:
+                fragment_path = os.path.join(self.figures_dir, f'{figure.name}.html')
+                if figure.section == section and os.path.exists(fragment_path):
+                    with open(fragment_path, encoding='utf-8') as infile:
+                        fragments.append(infile.read())
+            write_text(os.path.join(self.root, f'{section}.html'), page_html(title, fragments, links))
+
+        write_text(os.path.join(self.root, 'index.html'), page_html('LEA Finance Survey Reports', [], links))
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Build the analysis figures into a static HTML report.")
+    parser.add_argument('--output', default=REPORT_PATH, help=f"Report directory (default: {REPORT_PATH}).")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Processes building figures in parallel (default: number of CPUs).")
+    parser.add_argument('--figures', nargs='+', choices=list(FIGURES_BY_NAME), help="Only these figures.")
+    parser.add_argument('--force', action='store_true', help="Rebuild every figure, even if its inputs are unchanged.")
+    parser.add_argument('--no-database', action='store_true', help="Load inputs from the CSV exports only.")
+    args = parser.parse_args(argv)
+
+    results = ReportBuilder(args.output).build(figure_names=args.figures, workers=args.workers, force=args.force,
+                                               use_database=not args.no_database)
+    print(results.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,606 @@
+import os
+import re
+import json
+import argparse
+from typing import Dict, List, Optional
+import pandas as pd
+from column_mapping import ColumnMappingRegistry, TABLE_SCHEMAS
+from expenditures import TitleCategory, TitleRegistry, sql_code_filter
+from long_format import LONG_TABLES
+from bulk_loader import quote_identifier
+from query_cache import bump_data_version
+
+
+SQL_QUERIES_DIR = os.path.join("..", "SQL Queries")
+
+SURVEY_FISCAL_YEARS = range(2010, 2021)
+
+# Column types as DataFrame.to_sql creates them, so both loaders keep writing the same values
+COLUMN_TYPES = {'NUMERIC': 'DOUBLE PRECISION', 'BOOLEAN': 'BOOLEAN', 'DATE': 'TIMESTAMP'}
+DEFAULT_COLUMN_TYPE = 'TEXT'
+
+# PostgreSQL truncates longer identifiers, so some workbook flag names only exist in their truncated form
+MAX_IDENTIFIER_LENGTH = 63
+
+# Integer fiscal year derived from the 'year' timestamp; generated, so loaders never write it
+FISCAL_YEAR_COLUMN = 'fiscal_year'
+FISCAL_YEAR_DEFINITION = f"{FISCAL_YEAR_COLUMN} INTEGER GENERATED ALWAYS AS (EXTRACT(YEAR FROM year)::integer) STORED"
+
+# Dictionary of expenditure and revenue titles; the long tables reference it through title_code
+TITLE_DIMENSION = ('dimension', 'titles')
+TITLE_DIMENSION_DDL = """
+CREATE TABLE IF NOT EXISTS dimension.titles (
+    title_code SMALLINT PRIMARY KEY,
+    table_name TEXT NOT NULL,
+    title TEXT NOT NULL,
+    categories TEXT[] NOT NULL,
+    UNIQUE (table_name, title)
+);
+"""
+
+# Sentinel codes replaced by NaN during cleaning (column_mapping.SENTINEL_TABLE): one row per replaced value
+SENTINEL_TABLE_DDL = f"""
+CREATE SCHEMA IF NOT EXISTS entity;
+CREATE TABLE IF NOT EXISTS entity.sentinel_codes (
+    census_id TEXT NOT NULL,
+    year TIMESTAMP NOT NULL,
+    column_name TEXT NOT NULL,
+    sentinel SMALLINT NOT NULL,
+    {FISCAL_YEAR_DEFINITION}
+);
+CREATE INDEX IF NOT EXISTS sentinel_codes_census_id_idx ON entity.sentinel_codes (census_id, {FISCAL_YEAR_COLUMN});
+"""
+
+ZSCORE_VIEW = ('expenses', 'expenditure_zscores_by_state_year')
+ZSCORE_VIEW_FILE = 'MaterializedView_Z-Scores_Expenditures.sql'
+ZSCORE_VIEW_KEY = ['census_id', 'expenditure_title', 'year']
+
+# Views and materialized views that (directly or through other views) read from a table, innermost first
+DEPENDENT_VIEWS_QUERY = """
+WITH RECURSIVE dependents AS (
+    SELECT r.ev_class AS oid, 1 AS depth
+    FROM pg_depend AS d
+    INNER JOIN pg_rewrite AS r ON r.oid = d.objid
+    WHERE d.refobjid = %s::regclass AND r.ev_class <> d.refobjid
+    UNION
+    SELECT r.ev_class, dependents.depth + 1
+    FROM dependents
+    INNER JOIN pg_depend AS d ON d.refobjid = dependents.oid
+    INNER JOIN pg_rewrite AS r ON r.oid = d.objid
+    WHERE r.ev_class <> d.refobjid
+)
+SELECT n.nspname, c.relname, c.relkind, pg_get_viewdef(c.oid), MAX(dependents.depth) AS depth
+FROM dependents
+INNER JOIN pg_class AS c ON c.oid = dependents.oid
+INNER JOIN pg_namespace AS n ON n.oid = c.relnamespace
+GROUP BY n.nspname, c.relname, c.relkind, c.oid
+ORDER BY depth;
+"""
+
+
+############################## Table Definitions ##############################
+
+def column_definitions(registry: ColumnMappingRegistry, table: str) -> Dict[str, str]:
+    """
+    Returns every column a table receives in any survey year, in first-seen order, mapped to its SQL type.
+
+    Long tables get their title and measure columns in place of the wide measure columns.
+    """
+
+    columns = {}
+    flag_columns = set()
+    for year in registry.years:
+        mapping = registry[year]
+        for col in mapping.table_columns[table]:
+            expected_type = mapping.new_types.get(col, '')
+            columns.setdefault(col[:MAX_IDENTIFIER_LENGTH], COLUMN_TYPES.get(expected_type, DEFAULT_COLUMN_TYPE))
+            if col.endswith('_flag'):
+                flag_columns.add(col[:MAX_IDENTIFIER_LENGTH])
+
+    if table in LONG_TABLES:
+        _, title_column, value_column = LONG_TABLES[table]
+        long_columns = {'census_id': columns.get('census_id', DEFAULT_COLUMN_TYPE), 'year': 'TIMESTAMP',
+                        title_column: 'TEXT', 'title_code': 'SMALLINT', value_column: 'DOUBLE PRECISION'}
+        long_columns.update({col: sql_type for col, sql_type in columns.items() if col in flag_columns})
+        return long_columns
+    return columns
+
+
+def index_definitions(schema: str, table: str) -> List[str]:
+    """
+    Returns the CREATE INDEX statements of a table, for the joins and filters used by the shipped queries.
+    """
+
+    qualified = f'{quote_identifier(schema)}.{quote_identifier(table)}'
+    if table == 'entity':
+        return [f"CREATE INDEX IF NOT EXISTS entity_state_idx ON {qualified} (state);"]
+    if table == 'annual_stats':
+        return [f"CREATE INDEX IF NOT EXISTS annual_stats_census_id_idx ON {qualified} (census_id, {FISCAL_YEAR_COLUMN});",
+                f"CREATE INDEX IF NOT EXISTS annual_stats_fall_membership_idx ON {qualified} (fall_membership);"]
+
+    return [f"CREATE INDEX IF NOT EXISTS {table}_census_id_idx ON {qualified} (census_id);",
+            f"CREATE INDEX IF NOT EXISTS {table}_title_code_year_idx ON {qualified} (title_code, {FISCAL_YEAR_COLUMN});",
+            f"CREATE INDEX IF NOT EXISTS {table}_fiscal_year_idx ON {qualified} ({FISCAL_YEAR_COLUMN});"]
+
+
+def create_table_sql(schema: str, table: str, columns: Dict[str, str], fiscal_years=SURVEY_FISCAL_YEARS) -> List[str]:
+    """
+    Returns the statements creating a table. Long tables are range-partitioned by year, one partition per
+    fiscal year plus a default partition for years outside fiscal_years.
+    """
+
+    qualified = f'{quote_identifier(schema)}.{quote_identifier(table)}'
+    column_sql = [f'{quote_identifier(col)} {sql_type}' for col, sql_type in columns.items()]
+    if table == 'entity':
+        column_sql = [sql + ' PRIMARY KEY' if col == 'census_id' else sql for col, sql in zip(columns, column_sql)]
+    if 'year' in columns:
+        column_sql.append(FISCAL_YEAR_DEFINITION)
+
+    if table not in LONG_TABLES:
+        return [f"CREATE TABLE {qualified} ({', '.join(column_sql)});"]
+
+    statements = [f"CREATE TABLE {qualified} ({', '.join(column_sql)}) PARTITION BY RANGE (year);"]
+    for fiscal_year in fiscal_years:
+        statements.append(year_partition_sql(schema, table, fiscal_year))
+    statements.append(f"CREATE TABLE IF NOT EXISTS {quote_identifier(schema)}.{quote_identifier(table + '_default')} "
+                      f"PARTITION OF {qualified} DEFAULT;")
+    return statements
+
+
+def year_partition_sql(schema: str, table: str, fiscal_year: int) -> str:
+    return (f"CREATE TABLE IF NOT EXISTS {quote_identifier(schema)}.{quote_identifier(f'{table}_{fiscal_year}')} "
+            f"PARTITION OF {quote_identifier(schema)}.{quote_identifier(table)} "
+            f"FOR VALUES FROM ('{fiscal_year}-01-01') TO ('{fiscal_year + 1}-01-01');")
+
+
+############################## Catalog Helpers ##############################
+
+def table_kind(cur, schema: str, table: str) -> Optional[str]:
+    """
+    Returns 'r' for a plain table, 'p' for a partitioned table, or None if the table does not exist.
+    """
+
+    cur.execute("SELECT c.relkind FROM pg_class AS c INNER JOIN pg_namespace AS n ON n.oid = c.relnamespace "
+                "WHERE n.nspname = %s AND c.relname = %s;", (schema, table))
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def existing_columns(cur, schema: str, table: str) -> List[str]:
+    cur.execute("SELECT column_name FROM information_schema.columns WHERE table_schema = %s AND table_name = %s "
+                "ORDER BY ordinal_position;", (schema, table))
+    return [row[0] for row in cur.fetchall()]
+
+
+def save_dependent_views(cur, schema: str, table: str) -> List[dict]:
+    """
+    Captures the definition and indexes of every view reading from a table, so they can be dropped and recreated.
+    """
+
+    cur.execute(DEPENDENT_VIEWS_QUERY, (f'{quote_identifier(schema)}.{quote_identifier(table)}',))
+    views = []
+    for view_schema, view_name, kind, definition, depth in cur.fetchall():
+        cur.execute("SELECT indexdef FROM pg_indexes WHERE schemaname = %s AND tablename = %s;", (view_schema, view_name))
+        views.append({'schema': view_schema, 'name': view_name, 'materialized': kind == 'm',
+                      'definition': definition, 'depth': depth, 'indexes': [row[0] for row in cur.fetchall()]})
+    return views
+
+
+def recreate_views(cur, views: List[dict]) -> None:
+    # Innermost views first, so views built on other views find them
+    created = set()
+    for view in sorted(views, key=lambda view: view['depth']):
+        key = (view['schema'], view['name'])
+        if key in created:
+            continue
+        kind = 'MATERIALIZED VIEW' if view['materialized'] else 'VIEW'
+        cur.execute(f"CREATE {kind} {quote_identifier(view['schema'])}.{quote_identifier(view['name'])} "
+                    f"AS {view['definition'].rstrip().rstrip(';')};")
+        for index_definition in view['indexes']:
+            cur.execute(index_definition)
+        created.add(key)
+
+
+############################## Apply Schema ##############################
+
+def apply_schema(engine, registry: Optional[ColumnMappingRegistry] = None, fiscal_years=SURVEY_FISCAL_YEARS,
+                 sql_dir: str = SQL_QUERIES_DIR) -> None:
+    """
+    Brings the database to the partitioned, indexed layout in one transaction.
+
+    - Missing tables are created from the column-mapping workbook.
+    - expenditures and the three revenue tables are range-partitioned by year, one partition per fiscal year.
+      Existing plain tables are migrated: their rows are copied into the partitioned table, and views reading
+      from them are dropped and recreated with the same definition.
+    - Every table with a 'year' timestamp gets an integer fiscal_year column, generated from it.
+    - The title dimension table is synced with every title of the workbook. The long tables get a title_code
+      column referencing it, backfilled for existing rows, and revenue.funding_view selects by code.
+    - Indexes are created on census_id, title code and fiscal year (and fall_membership for annual_stats).
+    - The sentinel code table is created if missing.
+    - The z-score materialized view is created if missing and gets a unique index, so it can be refreshed concurrently.
+
+    Parameters:
+    engine (sqlalchemy.engine.Engine): Database to change.
+    registry (ColumnMappingRegistry, optional): Compiled column mappings. Loaded from the cache if None.
+    fiscal_years (iterable of int): Four-digit fiscal years that get their own partition.
+    sql_dir (str): Directory of the shipped SQL files.
+    """
+
+    registry = registry if registry is not None else ColumnMappingRegistry().load()
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        for schema in sorted(set(TABLE_SCHEMAS.values()) | {TITLE_DIMENSION[0]}):
+            cur.execute(f"CREATE SCHEMA IF NOT EXISTS {quote_identifier(schema)};")
+        titles = sync_title_dimension(cur, registry)
+
+        # Views over the tables being migrated must be dropped before their tables can be replaced
+        migrations = [table for table, schema in TABLE_SCHEMAS.items()
+                      if table in LONG_TABLES and table_kind(cur, schema, table) == 'r']
+        saved_views = []
+        for table in migrations:
+            saved_views += save_dependent_views(cur, TABLE_SCHEMAS[table], table)
+        for view in sorted(saved_views, key=lambda view: -view['depth']):
+            kind = 'MATERIALIZED VIEW' if view['materialized'] else 'VIEW'
+            cur.execute(f"DROP {kind} IF EXISTS {quote_identifier(view['schema'])}.{quote_identifier(view['name'])};")
+
+        for table, schema in TABLE_SCHEMAS.items():
+            columns = column_definitions(registry, table)
+            kind = table_kind(cur, schema, table)
+
+            if kind is None:
+                for statement in create_table_sql(schema, table, columns, fiscal_years):
+                    cur.execute(statement)
+            elif table in migrations:
+                migrate_to_partitioned(cur, schema, table, columns, fiscal_years)
+            else:
+                add_fiscal_year(cur, schema, table)
+                if kind == 'p':
+                    for fiscal_year in fiscal_years:
+                        cur.execute(year_partition_sql(schema, table, fiscal_year))
+
+            if table in LONG_TABLES:
+                backfill_title_codes(cur, schema, table)
+
+            for index_definition in index_definitions(schema, table):
+                cur.execute(index_definition)
+
+        cur.execute(SENTINEL_TABLE_DDL)
+        recreate_views(cur, saved_views)
+        ensure_funding_view(cur, titles)
+        ensure_zscore_view(cur, sql_dir)
+
+        conn.commit()
+        cur.close()
+        bump_data_version()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def sync_title_dimension(cur, registry: ColumnMappingRegistry) -> TitleRegistry:
+    """
+    Creates the title dimension table and adds the workbook's new titles to it. Codes already in the
+    table are kept; categories are rewritten so rule changes in expenditures.py reach the database.
+
+    Returns:
+    TitleRegistry: The dictionary as stored in the database.
+    """
+
+    cur.execute(TITLE_DIMENSION_DDL)
+    cur.execute("SELECT title_code, table_name, title, categories FROM dimension.titles;")
+    existing = pd.DataFrame(cur.fetchall(), columns=['title_code', 'table_name', 'title', 'categories'])
+    titles = TitleRegistry.from_mappings(registry, existing=TitleRegistry.from_frame(existing))
+
+    for row in titles.to_frame().itertuples(index=False):
+        cur.execute("""
+            INSERT INTO dimension.titles (title_code, table_name, title, categories) VALUES (%s, %s, %s, %s)
+            ON CONFLICT (title_code) DO UPDATE SET categories = EXCLUDED.categories;
+        """, (row.title_code, row.table_name, row.title, row.categories))
+    return titles
+
+
+def load_title_registry(engine) -> Optional[TitleRegistry]:
+    """
+    Returns the title dictionary stored in the database, or None if the schema has no title codes yet
+    (apply_schema() has not been run).
+    """
+
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        schema, table = TITLE_DIMENSION
+        has_codes = 'title_code' in existing_columns(cur, TABLE_SCHEMAS['expenditures'], 'expenditures')
+        if table_kind(cur, schema, table) is None or not has_codes:
+            return None
+        cur.execute("SELECT title_code, table_name, title, categories FROM dimension.titles;")
+        titles = pd.DataFrame(cur.fetchall(), columns=['title_code', 'table_name', 'title', 'categories'])
+        cur.close()
+        return TitleRegistry.from_frame(titles)
+    finally:
+        conn.close()
+
+
+def ensure_sentinel_table(engine) -> None:
+    """
+    Creates entity.sentinel_codes if it is missing, so the COPY loader can write to it without apply_schema().
+    """
+
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(SENTINEL_TABLE_DDL)
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def backfill_title_codes(cur, schema: str, table: str) -> None:
+    """
+    Adds the title_code column to a long table if it is missing and fills it for rows loaded without codes.
+    """
+
+    _, title_column, _ = LONG_TABLES[table]
+    qualified = f'{quote_identifier(schema)}.{quote_identifier(table)}'
+    if 'title_code' not in existing_columns(cur, schema, table):
+        cur.execute(f"ALTER TABLE {qualified} ADD COLUMN title_code SMALLINT;")
+
+    cur.execute(f"""
+        UPDATE {qualified} AS t SET title_code = d.title_code
+        FROM dimension.titles AS d
+        WHERE d.table_name = %s AND d.title = t.{quote_identifier(title_column)} AND t.title_code IS NULL;
+    """, (table,))
+    if cur.rowcount:
+        print(f"Backfilled title codes of {cur.rowcount:,} rows of {schema}.{table}")
+
+
+def funding_view_sql(titles: TitleRegistry) -> str:
+    """
+    Returns revenue.funding_view (SQL Queries/Funding_View.sql) with its title lists replaced by title code sets.
+    """
+
+    sources = []
+    for table, alias, source in (('federal_revenue', 'fed', 'federal'), ('state_revenue', 'st', 'state')):
+        codes = titles.codes(table, categories=[TitleCategory.FUNDING_PROGRAM])
+        sources.append(f"""{source}_funding AS (
+    SELECT
+        {alias}.census_id,
+        e.state,
+        DATE_PART('year', {alias}.year) AS year,
+        {alias}.revenue_title,
+        {alias}.revenue AS revenue_amount,
+        '{source}' AS funding_source
+    FROM revenue.{table} AS {alias}
+    INNER JOIN entity.entity AS e
+    ON {alias}.census_id = e.census_id
+    WHERE {sql_code_filter(f'{alias}.title_code', codes)}
+    AND revenue > 0
+)""")
+
+    return (f"CREATE OR REPLACE VIEW revenue.funding_view AS\nWITH {sources[0]},\n\n{sources[1]}\n"
+            f"SELECT * FROM federal_funding\nUNION\nSELECT * FROM state_funding;")
+
+
+def ensure_funding_view(cur, titles: TitleRegistry) -> None:
+    # A funding_view changed by hand to other columns is left alone
+    cur.execute("SAVEPOINT funding_view;")
+    try:
+        cur.execute(funding_view_sql(titles))
+        cur.execute("RELEASE SAVEPOINT funding_view;")
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT funding_view;")
+        print(f"Could not replace revenue.funding_view with its title-code version. Error: {e}")
+
+
+def add_fiscal_year(cur, schema: str, table: str) -> None:
+    columns = existing_columns(cur, schema, table)
+    if 'year' in columns and FISCAL_YEAR_COLUMN not in columns:
+        cur.execute(f"ALTER TABLE {quote_identifier(schema)}.{quote_identifier(table)} ADD COLUMN {FISCAL_YEAR_DEFINITION};")
+
+
+def migrate_to_partitioned(cur, schema: str, table: str, columns: Dict[str, str], fiscal_years) -> None:
+    """
+    Replaces a plain table with its partitioned version, copying every row. Columns the workbook does not
+    know about are kept with their current type.
+    """
+
+    old_columns = existing_columns(cur, schema, table)
+    cur.execute("SELECT column_name, data_type FROM information_schema.columns WHERE table_schema = %s AND table_name = %s;",
+                (schema, table))
+    old_types = dict(cur.fetchall())
+    for col in old_columns:
+        if col not in columns and col != FISCAL_YEAR_COLUMN:
+            columns[col] = old_types[col]
+
+    old_table = f'{table}_unpartitioned'
+    cur.execute(f"ALTER TABLE {quote_identifier(schema)}.{quote_identifier(table)} RENAME TO {quote_identifier(old_table)};")
+    for statement in create_table_sql(schema, table, columns, fiscal_years):
+        cur.execute(statement)
+
+    copied = ', '.join(quote_identifier(col) for col in old_columns if col != FISCAL_YEAR_COLUMN)
+    cur.execute(f"INSERT INTO {quote_identifier(schema)}.{quote_identifier(table)} ({copied}) "
+                f"SELECT {copied} FROM {quote_identifier(schema)}.{quote_identifier(old_table)};")
+    print(f"Migrated {cur.rowcount:,} rows of {schema}.{table} to a partitioned table")
+    cur.execute(f"DROP TABLE {quote_identifier(schema)}.{quote_identifier(old_table)};")
+
+
+def shipped_query(sql_dir: str, file_name: str) -> str:
+    """
+    Returns the statement of a shipped SQL file without its comments. For CREATE [MATERIALIZED] VIEW files,
+    only the SELECT the view is defined by.
+    """
+
+    with open(os.path.join(sql_dir, file_name)) as infile:
+        sql = infile.read()
+    sql = re.sub(r'/\*.*?\*/', '', sql, flags=re.DOTALL)
+    sql = re.sub(r'--[^\n]*', '', sql).strip().rstrip(';').strip()
+
+    match = re.match(r'CREATE\s+(?:OR\s+REPLACE\s+)?(?:MATERIALIZED\s+)?VIEW\s+\S+\s+AS\s+(.*)', sql, flags=re.DOTALL | re.IGNORECASE)
+    return match.group(1).strip() if match else sql
+
+
+def ensure_zscore_view(cur, sql_dir: str = SQL_QUERIES_DIR) -> None:
+    """
+    Creates the z-score materialized view from its shipped definition if it is missing, and the unique
+    index REFRESH MATERIALIZED VIEW CONCURRENTLY needs.
+    """
+
+    schema, name = ZSCORE_VIEW
+    qualified = f'{quote_identifier(schema)}.{quote_identifier(name)}'
+    if table_kind(cur, schema, name) is None:
+        cur.execute(f"CREATE MATERIALIZED VIEW {qualified} AS {shipped_query(sql_dir, ZSCORE_VIEW_FILE)};")
+
+    # Duplicate rows (e.g. a year appended twice) make the key non-unique; the view then refreshes without CONCURRENTLY
+    cur.execute("SAVEPOINT zscore_key;")
+    try:
+        cur.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {name}_key ON {qualified} ({', '.join(ZSCORE_VIEW_KEY)});")
+        cur.execute(f"CREATE INDEX IF NOT EXISTS {name}_state_year_idx ON {qualified} (state, year);")
+        cur.execute("RELEASE SAVEPOINT zscore_key;")
+    except Exception as e:
+        cur.execute("ROLLBACK TO SAVEPOINT zscore_key;")
+        print(f"Could not create the unique index on {schema}.{name}; it will be refreshed without CONCURRENTLY. Error: {e}")
+
+
+############################## Refresh ##############################
+
+def refresh_zscore_view(engine) -> bool:
+    """
+    Refreshes the z-score materialized view, concurrently when possible so readers are never blocked.
+
+    CONCURRENTLY needs a populated view with a unique index; otherwise a plain refresh is run.
+
+    Returns:
+    bool: True if the refresh ran concurrently.
+    """
+
+    schema, name = ZSCORE_VIEW
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute("""
+            SELECT c.relispopulated,
+                   EXISTS (SELECT 1 FROM pg_index AS i WHERE i.indrelid = c.oid AND i.indisunique AND i.indpred IS NULL)
+            FROM pg_class AS c INNER JOIN pg_namespace AS n ON n.oid = c.relnamespace
+            WHERE n.nspname = %s AND c.relname = %s AND c.relkind = 'm';
+        """, (schema, name))
+        row = cur.fetchone()
+        if row is None:
+            print(f"Materialized view {schema}.{name} does not exist; nothing to refresh")
+            return False
+
+        concurrently = bool(row[0] and row[1])
+        cur.execute(f"REFRESH MATERIALIZED VIEW {'CONCURRENTLY ' if concurrently else ''}"
+                    f"{quote_identifier(schema)}.{quote_identifier(name)};")
+        conn.commit()
+        cur.close()
+        bump_data_version()
+        return concurrently
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+############################## Benchmark ##############################
+
+SHIPPED_QUERY_FILES = ['EducationEntityExpenditureAnalysis.sql',
+                       'Funding_View.sql',
+                       'MaterializedView_Z-Scores_Expenditures.sql',
+                       'Statewise_Yearly_Education_Expenditures_and_Student_Counts.sql']
+
+
+def benchmark_queries(engine, repeats: int = 3, sql_dir: str = SQL_QUERIES_DIR) -> pd.DataFrame:
+    """
+    Runs EXPLAIN (ANALYZE, BUFFERS) on the four shipped queries and collects planning and execution times.
+
+    View files are benchmarked through the SELECT that defines the view. Every run is rolled back.
+
+    Returns:
+    pd.DataFrame: One row per (query, run) with planning_ms, execution_ms, shared buffer hits/reads and the top plan node.
+    """
+
+    results = []
+    conn = engine.raw_connection()
+    try:
+        cur = conn.cursor()
+        for file_name in SHIPPED_QUERY_FILES:
+            query = shipped_query(sql_dir, file_name)
+            for run in range(repeats):
+                try:
+                    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {query}")
+                    plan = cur.fetchone()[0]
+                    plan = json.loads(plan)[0] if isinstance(plan, str) else plan[0]
+                    results.append({'query': file_name, 'run': run,
+                                    'planning_ms': plan['Planning Time'],
+                                    'execution_ms': plan['Execution Time'],
+                                    'shared_hit_blocks': plan['Plan'].get('Shared Hit Blocks'),
+                                    'shared_read_blocks': plan['Plan'].get('Shared Read Blocks'),
+                                    'top_node': plan['Plan']['Node Type']})
+                except Exception as e:
+                    print(f"Could not benchmark {file_name}. Error: {e}")
+                    results.append({'query': file_name, 'run': run})
+                finally:
+                    conn.rollback()
+        cur.close()
+    finally:
+        conn.close()
+
+    return pd.DataFrame(results)
+
+
+def compare_benchmarks(before: pd.DataFrame, after: pd.DataFrame) -> pd.DataFrame:
+    """
+    Returns the median execution time of each query before and after, with the speedup.
+    """
+
+    medians = pd.DataFrame({'before_ms': before.groupby('query')['execution_ms'].median(),
+                            'after_ms': after.groupby('query')['execution_ms'].median()})
+    medians['speedup'] = medians['before_ms'] / medians['after_ms']
+    return medians
+
+
+def main(argv: Optional[List[str]] = None):
+    # Imported here because the cleaning script itself imports this module
+    from LEA_Finance_Data_Cleaning_and_Automation_Script import create_database_engine
+
+    parser = argparse.ArgumentParser(description="Manage the physical layout of the LEA finance database.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('apply', help="Create or migrate to partitioned, indexed tables.")
+    subparsers.add_parser('refresh', help="Refresh the z-score materialized view (concurrently when possible).")
+    benchmark = subparsers.add_parser('benchmark', help="EXPLAIN ANALYZE the shipped queries.")
+    benchmark.add_argument('--repeats', type=int, default=3, help="Runs per query (default: 3).")
+    benchmark.add_argument('--output', help="Save the results to this CSV file.")
+    benchmark.add_argument('--compare', help="CSV from an earlier run to compare against.")
+    benchmark.add_argument('--apply', action='store_true',
+                           help="Benchmark, apply the schema, refresh the view and benchmark again.")
+    args = parser.parse_args(argv)
+
+    engine = create_database_engine()
+    try:
+        if args.command == 'apply':
+            apply_schema(engine)
+        elif args.command == 'refresh':
+            concurrently = refresh_zscore_view(engine)
+            print(f"Refreshed {'concurrently' if concurrently else 'with an exclusive lock'}")
+        else:
+            before = pd.read_csv(args.compare) if args.compare else None
+            if args.apply:
+                before = benchmark_queries(engine, args.repeats)
+                apply_schema(engine)
+                refresh_zscore_view(engine)
+            results = benchmark_queries(engine, args.repeats)
+            print(results.to_string(index=False))
+            if args.output:
+                results.to_csv(args.output, index=False)
+            if before is not None:
+                print(compare_benchmarks(before, results).to_string())
+    finally:
+        engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
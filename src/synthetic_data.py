@@ -0,0 +1,223 @@
+import os
+import argparse
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from column_mapping import COLUMN_MAP_PATH, SHEET_NAME_PATTERN
+from long_format import LONG_TABLES
+from region import STATE_REGIONS
+
+
+SYNTHETIC_PATH = os.path.join("..", "synthetic")
+WORKBOOK_NAME = 'Synthetic Column Mapping.xlsx'
+
+# Placeholders the survey uses for missing, not applicable and suppressed amounts
+SENTINELS = [-1, -2, -3, -9]
+
+# Imputation and adjustment codes of the _flag columns; most cells are blank
+FLAG_CODES = ['R', 'A', 'M', 'N']
+
+# State name mapped to (postal abbreviation, ANSI state code); regions are in region.STATE_REGIONS
+STATES = {
+    'Alabama': ('AL', 1), 'Alaska': ('AK', 2), 'Arizona': ('AZ', 4), 'Arkansas': ('AR', 5), 'California': ('CA', 6),
+    'Colorado': ('CO', 8), 'Connecticut': ('CT', 9), 'Delaware': ('DE', 10), 'District of Columbia': ('DC', 11),
+    'Florida': ('FL', 12), 'Georgia': ('GA', 13), 'Hawaii': ('HI', 15), 'Idaho': ('ID', 16), 'Illinois': ('IL', 17),
+    'Indiana': ('IN', 18), 'Iowa': ('IA', 19), 'Kansas': ('KS', 20), 'Kentucky': ('KY', 21), 'Louisiana': ('LA', 22),
+    'Maine': ('ME', 23), 'Maryland': ('MD', 24), 'Massachusetts': ('MA', 25), 'Michigan': ('MI', 26),
+    'Minnesota': ('MN', 27), 'Mississippi': ('MS', 28), 'Missouri': ('MO', 29), 'Montana': ('MT', 30),
+    'Nebraska': ('NE', 31), 'Nevada': ('NV', 32), 'New Hampshire': ('NH', 33), 'New Jersey': ('NJ', 34),
+    'New Mexico': ('NM', 35), 'New York': ('NY', 36), 'North Carolina': ('NC', 37), 'North Dakota': ('ND', 38),
+    'Ohio': ('OH', 39), 'Oklahoma': ('OK', 40), 'Oregon': ('OR', 41), 'Pennsylvania': ('PA', 42),
+    'Rhode Island': ('RI', 44), 'South Carolina': ('SC', 45), 'South Dakota': ('SD', 46), 'Tennessee': ('TN', 47),
+    'Texas': ('TX', 48), 'Utah': ('UT', 49), 'Vermont': ('VT', 50), 'Virginia': ('VA', 51), 'Washington': ('WA', 53),
+    'West Virginia': ('WV', 54), 'Wisconsin': ('WI', 55), 'Wyoming': ('WY', 56)
+}
+
+
+@dataclass(frozen=True)
+class SyntheticSurvey:
+    """
+    Scale and shape of a synthetic F-33 survey.
+
+    Attributes:
+    n_leas (int): LEAs per year. The same LEAs (census_id, state, name) appear in every year.
+    years (tuple): Two-digit survey years, one sdfNN.txt file each.
+    measures_per_table (int, optional): Amount columns per long table. None keeps the template's columns;
+        more than the template has are added as synthetic titles.
+    sentinel_rate (float): Share of amount cells holding one of the -1/-2/-3/-9 placeholders.
+    zero_rate (float): Share of amount cells that are zero.
+    non_government_rate (float): Share of rows with census_id 'N', which the cleaning script drops.
+    seed (int): Seed of every random draw; the same survey always produces the same files.
+    """
+
+    n_leas: int = 1_000
+    years: tuple = tuple(range(10, 21))
+    measures_per_table: Optional[int] = None
+    sentinel_rate: float = 0.1
+    zero_rate: float = 0.2
+    non_government_rate: float = 0.01
+    seed: int = 0
+
+
+def template_sheets(workbook_path: str = COLUMN_MAP_PATH) -> Dict[int, pd.DataFrame]:
+    """
+    Reads the 'Column Mapping NN' sheets of the mapping workbook, keyed by two-digit year.
+    """
+
+    sheets = pd.read_excel(workbook_path, sheet_name=None)
+    templates = {}
+    for sheet_name, sheet in sheets.items():
+        match = SHEET_NAME_PATTERN.match(sheet_name.strip())
+        if match:
+            templates[int(match.group(1))] = sheet
+    return templates
+
+
+def synthetic_sheet(template: pd.DataFrame, measures_per_table: Optional[int] = None) -> pd.DataFrame:
+    """
+    Builds one year's mapping sheet from a template sheet with measures_per_table amount columns per long table.
+
+    Entity, annual_stats and total_ rows are kept as they are. Flag rows are kept for the kept amount columns.
+    Synthetic amount columns get no flag, so they fit tables created from the real workbook.
+    """
+
+    sheet = template.copy()
+    for col in ['Original Name', 'New Name', 'Type', 'Table']:
+        sheet[col] = sheet[col].astype(str).str.strip()
+    if measures_per_table is None:
+        return sheet
+
+    keep = ~sheet['Table'].isin(list(LONG_TABLES))
+    added = []
+    for table in LONG_TABLES:
+        rows = sheet['Table'] == table
+        measures = rows & (sheet['Type'].str.upper() == 'NUMERIC') & ~sheet['New Name'].str.startswith('total_')
+        kept_names = set(sheet.loc[measures, 'New Name'].head(measures_per_table))
+        keep |= rows & sheet['New Name'].isin(kept_names)
+        keep |= rows & sheet['New Name'].str.startswith('total_')
+        keep |= rows & sheet['New Name'].str.endswith('_flag') & sheet['New Name'].str[:-5].isin(kept_names)
+        for k in range(measures_per_table - len(kept_names)):
+            added.append({'Original Name': f'SYN_{table.upper()}_{k}', 'New Name': f'synthetic_{table}_{k}',
+                          'Type': 'Numeric', 'Table': table, 'Description': 'Synthetic Amount'})
+
+    return pd.concat([sheet[keep], pd.DataFrame(added, columns=sheet.columns)], ignore_index=True)
+
+
+def lea_attributes(n_leas: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Identifying columns of each synthetic LEA, constant across years.
+    """
+
+    rng = np.random.default_rng([seed, 0])
+    states = np.array(list(STATES))[rng.integers(0, len(STATES), n_leas)]
+    fips = np.array([STATES[state][1] for state in states])
+    return pd.DataFrame({'census_id': [f'{k:014d}' for k in range(n_leas)],
+                         'lea_id': [f'{k:07d}' for k in range(n_leas)],
+                         'lea_name': [f'Synthetic School District {k}' for k in range(n_leas)],
+                         'state': states,
+                         'st_abbr': [STATES[state][0] for state in states],
+                         'region': [STATE_REGIONS[state].value for state in states],
+                         'ansi_state_code': fips,
+                         'ansi_county_code': fips * 1000 + rng.integers(1, 200, n_leas),
+                         'csa': rng.integers(100, 999, n_leas),
+                         'cbsa': rng.integers(10000, 49999, n_leas),
+                         'scale': rng.lognormal(0, 1, n_leas)})
+
+
+def synthetic_year(sheet: pd.DataFrame, year: int, leas: pd.DataFrame, survey: SyntheticSurvey) -> pd.DataFrame:
+    """
+    Builds one raw sdfNN.txt frame, with the original column names of the mapping sheet.
+
+    Amounts are log-normal, scaled per LEA, with zeros and -1/-2/-3/-9 placeholders at the survey's rates.
+    """
+
+    rng = np.random.default_rng([survey.seed, year])
+    n = len(leas)
+    columns = {}
+
+    for original_name, new_name, expected_type in sheet[['Original Name', 'New Name', 'Type']].itertuples(index=False):
+        expected_type = expected_type.upper()
+        if new_name == 'census_id':
+            values = leas['census_id'].to_numpy(dtype=object, copy=True)
+            values[rng.random(n) < survey.non_government_rate] = 'N'
+        elif new_name == 'year':
+            values = np.full(n, year)
+        elif new_name in leas.columns:
+            values = leas[new_name].to_numpy()
+        elif new_name.endswith('_flag'):
+            values = np.where(rng.random(n) < 0.05, rng.choice(FLAG_CODES, n), '')
+        elif expected_type == 'BOOLEAN':
+            values = rng.integers(0, 2, n)
+        elif expected_type == 'NUMERIC':
+            values = (rng.lognormal(10, 1.5, n) * leas['scale'].to_numpy()).round()
+            draw = rng.random(n)
+            values[draw < survey.zero_rate] = 0
+            sentinel = draw > 1 - survey.sentinel_rate
+            values[sentinel] = rng.choice(SENTINELS, sentinel.sum())
+        else:
+            values = np.char.zfill(rng.integers(1, 13, n).astype(str), 2)
+        columns[original_name] = values
+
+    return pd.DataFrame(columns)
+
+
+def write_survey(survey: SyntheticSurvey, output_dir: str = SYNTHETIC_PATH,
+                 workbook_path: str = COLUMN_MAP_PATH) -> Dict[str, str]:
+    """
+    Writes a synthetic survey: one tab-separated sdfNN.txt per year and the matching mapping workbook.
+
+    Each year's sheet is derived from the template sheet of the same year, or of the latest template year.
+
+    Parameters:
+    survey (SyntheticSurvey): Scale and shape of the survey.
+    output_dir (str): Directory receiving raw_data_files/ and the workbook.
+    workbook_path (str): Real mapping workbook used as the template.
+
+    Returns:
+    dict: 'raw_data_dir', 'workbook' and 'leas' (a CSV of census_id, state and region) paths.
+    """
+
+    templates = template_sheets(workbook_path)
+    raw_data_dir = os.path.join(output_dir, 'raw_data_files')
+    os.makedirs(raw_data_dir, exist_ok=True)
+
+    leas = lea_attributes(survey.n_leas, survey.seed)
+    sheets = {}
+    for year in survey.years:
+        template = templates.get(year, templates[max(templates)])
+        sheet = synthetic_sheet(template, survey.measures_per_table)
+        sheets[f'Column Mapping {year:02d}'] = sheet
+        synthetic_year(sheet, year, leas, survey).to_csv(os.path.join(raw_data_dir, f'sdf{year:02d}.txt'),
+                                                         sep='\t', index=False)
+
+    workbook = os.path.join(output_dir, WORKBOOK_NAME)
+    with pd.ExcelWriter(workbook) as writer:
+        for sheet_name, sheet in sheets.items():
+            sheet.to_excel(writer, sheet_name=sheet_name, index=False)
+
+    leas_path = os.path.join(output_dir, 'leas.csv')
+    leas[['census_id', 'state', 'region']].to_csv(leas_path, index=False)
+
+    print(f"Wrote {len(survey.years)} years of {survey.n_leas:,} synthetic LEAs to {output_dir}")
+    return {'raw_data_dir': raw_data_dir, 'workbook': workbook, 'leas': leas_path}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Generate synthetic F-33 files and a matching column-mapping workbook.")
+    parser.add_argument('--output', default=SYNTHETIC_PATH, help=f"Output directory (default: {SYNTHETIC_PATH}).")
+    parser.add_argument('--leas', type=int, default=1_000, help="LEAs per year (default: 1,000).")
+    parser.add_argument('--years', type=int, nargs='+', default=list(range(10, 21)),
+                        help="Two-digit survey years (default: 10 through 20).")
+    parser.add_argument('--measures', type=int, help="Amount columns per long table (default: as in the workbook).")
+    parser.add_argument('--sentinel-rate', type=float, default=0.1, help="Share of -1/-2/-3/-9 amounts (default: 0.1).")
+    parser.add_argument('--zero-rate', type=float, default=0.2, help="Share of zero amounts (default: 0.2).")
+    parser.add_argument('--seed', type=int, default=0, help="Random seed (default: 0).")
+    args = parser.parse_args(argv)
+
+    write_survey(SyntheticSurvey(args.leas, tuple(args.years), args.measures, args.sentinel_rate, args.zero_rate,
+                                 seed=args.seed), args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,242 @@
+import time
+import pandas as pd
+from typing import Optional, Union, List, TYPE_CHECKING
+from chart_rendering import (aggregate_for_plot, downsample_lines, line_render_mode, combine_figures, figure_stats,
+                             format_stats, MAX_POINTS_PER_TRACE, WEBGL_POINT_THRESHOLD)
+
+if TYPE_CHECKING:
+    import plotly.graph_objects as go
+
+
+class ChartUtilities:
+    """
+    Chart functions of Utilities. Plotly is imported by the first chart built, not by importing this module.
+    """
+
+
+    ############################## Graph Functions ##############################
+    """
+    The subsequent lines of code contain various functions for creating different types of charts. 
+    These functions are designed to ensure stylistic consistency across all charts and to minimize redundant code in my analyses. 
+    They allow for easy customization and quick generation of complex visualizations, streamlining the data presentation process.
+    """
+
+    def make_bar_chart_grid(self, df: pd.DataFrame, x: str, y: str, color: str, facet_col: str, facet_col_wrap: int, title: str, hover_data: Optional[Union[List[str], dict]] = None,
+                            render_mode: str = 'default', agg_func: str = 'sum', report: bool = False) -> 'go.Figure':
+        """
+        Creates a grid of bar charts using Plotly Express.
+
+        Parameters:
+        df (pd.DataFrame): The DataFrame containing the data to plot.
+        x (str): The name of the column to use for the x-axis.
+        y (str): The name of the column to use for the y-axis.
+        color (str): The name of the column to use for color coding.
+        facet_col (str): The name of the column to create separate plots for each unique value.
+        facet_col_wrap (int): The number of charts per row.
+        title (str): The title of the plot.
+        hover_data (Optional[Union[List[str], dict]]): Additional data to display on hover. Can be a list of column names or a dictionary mapping column names to hover data labels.
+        render_mode (str): 'default' plots every row. 'scalable' first sums the rows of each bar (see chart_rendering.aggregate_for_plot), for LEA-level data.
+        agg_func (str): Aggregation used by the 'scalable' mode, e.g. 'sum' or 'mean'.
+        report (bool): Print and log the figure's build time and serialized size (see render_report()).
+
+        Returns:
+        go.Figure: A Plotly graph object representing the bar chart grid.
+        """
+
+        # Imported here so that jobs building no charts do not load Plotly
+        import plotly.express as px
+
+        start = time.perf_counter()
+        if render_mode == 'scalable':
+            df, hover_data = aggregate_for_plot(df, x, y, color, facet_col, hover_data, agg_func)
+
+        bar_plot_grid = px.bar(
+            df,
+            x=x,
+            y=y,
+            color=color,
+            facet_col=facet_col,
+            facet_col_wrap=facet_col_wrap,
+            title=title,
+            hover_data=hover_data  # Add hover_data to the function call
+        )
+
+        # Update layout with given title and additional layout arguments
+        bar_plot_grid.update_layout(
+            title_text=title,
+            title={
+                'y': 0.98,  # The position of the title can be adjusted with the y parameter
+                'x': 0.5,
+                'xanchor': 'center',
+                'yanchor': 'top'
+            },
+            height=800,
+            width=1050,
+            legend=dict(
+                orientation="h",
+                yanchor="bottom",
+                y=-0.5,  # Adjusted position
+                xanchor="center",
+                x=0.5
+            ),
+            margin=dict(l=40, r=40, t=80, b=200),  # Increase the top margin for padding
+            hoverlabel=dict(
+                bgcolor="white",
+                font_size=16,
+                font_family="Calibri"
+            )
+        )
+
+        bar_plot_grid.update_annotations(font_size=10)  # Reduce font size for subplot titles
+
+        if report:
+            self._log_render(bar_plot_grid, title, start)
+        return bar_plot_grid
+    
+    def make_line_plot_grid(self, df: pd.DataFrame, x: str, y: str, color: str, facet_col: str, facet_col_wrap: int, title: str, hover_data: Optional[Union[List[str], dict]] = None,
+                            render_mode: str = 'default', agg_func: str = 'sum', max_points: int = MAX_POINTS_PER_TRACE,
+                            webgl_threshold: int = WEBGL_POINT_THRESHOLD, report: bool = False) -> 'go.Figure':
+        """
+        Creates a grid of line charts using Plotly Express.
+
+        Parameters:
+        df (pd.DataFrame): The DataFrame containing the data to plot.
+        x (str): The name of the column to use for the x-axis.
+        y (str): The name of the column to use for the y-axis.
+        color (str): The name of the column to use for color coding.
+        facet_col (str): The name of the column to create separate plots for each unique value.
+        facet_col_wrap (int): The number of charts per row.
+        title (str): The title of the plot.
+        hover_data (Optional[Union[List[str], dict]]): Additional data to display on hover. Can be a list of column names or a dictionary mapping column names to hover data labels.
+        render_mode (str): 'default' plots every row. 'scalable' aggregates the rows of each point, caps every line at max_points
+                           with min/max downsampling and draws with WebGL above webgl_threshold points.
+        agg_func (str): Aggregation used by the 'scalable' mode, e.g. 'sum' or 'mean'.
+        max_points (int): Points kept per line in the 'scalable' mode.
+        webgl_threshold (int): Plotted points above which the 'scalable' mode switches to WebGL traces.
+        report (bool): Print and log the figure's build time and serialized size (see render_report()).
+
+        Returns:
+        go.Figure: A Plotly graph object representing the line plot grid.
+        """
+
+        # Imported here so that jobs building no charts do not load Plotly
+        import plotly.express as px
+
+        start = time.perf_counter()
+        line_options = {}
+        if render_mode == 'scalable':
+            df, hover_data = aggregate_for_plot(df, x, y, color, facet_col, hover_data, agg_func)
+            df = downsample_lines(df, x, y, [col for col in (facet_col, color) if col is not None], max_points)
+            line_options['render_mode'] = line_render_mode(len(df), webgl_threshold)
+
+        # Create the grid of line charts
+        line_plot_grid = px.line(
+            df,
+            x=x,
+            y=y,
+            color=color,
+            facet_col=facet_col,  # Creates a separate plot for each region
+            facet_col_wrap=facet_col_wrap,  # Adjust this to control how many charts per row
+            title=title,
+            hover_data=hover_data,  # Add hover_data to the function call
+            **line_options
+        )
+
+        # Update layout with given title and additional layout arguments
+        line_plot_grid.update_layout(title_text=title,
+                                     title={
+                                         'y': 0.98,  # The position of the title can be adjusted with the y parameter
+                                         'x': 0.5,
+                                         'xanchor': 'center',
+                                         'yanchor': 'top'
+                                     },
+                                     height=800,
+                                     width=1050,
+                                     legend=dict(
+                                         orientation="h",
+                                         yanchor="bottom",
+                                         y=-0.5,  # Adjusted position
+                                         xanchor="center",
+                                         x=0.5
+                                     ),
+                                     margin=dict(l=40, r=40, t=80, b=200),  # Increase the top margin for padding
+                                     hoverlabel=dict(
+                                         bgcolor="white",
+                                         font_size=16,
+                                         font_family="Calibri"
+                                     )
+                                     )
+
+        line_plot_grid.update_annotations(font_size=10)  # Reduce font size for subplot titles
+        line_plot_grid.update_xaxes(tickangle=45, tickfont=dict(size=10))  # Update Tick Angles and Axis Font Size
+
+        if report:
+            self._log_render(line_plot_grid, title, start)
+        return line_plot_grid
+    
+
+    def create_combined_figure(self, fig1: 'go.Figure', fig2: 'go.Figure',
+                               title: str, subplot_titles: tuple, report: bool = False) -> 'go.Figure':
+        """
+        Creates a combined figure with two subplots.
+
+        Parameters:
+        fig1 (go.Figure): The first figure to be added to the subplot.
+        fig2 (go.Figure): The second figure to be added to the subplot.
+        title (str): The main title of the combined figure.
+        subplot_titles (tuple): Titles for the subplots (two elements expected).
+        report (bool): Print and log the figure's build time and serialized size (see render_report()).
+
+        Returns:
+        go.Figure: A combined figure with two subplots.
+        """
+
+        start = time.perf_counter()
+
+        # Traces of fig1 go to the first subplot and traces of fig2 to the second, added in one call
+        combined_fig = combine_figures([fig1, fig2], subplot_titles, horizontal_spacing=0.1)
+
+        # Update layout with given title and additional layout arguments
+        combined_fig.update_layout(title_text=title,
+                                title={
+                                    'y':0.98,  # The position of the title can be adjusted with the y parameter
+                                    'x':0.5,
+                                    'xanchor': 'center',
+                                    'yanchor': 'top'
+                                    },
+                                    height=600,
+                                    width=1050, 
+                                    legend=dict(
+                                        orientation="h",
+                                        yanchor="bottom",
+                                        y=-0.3,  # Adjusted position
+                                        xanchor="center",
+                                        x=0.5
+                                        ),
+                                    margin=dict(l=40, r=40, t=80, b=200),  # Increase the top margin for padding
+                                    hoverlabel=dict(
+                                        bgcolor="white",
+                                        font_size=16,
+                                        font_family="Calibri"
+                                        )
+                                    )
+
+        if report:
+            self._log_render(combined_fig, title, start)
+        return combined_fig
+
+
+    def _log_render(self, fig: 'go.Figure', title: str, start: float) -> None:
+        stats = figure_stats(fig, title, time.perf_counter() - start)
+        if not hasattr(self, '_render_log'):
+            self._render_log = []
+        self._render_log.append(stats)
+        print(format_stats(stats))
+
+
+    def render_report(self) -> pd.DataFrame:
+        """
+        Build time and size of every figure created with report=True: traces, points, build_seconds and json_bytes.
+        """
+
+        return pd.DataFrame(getattr(self, '_render_log', []), columns=['figure', 'traces', 'points', 'build_seconds', 'json_bytes'])
@@ -0,0 +1,241 @@
+import numpy as np
+import pandas as pd
+from typing import Optional, List
+from aggregate_cube import AggregateCube
+from change_statistics import growth_rates, change_statistics
+from column_mapping import ColumnMappingRegistry
+from expenditures import TitleCategory, TitleRegistry, sql_code_filter
+
+
+class CoreUtilities:
+    """
+    Aggregate math and title lookups of Utilities. Needs pandas and NumPy only, so headless jobs can use it
+    without loading the database driver or the plotting stack.
+    """
+
+
+    ############################## Title Lookups ##############################
+    @property
+    def title_registry(self) -> TitleRegistry:
+        """
+        Dictionary of expenditure and revenue titles, built from the column-mapping workbook with the same codes as dimension.titles.
+        """
+
+        if not hasattr(self, '_title_registry'):
+            self._title_registry = TitleRegistry.from_mappings(ColumnMappingRegistry().load())
+        return self._title_registry
+
+
+    def title_filter(self, table: str, categories: Optional[List[TitleCategory]] = None, names: Optional[list] = None,
+                     column: str = 'title_code') -> str:
+        """
+        Builds a WHERE condition selecting titles by category or name as a set of title codes.
+
+        Example:
+        f"SELECT ... FROM expenses.expenditures WHERE {utils.title_filter('expenditures', [TitleCategory.TECH, TitleCategory.VOCATIONAL])}"
+
+        Parameters:
+        table (str): Long table the titles belong to, e.g. 'expenditures' or 'federal_revenue'.
+        categories (List[TitleCategory], optional): Categories to select.
+        names (list, optional): Titles (strings or Expenditures members) to select.
+        column (str): Title code column, qualified with a table alias if needed.
+
+        Returns:
+        str: Condition such as "title_code IN (62, 63, 64)".
+        """
+
+        return sql_code_filter(column, self.title_registry.codes(table, categories or (), names or ()))
+
+
+    def filter_titles(self, df: pd.DataFrame, table: str, categories: Optional[List[TitleCategory]] = None,
+                      names: Optional[list] = None) -> pd.DataFrame:
+        """
+        Keeps the rows of a long-format frame whose title is in one of the categories or names.
+
+        Frames with a title_code column are filtered on the integer codes, others on the title column.
+
+        Returns:
+        pd.DataFrame: Matching rows.
+        """
+
+        return df[self.title_registry.mask(df, table, categories or (), names or ())]
+
+
+############################## Aggregate Functions ##############################
+
+    def get_year_total(self, df: pd.DataFrame, year: int, column_name: str):
+        """
+        Gets the total amount for a specified year and column from a DataFrame.
+
+        Parameters:
+        df (pd.DataFrame): DataFrame to search in.
+        year (int): Year to filter by.
+        column_name (str): Name of the column containing the amount.
+
+        Returns:
+        float: Total for the specified year and column.
+        """
+
+        total = df[df['year'] == year][column_name].sum()
+        return total
+    
+    def calculate_total_difference(self, amount1, amount2):
+        """
+        Calculates the total difference between two amounts.
+
+        Parameters:
+        amount1: First amount.
+        amount2: Second amount.
+
+        Returns:
+        float: Difference between the two amounts.
+        """
+
+        return amount2 - amount1
+    
+    def calculate_percentage_difference(self, initial_amount, final_amount):
+        """
+        Calculates the percentage difference between two amounts.
+
+        Parameters:
+        initial_amount: Initial amount.
+        final_amount: Final amount.
+
+        Returns:
+        float or None: Percentage difference between the two amounts. Returns None if initial_amount is 0.
+        """
+
+        if initial_amount == 0:
+            return None  # Avoid division by zero
+        return ((final_amount - initial_amount) / initial_amount) * 100
+    
+
+    def calculate_mean_growth_rate(self, df: pd.DataFrame, start_year: int = None, end_year: int = None, 
+                                expenditure_title: Optional[str] = None, region: Optional[str] = None) -> float:
+        """
+        Calculates the mean growth rate for a given expenditure title and year range.
+
+        Parameters:
+        df (pd.DataFrame): DataFrame to search in.
+        start_year (int): The start of the year range.
+        end_year (int): The end of the year range.
+        expenditure_title (str, optional): The title of the expenditure to filter by. Default is None.
+        region (str, optional): The region to filter by. Default is None.
+
+        Returns:
+        float: Mean growth rate for the specified expenditure title and year range.
+        """
+        
+        # Ensure year values are integers
+        start_year = int(start_year)
+        end_year = int(end_year)
+
+        # Initialize the filter condition for the year range
+        year_condition = (df['year'] >= start_year) & (df['year'] <= end_year)
+        
+        # Apply additional filters based on provided arguments
+        if expenditure_title and region:  # Check for both filters first
+            condition = (df['region'] == region) & (df['expenditure_title'] == expenditure_title) & year_condition
+        elif expenditure_title:  # Then check individual conditions
+            condition = (df['expenditure_title'] == expenditure_title) & year_condition
+        elif region:
+            condition = (df['region'] == region) & year_condition
+        else:
+            condition = year_condition
+
+        # Apply filter to DataFrame
+        filtered_data = df[condition]
+
+        # Calculate mean growth rate
+        mean_growth_rate = filtered_data['growth_rate'].mean()
+        return mean_growth_rate
+
+
+    def calculate_growth_rates(self, df: pd.DataFrame, value_column: str, group_columns: Optional[List[str]] = None,
+                               student_counts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Calculates the yearly difference and growth rate of every group in one vectorized pass.
+
+        Parameters:
+        df (pd.DataFrame): Rows with the group columns, 'year' and the value column.
+        value_column (str): Measure to analyze, e.g. 'amount'.
+        group_columns (List[str], optional): Columns defining a series, e.g. ['region', 'expenditure_title']. None for national totals.
+        student_counts (pd.DataFrame, optional): Student counts keyed by 'year' and a subset of the group columns.
+
+        Returns:
+        pd.DataFrame: One row per group and year with yearly_difference and growth_rate (and cost_per_student).
+        """
+
+        return growth_rates(df, value_column, group_columns or (), student_counts)
+
+
+    def calculate_change_statistics(self, df: pd.DataFrame, value_column: str, group_columns: Optional[List[str]] = None,
+                                    windows: Optional[List[tuple]] = None, student_counts: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+        """
+        Calculates differences, percent differences, mean and compound growth for every group and year window at once.
+
+        Batch counterpart of calculate_total_difference(), calculate_percentage_difference() and calculate_mean_growth_rate().
+        Divisions by zero give NaN per element.
+
+        Parameters:
+        df (pd.DataFrame): Rows with the group columns, 'year' and the value column.
+        value_column (str): Measure to analyze, e.g. 'amount'.
+        group_columns (List[str], optional): Columns defining a series, e.g. ['region', 'expenditure_title']. None for national totals.
+        windows (List[tuple], optional): Inclusive (start_year, end_year) pairs, e.g. [(2014, 2016), (2010, 2020)].
+        student_counts (pd.DataFrame, optional): Student counts keyed by 'year' and a subset of the group columns.
+
+        Returns:
+        pd.DataFrame: One row per group and window.
+        """
+
+        return change_statistics(df, value_column, group_columns or (), windows or (), student_counts)
+
+
+    def build_aggregate_cube(self, expenditures: pd.DataFrame, student_counts: Optional[pd.DataFrame] = None) -> AggregateCube:
+        """
+        Precomputes totals, per-student costs and growth rates for every year, state, region and expenditure title.
+
+        Build the cube once and use its value(), series(), mean_growth_rate() and lookup() methods instead of
+        repeated get_year_total(), calculate_mean_growth_rate() and get_single_value_from_df() calls.
+
+        Parameters:
+        expenditures (pd.DataFrame): Rows with 'state', 'region', 'expenditure_title', 'year' and 'amount'.
+        student_counts (pd.DataFrame, optional): Rows with 'state', 'region', 'year' and 'student_count'.
+
+        Returns:
+        AggregateCube: The precomputed cube.
+        """
+
+        return AggregateCube(expenditures, student_counts)
+
+
+    def get_single_value_from_df(self, df : pd.DataFrame, filter_criteria : dict, target_column : str):
+        """
+        Filters a DataFrame based on a dictionary of criteria and extracts a single value from the target column.
+
+        Parameters:
+        - df (pd.DataFrame): The DataFrame to filter.
+        - filter_criteria (dict): A dictionary where keys are column names and values are the values to filter by.
+        - target_column (str): The name of the column from which to extract the single value.
+
+        Returns:
+        - The single value from the target column after filtering, or None if no such value exists.
+        """
+
+        # Generate boolean masks and combine them
+        mask = np.logical_and.reduce([df[k] == v for k, v in filter_criteria.items()])
+        
+        # Apply the mask
+        filtered_df = df[mask]
+
+        # Extract the single value from the target column, if possible
+        if not filtered_df.empty and target_column in filtered_df:
+            # Ensures there's exactly one value to extract, to safely use .item()
+            if len(filtered_df[target_column]) == 1:
+                return filtered_df[target_column].item()
+            else:
+                print("Warning: Filter criteria did not result in a unique row. Adjust the criteria.")
+                return None
+        else:
+            print("No matching data found or target column not in DataFrame.")
+            return None
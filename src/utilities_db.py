@@ -0,0 +1,633 @@
+import os
+import numpy as np
+import pandas as pd
+import uuid
+import time
+import functools
+from contextlib import contextmanager, nullcontext
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterator, Optional, Tuple, Union, List
+from connection_pool import get_pool, DB_CREDENTIALS_PATH, MAX_CONNECTIONS
+from query_cache import QueryCache
+from instrumentation import stage
+from aggregate_query import AggregatePlan, CSV_EXPORT_PATH
+
+
+# Rows fetched per round trip by execute_sql() and iter_sql()
+DEFAULT_FETCH_SIZE = 50_000
+
+# PostgreSQL type OIDs mapped to the dtype of the resulting DataFrame column; unlisted types stay as objects
+PG_TIMESTAMPTZ = 1184
+PG_TYPE_DTYPES = {
+    16: 'boolean',                                                  # bool
+    20: 'Int64', 21: 'Int64', 23: 'Int64',                          # int8, int2, int4
+    700: 'float64', 701: 'float64', 1700: 'float64',                # float4, float8, numeric
+    1082: 'datetime64[ns]', 1114: 'datetime64[ns]', PG_TIMESTAMPTZ: 'datetime64[ns]'  # date, timestamp, timestamptz
+}
+
+
+@functools.lru_cache(maxsize=None)
+def numeric_as_float():
+    """
+    psycopg2 type reading NUMERIC columns as float instead of Decimal, created on first use.
+    """
+
+    # Imported here so that importing the module does not load the driver
+    import psycopg2.extensions
+    return psycopg2.extensions.new_type(psycopg2.extensions.DECIMAL.values, 'NUMERIC_AS_FLOAT',
+                                        lambda value, cur: float(value) if value is not None else None)
+
+
+def query_label(query: str, length: int = 80) -> str:
+    """
+    Query text on one line, shortened to identify the query in stage metrics.
+    """
+
+    return ' '.join(query.split())[:length]
+
+
+def database_identity(conn) -> str:
+    """
+    Host, port, database and user a connection is open on, so cached results of different databases are kept apart.
+    """
+
+    parameters = conn.get_dsn_parameters()
+    return '/'.join(str(parameters.get(name, '')) for name in ('host', 'port', 'dbname', 'user'))
+
+
+# Query results shared by every Utilities instance of the process
+SHARED_QUERY_CACHE = QueryCache()
+
+# Seconds a query of a batch may run before the server cancels it
+DEFAULT_QUERY_TIMEOUT = 120
+
+# Queries of a batch running at once; one pooled connection is left for the caller's own conn
+DEFAULT_BATCH_WORKERS = MAX_CONNECTIONS - 1
+
+
+@dataclass(frozen=True)
+class NamedQuery:
+    """
+    One query of a batch (see DatabaseUtilities.run_query_batch()).
+
+    Attributes:
+    query (str, optional): SQL query. None reads csv_file only.
+    csv_file (str, optional): CSV export read instead when the database is unreachable or the query fails.
+    dtypes (dict): Column types applied to the result, whichever source it came from.
+    params (tuple or dict, optional): Query parameters, passed to the driver.
+    timeout (float, optional): Seconds before the query is cancelled. Default: the batch's timeout.
+    """
+
+    query: Optional[str]
+    csv_file: Optional[str] = None
+    dtypes: Dict[str, object] = field(default_factory=dict)
+    params: Optional[Union[tuple, dict]] = None
+    timeout: Optional[float] = None
+
+
+@dataclass
+class QueryResult:
+    """
+    Outcome of one query of a batch.
+
+    Attributes:
+    frame (pd.DataFrame): The result, or an empty frame if no source was available.
+    source (str, optional): 'database', 'cache', the CSV path, or None if no source was available.
+    error (str, optional): Why the database did not answer (connection failure, query error or timeout).
+    seconds (float): Wall-clock time of the query, including the fallback.
+    """
+
+    frame: pd.DataFrame
+    source: Optional[str]
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+class DatabaseUtilities:
+    """
+    Database access of Utilities: pooled connections, typed queries, the query cache, query batches and the
+    local Parquet warehouse. psycopg2 and pyarrow are imported on first use.
+    """
+
+
+    ############################## Connect to Database ##############################
+    def create_database_conn(self, credentials_path: str = DB_CREDENTIALS_PATH):
+        """
+        Takes a connection to the database from the process-wide connection pool.
+
+        The credentials file is read and the pool is opened on the first call only; later calls reuse
+        already open connections. The connection stays checked out until it is handed back with
+        release_database_conn(); prefer database_conn(), which always hands it back.
+
+        Parameters:
+        credentials_path (str): Path of the JSON credentials file.
+
+        Returns:
+        psycopg2.connection: A connection to the PostgreSQL database, or False if the database cannot be reached.
+        """
+        
+        try:
+            pool = get_pool(credentials_path)
+        except Exception as e:
+            print(f"Failed to connect to database. Error: {e}")
+            return False
+
+        # Imported here because the driver is only known to be installed once the pool exists
+        from psycopg2.pool import PoolError
+        try:
+            return pool.getconn()
+        except PoolError as e:
+            # Every pooled connection is checked out and never came back: falling back to CSV files would hide the leak
+            raise PoolError(f"{e}: all {MAX_CONNECTIONS} pooled connections are in use. Hand connections back with "
+                            f"release_database_conn(), or use database_conn() or execute_sql() without a conn.") from None
+        except Exception as e:
+            print(f"Failed to connect to database. Error: {e}")
+            return False
+
+
+    def release_database_conn(self, conn, credentials_path: str = DB_CREDENTIALS_PATH) -> None:
+        """
+        Returns a connection taken with create_database_conn() to the pool. An open transaction is rolled back.
+
+        Parameters:
+        conn (psycopg2.connection): Connection to give back.
+        credentials_path (str): Path of the JSON credentials file the connection was opened with.
+        """
+
+        get_pool(credentials_path).putconn(conn)
+
+
+    @contextmanager
+    def database_conn(self, credentials_path: str = DB_CREDENTIALS_PATH) -> Iterator:
+        """
+        Takes a pooled connection for the duration of a with block and always hands it back, even if the block fails.
+
+        Example:
+        with utils.database_conn() as conn:
+            df = utils.execute_sql(query, conn)
+
+        Parameters:
+        credentials_path (str): Path of the JSON credentials file.
+
+        Yields:
+        psycopg2.connection: A connection to the PostgreSQL database. Errors connecting are raised.
+        """
+
+        pool = get_pool(credentials_path)
+        conn = pool.getconn()
+        try:
+            yield conn
+        finally:
+            pool.putconn(conn)
+
+
+    def database_available(self, credentials_path: str = DB_CREDENTIALS_PATH) -> bool:
+        """
+        Checks that the database can be reached, without keeping a connection checked out.
+
+        Notebooks call this once and pass no conn to execute_sql(), so re-running their cells never holds on to pooled connections.
+
+        Parameters:
+        credentials_path (str): Path of the JSON credentials file.
+
+        Returns:
+        bool: True if a pooled connection could be taken.
+        """
+
+        try:
+            with self.database_conn(credentials_path):
+                return True
+        except Exception as e:
+            print(f"Failed to connect to database. Error: {e}")
+            return False
+
+
+    ############################## Query Database to DataFrame ##############################
+    def iter_sql(self, query: str, conn, params: Optional[Union[tuple, dict]] = None,
+                 chunksize: int = DEFAULT_FETCH_SIZE) -> Iterator[pd.DataFrame]:
+        """
+        Executes an SQL query and yields the result as a sequence of typed DataFrames.
+
+        SELECT queries run on a server-side (named) cursor, so only one chunk of rows is held in memory at a time.
+        Column dtypes come from the PostgreSQL result types (see PG_TYPE_DTYPES) instead of Python objects.
+
+        Parameters:
+        query (str): SQL query to execute.
+        conn (psycopg2.connection): Connection to the database.
+        params (tuple or dict, optional): Query parameters, passed to the driver.
+        chunksize (int): Number of rows fetched per DataFrame.
+
+        Yields:
+        pd.DataFrame: Consecutive chunks of the result. A query returning no rows yields one empty DataFrame with the result's columns.
+        """
+
+        # Imported here so that importing the module does not load the driver
+        import psycopg2.extensions
+
+        # Named cursors only work for row-returning statements inside a transaction
+        server_side = not conn.autocommit and query.lstrip().lower().startswith(('select', 'with', 'values', 'table'))
+        cur = conn.cursor(name=f'utilities_{uuid.uuid4().hex}') if server_side else conn.cursor()
+
+        try:
+            # Convert NUMERIC to float in the driver rather than building Decimal objects
+            psycopg2.extensions.register_type(numeric_as_float(), cur)
+            cur.itersize = chunksize
+            cur.execute(query, params)
+
+            # Statements without a result set (DDL, INSERT without RETURNING) have nothing to fetch.
+            # Named cursors only report their description after the first fetch.
+            if not server_side and cur.description is None:
+                return
+
+            yielded = False
+            while True:
+                rows = cur.fetchmany(chunksize)
+                if not rows:
+                    break
+                yielded = True
+                yield self._rows_to_frame(rows, cur.description)
+
+            if not yielded and cur.description is not None:
+                yield self._rows_to_frame([], cur.description)
+        finally:
+            # Close the cursor after the operation is complete
+            cur.close()
+
+
+    def execute_sql(self, query: str, conn=None, params: Optional[Union[tuple, dict]] = None,
+                    chunksize: int = DEFAULT_FETCH_SIZE, use_cache: bool = True,
+                    credentials_path: str = DB_CREDENTIALS_PATH) -> pd.DataFrame:
+        """
+        Executes an SQL query on the provided database connection.
+
+        Rows are fetched in chunks through iter_sql(), so numeric, date and boolean columns arrive with
+        their NumPy/pandas dtypes and no intermediate list of tuples for the whole result is built.
+
+        Results of SELECT queries are kept in the query cache (see query_cache.QueryCache), keyed by the
+        database, the normalized query text and the parameters. A repeated query is answered from memory or
+        from the on-disk cache without touching the database, until new data is written to it.
+
+        Parameters:
+        query (str): SQL query to execute.
+        conn (psycopg2.connection, optional): Connection to the database. Default: one taken from the pool for this call.
+        params (tuple or dict, optional): Query parameters, passed to the driver.
+        chunksize (int): Number of rows fetched per round trip.
+        use_cache (bool): Serve and store the result through the query cache.
+        credentials_path (str): Path of the JSON credentials file, used when no conn is given.
+
+        Returns:
+        pd.DataFrame: Result of the SQL query as a DataFrame.
+        """
+
+        # Imported here so that importing the module does not load the driver
+        from psycopg2 import OperationalError
+
+        with stage('execute_sql') as measured:
+            measured.set(query=query_label(query))
+            try:
+                if conn is None:
+                    with self.database_conn(credentials_path) as conn:
+                        df, cached = self._cached_query(query, conn, params, chunksize, use_cache)
+                else:
+                    df, cached = self._cached_query(query, conn, params, chunksize, use_cache)
+            except OperationalError as e:
+                print(f"An error occurred: {e}")
+                return pd.DataFrame()
+
+            measured.rows_out = len(df)
+            measured.set(cached=cached)
+            return df
+
+
+    def _cached_query(self, query: str, conn, params: Optional[Union[tuple, dict]] = None,
+                      chunksize: int = DEFAULT_FETCH_SIZE, use_cache: bool = True) -> Tuple[pd.DataFrame, bool]:
+        """
+        Answers a query from the query cache or the database, raising database errors.
+
+        Returns:
+        tuple: (result, whether it came from the cache).
+        """
+
+        cache = self.query_cache if use_cache and self.query_cache.is_cacheable(query) else None
+        if cache is not None:
+            database = database_identity(conn)
+            # Taken before the query runs, so a write committed meanwhile keeps the result out of the cache
+            version = cache.data_version()
+            cached = cache.get(query, params, database)
+            if cached is not None:
+                return cached, True
+
+        frames = list(self.iter_sql(query, conn, params, chunksize))
+        if not frames:
+            return pd.DataFrame(), False
+        df = frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+        if cache is not None:
+            cache.put(query, params, df, database, version)
+        return df, False
+
+
+    ############################## Query Batches ##############################
+    def run_query_batch(self, queries: Dict[str, Union[str, NamedQuery]], timeout: float = DEFAULT_QUERY_TIMEOUT,
+                        max_workers: int = DEFAULT_BATCH_WORKERS, use_database: bool = True, use_cache: bool = True,
+                        credentials_path: str = DB_CREDENTIALS_PATH) -> Dict[str, QueryResult]:
+        """
+        Runs independent queries concurrently, each on its own pooled connection.
+
+        Each query gets a server-side statement_timeout, so a slow query is cancelled without holding up
+        the others. A query that fails, times out or cannot reach the database falls back to its CSV
+        export, as the notebooks do; the other queries of the batch are not affected.
+
+        Example:
+        results = utils.run_query_batch({'funding_data': 'SELECT * FROM revenue.funding_view;',
+                                         'student_counts': NamedQuery(query, csv_file='../student_counts_by_state.csv')})
+
+        Parameters:
+        queries (dict): Name mapped to an SQL string or a NamedQuery.
+        timeout (float): Seconds each query may run, unless its NamedQuery sets its own.
+        max_workers (int): Queries running at the same time, at most one per pooled connection.
+        use_database (bool): False reads every query from its CSV export.
+        use_cache (bool): Serve and store results through the query cache (see execute_sql()).
+        credentials_path (str): Path of the JSON credentials file.
+
+        Returns:
+        dict: Name mapped to its QueryResult, in the order of queries.
+        """
+
+        specs = {name: spec if isinstance(spec, NamedQuery) else NamedQuery(spec) for name, spec in queries.items()}
+        results = {}
+
+        with stage('run_query_batch', rows_in=len(specs)) as measured:
+            pool_error = None
+            if use_database:
+                try:
+                    get_pool(credentials_path)
+                except Exception as e:
+                    pool_error = f"Failed to connect to database. Error: {e}"
+                    print(pool_error)
+            else:
+                pool_error = "Database not used"
+
+            database_names = [name for name, spec in specs.items() if spec.query is not None and pool_error is None]
+            if database_names:
+                with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(database_names)))) as executor:
+                    futures = {name: executor.submit(self._run_named_query, specs[name], timeout, use_cache, credentials_path)
+                               for name in database_names}
+                    results = {name: future.result() for name, future in futures.items()}
+
+            for name, spec in specs.items():
+                result = results.get(name) or QueryResult(pd.DataFrame(), None, pool_error)
+                if result.source is None:
+                    if result.error is not None and name in database_names:
+                        print(f"Query '{name}' failed. Error: {result.error}")
+                    result = self._read_fallback(spec, result)
+                    if result.source is None:
+                        print(f"Query '{name}' has no result: neither the database nor a CSV export answered")
+                results[name] = result
+
+            results = {name: results[name] for name in specs}
+            measured.rows_out = sum(len(result.frame) for result in results.values())
+            measured.set(sources={name: result.source for name, result in results.items()})
+        return results
+
+
+    def execute_sql_batch(self, queries: Dict[str, Union[str, NamedQuery]], timeout: float = DEFAULT_QUERY_TIMEOUT,
+                          max_workers: int = DEFAULT_BATCH_WORKERS, use_database: bool = True,
+                          use_cache: bool = True) -> Dict[str, pd.DataFrame]:
+        """
+        Runs independent queries concurrently and returns their results by name (see run_query_batch()).
+
+        Returns:
+        dict: Name mapped to its typed DataFrame; empty if neither the database nor a CSV export answered.
+        """
+
+        results = self.run_query_batch(queries, timeout, max_workers, use_database, use_cache)
+        return {name: result.frame for name, result in results.items()}
+
+
+    def _run_named_query(self, spec: NamedQuery, timeout: float, use_cache: bool,
+                         credentials_path: str = DB_CREDENTIALS_PATH) -> QueryResult:
+        """
+        Runs one query of a batch on a connection of its own. Errors are returned, not raised.
+        """
+
+        start = time.perf_counter()
+        pool = get_pool(credentials_path)
+        try:
+            conn = pool.getconn()
+        except Exception as e:
+            return QueryResult(pd.DataFrame(), None, f"No pooled connection available. Error: {e}",
+                               time.perf_counter() - start)
+
+        try:
+            # SET LOCAL lasts until the end of the transaction the query runs in
+            with conn.cursor() as cur:
+                cur.execute("SET LOCAL statement_timeout = %s;", (int((spec.timeout or timeout) * 1000),))
+            df, cached = self._cached_query(spec.query, conn, spec.params, use_cache=use_cache)
+            conn.rollback()
+            return QueryResult(df.astype(spec.dtypes), 'cache' if cached else 'database',
+                               seconds=time.perf_counter() - start)
+        except Exception as e:
+            conn.rollback()
+            return QueryResult(pd.DataFrame(), None, str(e).strip(), time.perf_counter() - start)
+        finally:
+            pool.putconn(conn)
+
+
+    def _read_fallback(self, spec: NamedQuery, result: QueryResult) -> QueryResult:
+        """
+        Reads a query's CSV export in place of its failed database result.
+        """
+
+        if spec.csv_file is None or not os.path.exists(spec.csv_file):
+            return result
+
+        start = time.perf_counter()
+        try:
+            df = pd.read_csv(spec.csv_file).astype(spec.dtypes)
+        except Exception as e:
+            print(f"An error occurred while loading the CSV file {spec.csv_file}: {e}")
+            return result
+        return QueryResult(df, spec.csv_file, result.error, result.seconds + time.perf_counter() - start)
+
+
+    @property
+    def query_cache(self) -> QueryCache:
+        """
+        Cache used by execute_sql(). Shared by all instances unless replaced, e.g. with QueryCache(cache_dir=None) for memory only.
+        """
+
+        if not hasattr(self, '_query_cache'):
+            self._query_cache = SHARED_QUERY_CACHE
+        return self._query_cache
+
+
+    @query_cache.setter
+    def query_cache(self, cache: QueryCache) -> None:
+        self._query_cache = cache
+
+
+    def clear_query_cache(self) -> None:
+        """
+        Drops every cached query result, in memory and on disk.
+        """
+
+        self.query_cache.clear()
+
+
+    def _rows_to_frame(self, rows: list, description) -> pd.DataFrame:
+        """
+        Builds a DataFrame column by column from fetched rows, using the PostgreSQL type of each column.
+        """
+
+        columns = list(zip(*rows)) if rows else [()] * len(description)
+        data = {}
+        for values, desc in zip(columns, description):
+            data[desc[0]] = self._column_to_array(values, desc[1])
+        return pd.DataFrame(data, columns=[desc[0] for desc in description])
+
+
+    def _column_to_array(self, values: tuple, type_code: int):
+        dtype = PG_TYPE_DTYPES.get(type_code)
+
+        if dtype == 'float64':
+            # None becomes NaN
+            return np.array(values, dtype='float64')
+        if dtype in ('Int64', 'boolean'):
+            # Plain NumPy dtypes when there are no nulls, nullable pandas dtypes otherwise
+            if None in values:
+                return pd.array(values, dtype=dtype)
+            return np.array(values, dtype='int64' if dtype == 'Int64' else 'bool')
+        if dtype == 'datetime64[ns]':
+            return pd.to_datetime(pd.Series(values, dtype=object), utc=(type_code == PG_TIMESTAMPTZ))
+
+        # Text and every other type stay as Python objects
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return array
+
+
+    ############################## Aggregate Pushdown ##############################
+    def aggregate(self, measure: str, by: Optional[List[str]] = None, filters: Optional[dict] = None, agg: str = 'sum', conn=None,
+                  use_database: bool = True, use_cache: bool = True, csv_dir: str = CSV_EXPORT_PATH,
+                  credentials_path: str = DB_CREDENTIALS_PATH) -> pd.DataFrame:
+        """
+        Aggregates a measure by some dimensions where the data lives, instead of fetching rows and grouping them in pandas.
+
+        With a database, the plan runs as one parameterized GROUP BY over the entity, expenses and revenue tables,
+        so only the aggregated rows are fetched. Without one, or if the query fails, the same plan is evaluated
+        over the measure's CSV export (see aggregate_query.AggregatePlan.scan_csv()).
+
+        Example:
+        utils.aggregate('amount', by=['region', 'year'],
+                        filters={'year': [2014, 2015, 2016], 'expenditure_title': [TitleCategory.TECH, TitleCategory.VOCATIONAL]})
+
+        Parameters:
+        measure (str): 'amount', 'student_count', 'federal_revenue', 'state_revenue' or 'local_revenue'.
+        by (List[str], optional): Dimensions of the result: 'census_id', 'lea_name', 'state', 'region', 'year' and the measure's title column.
+                                  None for one total row.
+        filters (dict, optional): Dimension mapped to a value or list of values to keep. Title columns also accept TitleCategory members.
+        agg (str): 'sum', 'mean', 'count', 'min' or 'max'.
+        conn (psycopg2.connection, optional): Connection to use. Default: one taken from the pool for this call.
+        use_database (bool): False evaluates the plan over the CSV export only.
+        use_cache (bool): Serve and store the database result through the query cache (see execute_sql()).
+        csv_dir (str): Directory of the CSV exports.
+        credentials_path (str): Path of the JSON credentials file.
+
+        Returns:
+        pd.DataFrame: One row per group, sorted by the dimensions, with the aggregate in a column named after the measure.
+                      Empty if neither the database nor the export can answer.
+        """
+
+        plan = AggregatePlan(measure, by if by is not None else [], filters if filters is not None else {}, agg)
+
+        with stage('aggregate', measure=measure) as measured:
+            df, source = None, None
+            if use_database:
+                # An unreachable database or an exhausted pool (PoolError) falls back to the CSV export like a failed query
+                try:
+                    query, params = plan.to_sql()
+                    with nullcontext(conn) if conn is not None else self.database_conn(credentials_path) as query_conn:
+                        try:
+                            df, cached = self._cached_query(query, query_conn, params, use_cache=use_cache)
+                        except Exception:
+                            # The failed statement aborted the transaction; roll back so the connection stays usable
+                            query_conn.rollback()
+                            raise
+                    source = 'cache' if cached else 'database'
+                except Exception as e:
+                    print(f"Aggregate of '{measure}' failed in the database. Error: {e}")
+
+            if df is None:
+                df, source = plan.scan_csv(csv_dir)
+                if df is None:
+                    df, source = pd.DataFrame(columns=plan.by + [measure]), None
+
+            measured.rows_out = len(df)
+            measured.set(source=source)
+        return df
+
+
+    def aggregate_per_student(self, measure: str = 'amount', by: Optional[List[str]] = None, filters: Optional[dict] = None,
+                              conn=None, use_database: bool = True, csv_dir: str = CSV_EXPORT_PATH) -> pd.DataFrame:
+        """
+        Sums a measure and the student count by the same dimensions and divides them (see aggregate()).
+
+        Title dimensions and filters apply to the measure only; the student count is summed over the other dimensions.
+        by defaults to ['state', 'year'].
+
+        Returns:
+        pd.DataFrame: The dimensions, the measure, student_count and cost_per_student.
+        """
+
+        by = by if by is not None else ['state', 'year']
+        filters = filters if filters is not None else {}
+
+        student_dimensions = AggregatePlan('student_count').source.dimension_names
+        df = self.aggregate(measure, by, filters, conn=conn, use_database=use_database, csv_dir=csv_dir)
+        student_by = [name for name in by if name in student_dimensions]
+        student_counts = self.aggregate('student_count', student_by,
+                                        {name: value for name, value in filters.items() if name in student_dimensions},
+                                        conn=conn, use_database=use_database, csv_dir=csv_dir)
+
+        if student_by:
+            df = df.merge(student_counts, how='inner', on=student_by)
+        else:
+            df = df.assign(student_count=student_counts['student_count'].sum())
+        df['cost_per_student'] = df[measure] / df['student_count']
+        return df
+
+
+    ############################## Read from Local Warehouse ##############################
+    def read_warehouse(self, table: str, columns: Optional[List[str]] = None, years: Optional[List[int]] = None,
+                       states: Optional[List[str]] = None, filters: Optional[dict] = None,
+                       warehouse_path: Optional[str] = None) -> pd.DataFrame:
+        """
+        Reads a normalized table from the local Parquet warehouse written by the ingestion script.
+
+        Only the requested columns are read, and partitions outside the requested years and states are skipped.
+
+        Parameters:
+        table (str): Table name ('entity', 'annual_stats', 'expenditures', 'federal_revenue', 'state_revenue' or 'local_revenue').
+        columns (List[str], optional): Columns to read. Default is all columns.
+        years (List[int], optional): Four-digit fiscal years to keep, e.g. [2014, 2015, 2016].
+        states (List[str], optional): State names to keep.
+        filters (dict, optional): Column mapped to a value or list of values to keep, e.g. {'expenditure_title': [...]}.
+        warehouse_path (str, optional): Root directory of the warehouse. Default: warehouse.WAREHOUSE_PATH.
+
+        Returns:
+        pd.DataFrame: Matching rows. Yearly tables include 'fiscal_year' and 'state' columns.
+        """
+
+        # Imported here because the warehouse loads pyarrow.dataset, which only this method needs
+        from warehouse import ParquetWarehouse, WAREHOUSE_PATH
+
+        warehouse_path = warehouse_path or WAREHOUSE_PATH
+        if not hasattr(self, '_warehouses'):
+            self._warehouses = {}
+        if warehouse_path not in self._warehouses:
+            self._warehouses[warehouse_path] = ParquetWarehouse(warehouse_path)
+
+        return self._warehouses[warehouse_path].read(table, columns=columns, years=years,
+                                                      states=states, filters=filters)
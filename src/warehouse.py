@@ -0,0 +1,277 @@
+import os
+import uuid
+import shutil
+from typing import Dict, Iterable, List, Optional, Union
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+
+
+WAREHOUSE_PATH = os.path.join("..", "warehouse")
+
+# Yearly tables are partitioned by fiscal year and state; entity rows are shared across years
+YEARLY_PARTITIONS = ['fiscal_year', 'state']
+ENTITY_PARTITIONS = ['state']
+
+
+class YearWriter:
+    """
+    Writes one survey year into the warehouse, chunk by chunk, and swaps it in on commit().
+
+    Files are written to a private staging directory first. commit() replaces the year's partitions
+    of every yearly table and adds the new entity files. A year that fails half-way never replaces
+    the data that was already there.
+    """
+
+    def __init__(self, warehouse: 'ParquetWarehouse', i: int):
+        self.warehouse = warehouse
+        self.fiscal_year = 2000 + i
+        self.batch_id = uuid.uuid4().hex
+        self.staging_dir = os.path.join(warehouse.root, '.staging', self.batch_id)
+        self.known_census_ids = warehouse.census_ids()
+        self.chunk_number = 0
+        self.rows_written = {}
+
+
+    def write(self, database_map: dict) -> None:
+        """
+        Stages the tables of one cleaned year or chunk.
+
+        Parameters:
+        database_map (dict): Output of clean_frame().
+        """
+
+        entity = database_map['entity'][1]
+        states = entity.drop_duplicates('census_id').set_index('census_id')['state']
+
+        for table_name, [_, df] in database_map.items():
+            if table_name == 'entity':
+                frame = df[~df['census_id'].isin(self.known_census_ids)]
+                self.known_census_ids.update(frame['census_id'])
+                partitions = ENTITY_PARTITIONS
+            else:
+                frame = df.assign(fiscal_year=self.fiscal_year, state=df['census_id'].map(states))
+                partitions = YEARLY_PARTITIONS
+
+            if frame.empty:
+                continue
+
+            ds.write_dataset(to_arrow(frame),
+                             os.path.join(self.staging_dir, table_name),
+                             format='parquet',
+                             partitioning=partitions,
+                             partitioning_flavor='hive',
+                             # Entity files of every load stay side by side, so their names must never repeat
+                             basename_template=f'part-{self.fiscal_year}-{self.batch_id}-{self.chunk_number}-{{i}}.parquet',
+                             existing_data_behavior='overwrite_or_ignore')
+            self.rows_written[table_name] = self.rows_written.get(table_name, 0) + len(frame)
+
+        self.chunk_number += 1
+
+
+    def commit(self) -> dict:
+        """
+        Replaces the year's partitions with the staged files.
+
+        Returns:
+        dict: Table name mapped to the number of rows written.
+        """
+
+        root = self.warehouse.root
+        staged_tables = os.listdir(self.staging_dir) if os.path.isdir(self.staging_dir) else []
+
+        # Entity files only ever add census_ids, so they are moved in next to the existing ones, never over them
+        staged_entity = os.path.join(self.staging_dir, 'entity')
+        entity_moves = []
+        for dirpath, _, filenames in os.walk(staged_entity):
+            target_dir = os.path.join(root, 'entity', os.path.relpath(dirpath, staged_entity))
+            for filename in filenames:
+                target = os.path.join(target_dir, filename)
+                if os.path.exists(target):
+                    raise FileExistsError(f"Entity file {target} already exists; refusing to overwrite its census_ids")
+                entity_moves.append((os.path.join(dirpath, filename), target))
+
+        # Old partitions are renamed aside before any staged one is swapped in, and only deleted once every
+        # table holds the new year, so a failure part-way puts the old year back instead of leaving half of it
+        year_dir = f'fiscal_year={self.fiscal_year}'
+        replaced_dir = os.path.join(self.staging_dir, '.replaced')
+        moves = []
+        try:
+            # Tables that received no rows this time still lose the year's old partitions
+            for table_name in sorted(set(self.warehouse.yearly_tables(staged_tables)) | set(self.warehouse.yearly_tables())):
+                target = os.path.join(root, table_name, year_dir)
+                if os.path.isdir(target):
+                    aside = os.path.join(replaced_dir, table_name)
+                    os.makedirs(replaced_dir, exist_ok=True)
+                    os.replace(target, aside)
+                    moves.append((aside, target))
+
+            for table_name in self.warehouse.yearly_tables(staged_tables):
+                staged = os.path.join(self.staging_dir, table_name, year_dir)
+                if os.path.isdir(staged):
+                    target = os.path.join(root, table_name, year_dir)
+                    os.makedirs(os.path.dirname(target), exist_ok=True)
+                    os.replace(staged, target)
+                    moves.append((target, None))
+        except BaseException:
+            for source, target in reversed(moves):
+                if target is None:
+                    shutil.rmtree(source, ignore_errors=True)
+                else:
+                    os.replace(source, target)
+            self.warehouse.invalidate()
+            raise
+
+        for source, target in entity_moves:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(source, target)
+
+        self.rollback()
+        self.warehouse.invalidate()
+        return self.rows_written
+
+
+    def rollback(self) -> None:
+        shutil.rmtree(self.staging_dir, ignore_errors=True)
+
+
+def to_arrow(df: pd.DataFrame) -> pa.Table:
+    """
+    Converts a frame to Arrow, typing all-null columns as strings so every file of a table shares one schema.
+    """
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for position, arrow_field in enumerate(table.schema):
+        if pa.types.is_null(arrow_field.type):
+            table = table.set_column(position, arrow_field.name, table.column(position).cast(pa.string()))
+    return table
+
+
+class ParquetWarehouse:
+    """
+    Local columnar copy of the normalized LEA tables, stored as hive-partitioned Parquet.
+
+    Layout:
+    <root>/entity/state=<state>/part-*.parquet
+    <root>/<table>/fiscal_year=<yyyy>/state=<state>/part-*.parquet   (annual_stats, expenditures, revenue tables)
+
+    Every row of a yearly table carries the state of its census_id, so analyses can filter by
+    state without joining to entity.
+    """
+
+    def __init__(self, root: str = WAREHOUSE_PATH):
+        self.root = root
+        self._datasets = {}
+
+
+    ############################## Write ##############################
+
+    def year_writer(self, i: int) -> YearWriter:
+        """
+        Starts writing survey year i. Call write() per chunk and commit() at the end.
+        """
+
+        return YearWriter(self, i)
+
+
+    def write_year(self, i: int, database_maps: Iterable[dict]) -> dict:
+        """
+        Replaces survey year i with the given cleaned year or chunks.
+
+        Parameters:
+        i (int): Two-digit survey year.
+        database_maps (iterable of dict): Outputs of clean_frame() for the year.
+
+        Returns:
+        dict: Table name mapped to the number of rows written.
+        """
+
+        writer = self.year_writer(i)
+        try:
+            for database_map in database_maps:
+                writer.write(database_map)
+            return writer.commit()
+        except Exception:
+            writer.rollback()
+            raise
+
+
+    def census_ids(self) -> set:
+        """
+        Returns every census_id already stored in the entity table.
+        """
+
+        if not os.path.isdir(os.path.join(self.root, 'entity')):
+            return set()
+        return set(self.dataset('entity').to_table(columns=['census_id']).column('census_id').to_pylist())
+
+
+    def yearly_tables(self, candidates: Optional[List[str]] = None) -> List[str]:
+        names = candidates if candidates is not None else self.tables()
+        return [name for name in names if name != 'entity']
+
+
+    ############################## Read ##############################
+
+    def tables(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(name for name in os.listdir(self.root)
+                      if not name.startswith('.') and os.path.isdir(os.path.join(self.root, name)))
+
+
+    def invalidate(self) -> None:
+        self._datasets = {}
+
+
+    def dataset(self, table: str) -> ds.Dataset:
+        """
+        Opens a table as a pyarrow dataset whose schema covers every year's columns.
+
+        Mapping sheets differ between years (e.g. new _flag columns), so the file schemas are unified
+        rather than taken from the first file found.
+        """
+
+        if table not in self._datasets:
+            path = os.path.join(self.root, table)
+            if not os.path.isdir(path):
+                raise FileNotFoundError(f"Table '{table}' not found in warehouse {self.root}")
+
+            discovered = ds.dataset(path, format='parquet', partitioning='hive')
+            # Permissive, so categoricals written with different dictionary sizes still share one schema
+            schema = pa.unify_schemas([discovered.schema] +
+                                      [fragment.physical_schema for fragment in discovered.get_fragments()],
+                                      promote_options='permissive')
+            self._datasets[table] = ds.dataset(path, schema=schema, format='parquet', partitioning='hive')
+        return self._datasets[table]
+
+
+    def read(self, table: str, columns: Optional[List[str]] = None, years: Optional[List[int]] = None,
+             states: Optional[List[str]] = None, filters: Optional[Dict[str, Union[object, list]]] = None) -> pd.DataFrame:
+        """
+        Reads a table with column projection and partition pruning.
+
+        Parameters:
+        table (str): Table name, e.g. 'expenditures' or 'entity'.
+        columns (list, optional): Columns to read. All columns if None.
+        years (list, optional): Four-digit fiscal years to keep. Ignored for entity, which is not partitioned by year.
+        states (list, optional): State names to keep.
+        filters (dict, optional): Column mapped to a value or list of values to keep.
+
+        Returns:
+        pd.DataFrame: Matching rows.
+        """
+
+        dataset = self.dataset(table)
+        conditions = dict(filters or {})
+        if years is not None and 'fiscal_year' in dataset.schema.names:
+            conditions['fiscal_year'] = years
+        if states is not None:
+            conditions['state'] = states
+
+        expression = None
+        for column, value in conditions.items():
+            condition = ds.field(column).isin(list(value)) if isinstance(value, (list, tuple, set)) else ds.field(column) == value
+            expression = condition if expression is None else expression & condition
+
+        return dataset.to_table(columns=columns, filter=expression).to_pandas()
@@ -0,0 +1,446 @@
+import os
+import shutil
+import argparse
+from typing import Iterable, Iterator, List, Optional, Union
+import numpy as np
+import pandas as pd
+from bulk_loader import copy_frame, DEFAULT_BATCH_SIZE
+from query_cache import bump_data_version
+from warehouse import to_arrow
+
+
+ZSCORE_PATH = os.path.join("..", "zscores")
+
+# Same partitioning as the expenses.expenditure_zscores_by_state_year materialized view
+PARTITION_COLUMNS = ['state', 'expenditure_title', 'year']
+SCORE_COLUMNS = ['census_id', 'state', 'expenditure_title', 'year', 'amount', 'amount_z_score']
+
+ZSCORE_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS expenses.expenditure_zscores (
+    census_id VARCHAR NOT NULL,
+    state VARCHAR,
+    expenditure_title VARCHAR NOT NULL,
+    year INTEGER NOT NULL,
+    amount DOUBLE PRECISION,
+    amount_z_score DOUBLE PRECISION
+);
+CREATE INDEX IF NOT EXISTS expenditure_zscores_year_idx ON expenses.expenditure_zscores (year);
+"""
+
+# Rows of one year as read back from the database, for years loaded before z-scores were computed during ingestion
+YEAR_ROWS_QUERY = """
+SELECT e.census_id, e.state, exp.expenditure_title, exp.amount
+FROM expenses.expenditures AS exp
+INNER JOIN entity.entity AS e
+    ON e.census_id = exp.census_id
+WHERE exp.year = %(year)s
+AND exp.amount IS NOT NULL AND exp.amount != 0;
+"""
+
+
+############################## Moments ##############################
+
+def chunk_moments(rows: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes count, mean and sum of squared deviations (M2) of 'amount' per partition of one chunk.
+
+    Parameters:
+    rows (pd.DataFrame): Rows with the PARTITION_COLUMNS and 'amount'.
+
+    Returns:
+    pd.DataFrame: Indexed by the PARTITION_COLUMNS with columns count, mean and m2.
+    """
+
+    grouped = rows.groupby(PARTITION_COLUMNS, observed=True, sort=False)['amount']
+    deviations = rows['amount'] - grouped.transform('mean')
+    moments = pd.DataFrame({'count': grouped.size().astype('float64'),
+                            'mean': grouped.mean(),
+                            'm2': (deviations ** 2).groupby([rows[col] for col in PARTITION_COLUMNS],
+                                                            observed=True, sort=False).sum()})
+    return moments
+
+
+def merge_moments(a: Optional[pd.DataFrame], b: pd.DataFrame) -> pd.DataFrame:
+    """
+    Combines two sets of partition moments with the parallel form of Welford's update (Chan et al.).
+
+    Partitions found in only one of the inputs are kept as they are.
+    """
+
+    if a is None or a.empty:
+        return b
+    a, b = a.align(b, join='outer', fill_value=0)
+
+    n = a['count'] + b['count']
+    delta = b['mean'] - a['mean']
+    with np.errstate(divide='ignore', invalid='ignore'):
+        weight = np.where(n > 0, b['count'] / n, 0)
+    return pd.DataFrame({'count': n,
+                         'mean': a['mean'] + delta * weight,
+                         'm2': a['m2'] + b['m2'] + delta ** 2 * a['count'] * weight})
+
+
+def finalize_moments(moments: pd.DataFrame) -> pd.DataFrame:
+    """
+    Adds the sample standard deviation (PostgreSQL's STDDEV). Partitions with one row have none.
+    """
+
+    statistics = moments.copy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        statistics['stddev'] = np.where(statistics['count'] > 1, np.sqrt(statistics['m2'] / (statistics['count'] - 1)), np.nan)
+    return statistics
+
+
+def score_rows(rows: pd.DataFrame, statistics: pd.DataFrame) -> pd.DataFrame:
+    """
+    Computes amount_z_score for every row from its partition's mean and standard deviation.
+
+    As in the materialized view, the z-score is NULL where the standard deviation is zero (or undefined).
+
+    Parameters:
+    rows (pd.DataFrame): Rows with census_id, the PARTITION_COLUMNS and 'amount'.
+    statistics (pd.DataFrame): Output of finalize_moments(), indexed by the PARTITION_COLUMNS.
+
+    Returns:
+    pd.DataFrame: The SCORE_COLUMNS.
+    """
+
+    partition = pd.MultiIndex.from_frame(rows[PARTITION_COLUMNS])
+    positions = statistics.index.get_indexer(partition)
+    mean = statistics['mean'].to_numpy()[positions]
+    stddev = statistics['stddev'].to_numpy()[positions]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        z_scores = np.where(stddev == 0, np.nan, (rows['amount'].to_numpy() - mean) / stddev)
+
+    scores = rows[['census_id'] + PARTITION_COLUMNS + ['amount']].copy()
+    scores['amount_z_score'] = z_scores
+    return scores[SCORE_COLUMNS].reset_index(drop=True)
+
+
+def expenditure_rows(database_map: dict) -> pd.DataFrame:
+    """
+    Extracts the rows the z-scores are computed over from one cleaned year or chunk: non-null,
+    non-zero expenditure amounts with the state of their census_id.
+    """
+
+    entity = database_map['entity'][1]
+    expenditures = database_map['expenditures'][1]
+    states = entity.drop_duplicates('census_id').set_index('census_id')['state']
+
+    rows = expenditures[expenditures['amount'].notna() & (expenditures['amount'] != 0)]
+    return pd.DataFrame({'census_id': rows['census_id'].to_numpy(),
+                         'state': rows['census_id'].map(states).to_numpy(),
+                         'expenditure_title': rows['expenditure_title'].astype(str).to_numpy(),
+                         'year': rows['year'].dt.year.to_numpy(),
+                         'amount': rows['amount'].astype('float64').to_numpy()})
+
+
+############################## Engine ##############################
+
+class YearZScores:
+    """
+    Accumulates one survey year chunk by chunk and emits its z-scores on commit().
+
+    Partition moments are merged after every chunk, so the statistics take a single pass over the
+    rows. A z-score needs the statistics of the whole year, so each chunk's slim rows are spilled to
+    a Parquet file under <root>/.spill/year=<yyyy>. commit() scores and writes them one chunk at a time,
+    so memory stays bounded by the chunk size rather than the size of the year.
+    """
+
+    def __init__(self, engine: 'ZScoreEngine', i: int):
+        self.engine = engine
+        self.fiscal_year = 2000 + i
+        self.moments = None
+        self.spill_dir = os.path.join(engine.root, '.spill', f'year={self.fiscal_year}')
+        self.spill_files = []
+
+        # Files left behind by an earlier run of the year that never committed
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+    def write(self, database_map: dict) -> None:
+        """
+        Adds one cleaned year or chunk.
+
+        Parameters:
+        database_map (dict): Output of clean_frame().
+        """
+
+        self.add_rows(expenditure_rows(database_map))
+
+
+    def add_rows(self, rows: pd.DataFrame) -> None:
+        if rows.empty:
+            return
+        self.moments = merge_moments(self.moments, chunk_moments(rows))
+
+        path = os.path.join(self.spill_dir, f'chunk-{len(self.spill_files)}.parquet')
+        os.makedirs(self.spill_dir, exist_ok=True)
+        rows.to_parquet(path, index=False)
+        self.spill_files.append(path)
+
+
+    def scores(self, statistics: pd.DataFrame) -> Iterator[pd.DataFrame]:
+        """
+        Yields the z-scores of the spilled chunks one at a time.
+        """
+
+        for path in self.spill_files:
+            yield score_rows(pd.read_parquet(path), statistics)
+
+
+    def commit(self, db_engine=None) -> int:
+        """
+        Persists the year's partition statistics and writes its z-scores to the database or to a local file.
+
+        Parameters:
+        db_engine (sqlalchemy.engine.Engine, optional): Replace the year in expenses.expenditure_zscores.
+            If None, the scores are written to <root>/scores/year=<yyyy>.parquet.
+
+        Returns:
+        int: Number of z-scores written.
+        """
+
+        try:
+            moments = self.moments if self.moments is not None else chunk_moments(pd.DataFrame(columns=SCORE_COLUMNS[:-1]))
+            statistics = finalize_moments(moments)
+
+            self.engine.save_statistics(self.fiscal_year, statistics)
+            if db_engine is not None:
+                return self.engine.write_scores_to_database(db_engine, self.fiscal_year, self.scores(statistics))
+            return self.engine.write_scores_to_file(self.fiscal_year, self.scores(statistics))
+        finally:
+            self.rollback()
+
+
+    def rollback(self) -> None:
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+        self.spill_files = []
+
+
+class ZScoreEngine:
+    """
+    Computes the z-scores of expenses.expenditure_zscores_by_state_year in Python, one survey year at a time.
+
+    Partition statistics (count, mean, M2, stddev per state, expenditure_title and year) are stored as
+    one Parquet file per year under <root>/statistics. A year is only recomputed when it is loaded again,
+    so adding a year never touches the partitions of the others.
+
+    Layout:
+    <root>/statistics/year=<yyyy>.parquet
+    <root>/scores/year=<yyyy>.parquet   (when writing to local files)
+    <root>/.spill/year=<yyyy>/          (slim rows of a year being accumulated, removed on commit)
+    """
+
+    def __init__(self, root: str = ZSCORE_PATH):
+        self.root = root
+
+
+    def year_accumulator(self, i: int) -> YearZScores:
+        """
+        Starts accumulating survey year i. Call write() per chunk and commit() at the end.
+        """
+
+        return YearZScores(self, i)
+
+
+    def process_year(self, i: int, database_maps: Iterable[dict], db_engine=None) -> int:
+        """
+        Computes and writes the z-scores of survey year i from its cleaned year or chunks.
+
+        Returns:
+        int: Number of z-scores written.
+        """
+
+        accumulator = self.year_accumulator(i)
+        try:
+            for database_map in database_maps:
+                accumulator.write(database_map)
+        except Exception:
+            accumulator.rollback()
+            raise
+        return accumulator.commit(db_engine)
+
+
+    def process_year_from_database(self, fiscal_year: int, db_engine, chunksize: int = DEFAULT_BATCH_SIZE,
+                                   write_to_database: bool = True) -> int:
+        """
+        Computes the z-scores of a year that is already loaded, streaming its rows from the database in chunks.
+
+        Parameters:
+        fiscal_year (int): Four-digit fiscal year.
+        db_engine (sqlalchemy.engine.Engine): Database to read from (and write to).
+        chunksize (int): Rows fetched per chunk.
+        write_to_database (bool): Write the scores to the database; otherwise to a local file.
+
+        Returns:
+        int: Number of z-scores written.
+        """
+
+        accumulator = YearZScores(self, fiscal_year - 2000)
+        try:
+            with db_engine.connect().execution_options(stream_results=True) as conn:
+                for rows in pd.read_sql(YEAR_ROWS_QUERY, conn, params={'year': pd.Timestamp(fiscal_year, 1, 1)},
+                                        chunksize=chunksize):
+                    rows['year'] = fiscal_year
+                    rows['amount'] = rows['amount'].astype('float64')
+                    accumulator.add_rows(rows)
+        except Exception:
+            accumulator.rollback()
+            raise
+        return accumulator.commit(db_engine if write_to_database else None)
+
+
+    ############################## Statistics ##############################
+
+    def _path(self, kind: str, fiscal_year: int) -> str:
+        return os.path.join(self.root, kind, f'year={fiscal_year}.parquet')
+
+
+    def save_statistics(self, fiscal_year: int, statistics: pd.DataFrame) -> None:
+        write_parquet(statistics.reset_index(), self._path('statistics', fiscal_year))
+
+
+    def statistics_years(self) -> List[int]:
+        directory = os.path.join(self.root, 'statistics')
+        if not os.path.isdir(directory):
+            return []
+        return sorted(int(name[len('year='):-len('.parquet')]) for name in os.listdir(directory)
+                      if name.startswith('year=') and name.endswith('.parquet'))
+
+
+    def statistics(self, years: Optional[List[int]] = None) -> pd.DataFrame:
+        """
+        Returns the stored partition statistics, indexed by the PARTITION_COLUMNS.
+
+        Parameters:
+        years (list, optional): Four-digit fiscal years to load. All stored years if None.
+        """
+
+        years = self.statistics_years() if years is None else years
+        frames = [pd.read_parquet(self._path('statistics', year)) for year in years]
+        if not frames:
+            return finalize_moments(pd.DataFrame(columns=['count', 'mean', 'm2'],
+                                                 index=pd.MultiIndex.from_tuples([], names=PARTITION_COLUMNS)))
+        return pd.concat(frames, ignore_index=True).set_index(PARTITION_COLUMNS)
+
+
+    ############################## Output ##############################
+
+    def write_scores_to_file(self, fiscal_year: int, scores: Union[pd.DataFrame, Iterable[pd.DataFrame]]) -> int:
+        """
+        Replaces one year of scores in <root>/scores, writing one chunk of scores at a time.
+
+        Returns:
+        int: Number of z-scores written.
+        """
+
+        # Imported here so that only writing local files needs pyarrow's Parquet writer
+        import pyarrow.parquet as pq
+
+        frames = [scores] if isinstance(scores, pd.DataFrame) else scores
+        path = self._path('scores', fiscal_year)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = f'{path}.{os.getpid()}.tmp'
+        writer, written = None, 0
+        try:
+            for frame in frames:
+                table = to_arrow(frame)
+                if writer is None:
+                    writer = pq.ParquetWriter(temp_path, table.schema)
+                writer.write_table(table.cast(writer.schema))
+                written += len(frame)
+        except BaseException:
+            if writer is not None:
+                writer.close()
+                os.remove(temp_path)
+            raise
+
+        if writer is None:
+            write_parquet(pd.DataFrame(columns=SCORE_COLUMNS), path)
+        else:
+            # Readers never see a partial year
+            writer.close()
+            os.replace(temp_path, path)
+        return written
+
+
+    def read_scores(self, years: Optional[List[int]] = None) -> pd.DataFrame:
+        """
+        Reads z-scores written to local files, in the column layout of the materialized view.
+        """
+
+        directory = os.path.join(self.root, 'scores')
+        paths = sorted(os.path.join(directory, name) for name in os.listdir(directory)) if os.path.isdir(directory) else []
+        if years is not None:
+            paths = [self._path('scores', year) for year in years]
+        frames = [pd.read_parquet(path) for path in paths]
+        return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=SCORE_COLUMNS)
+
+
+    def write_scores_to_database(self, db_engine, fiscal_year: int, scores: Union[pd.DataFrame, Iterable[pd.DataFrame]],
+                                 batch_size: int = DEFAULT_BATCH_SIZE) -> int:
+        """
+        Replaces one year of expenses.expenditure_zscores in a single transaction, copying one chunk of scores at a time.
+
+        Returns:
+        int: Number of z-scores written.
+        """
+
+        frames = [scores] if isinstance(scores, pd.DataFrame) else scores
+        written = 0
+        conn = db_engine.raw_connection()
+        try:
+            cur = conn.cursor()
+            cur.execute(ZSCORE_TABLE_DDL)
+            cur.execute("DELETE FROM expenses.expenditure_zscores WHERE year = %s;", (fiscal_year,))
+            for frame in frames:
+                written += copy_frame(cur, frame, 'expenses', 'expenditure_zscores', batch_size)
+            conn.commit()
+            cur.close()
+            bump_data_version()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+        return written
+
+
+def write_parquet(df: pd.DataFrame, path: str) -> None:
+    # Write to a temporary file first so readers never see a partial year
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    df.to_parquet(temp_path, index=False)
+    os.replace(temp_path, path)
+
+
+############################## Command Line ##############################
+
+def main(argv: Optional[List[str]] = None):
+    # Imported here because the cleaning script itself imports this module
+    from LEA_Finance_Data_Cleaning_and_Automation_Script import create_database_engine
+
+    parser = argparse.ArgumentParser(description="Compute expenditure z-scores for years already loaded into PostgreSQL.")
+    parser.add_argument('--years', type=int, nargs='+', required=True, help="Four-digit fiscal years, e.g. 2019 2020.")
+    parser.add_argument('--root', default=ZSCORE_PATH, help=f"Directory of the stored statistics (default: {ZSCORE_PATH}).")
+    parser.add_argument('--to-file', action='store_true', help="Write scores to <root>/scores instead of the database.")
+    parser.add_argument('--force', action='store_true', help="Recompute years that already have stored statistics.")
+    args = parser.parse_args(argv)
+
+    zscore_engine = ZScoreEngine(args.root)
+    db_engine = create_database_engine()
+    try:
+        for year in args.years:
+            if year in zscore_engine.statistics_years() and not args.force:
+                print(f"{year}: statistics already stored, skipping (use --force to recompute)")
+                continue
+            written = zscore_engine.process_year_from_database(year, db_engine, write_to_database=not args.to_file)
+            print(f"{year}: {written:,} z-scores written")
+    finally:
+        db_engine.dispose()
+
+
+if __name__ == '__main__':
+    main()
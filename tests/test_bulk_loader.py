@@ -0,0 +1,76 @@
+import csv
+import io
+import numpy as np
+import pandas as pd
+import pytest
+from bulk_loader import COPY_NULL, copy_frame
+
+
+class RecordingCursor:
+    """
+    Stands in for a psycopg2 cursor and keeps the statement and payload of every COPY.
+    """
+
+    def __init__(self):
+        self.copies = []
+
+
+    def copy_expert(self, sql, buffer):
+        self.copies.append((sql, buffer.read()))
+
+
+@pytest.fixture
+def frame():
+    """
+    Rows mixing empty strings with missing values in text, float and nullable integer columns.
+    """
+
+    return pd.DataFrame({
+        'name': ['x', '', None, np.nan],
+        'amount': [1.0, np.nan, 2.5, 0.0],
+        'count': pd.array([1, None, 3, 4], dtype='Int64')
+    })
+
+
+def test_missing_values_are_written_as_the_null_marker(frame):
+    cur = RecordingCursor()
+
+    assert copy_frame(cur, frame, 'expenses', 'expenditures') == 4
+
+    sql, payload = cur.copies[0]
+    assert sql == ('COPY "expenses"."expenditures" ("name", "amount", "count") '
+                   f"FROM STDIN WITH (FORMAT csv, NULL '{COPY_NULL}')")
+    rows = list(csv.reader(io.StringIO(payload)))
+    assert rows == [['x', '1.0', '1'], ['', COPY_NULL, COPY_NULL], [COPY_NULL, '2.5', '3'], [COPY_NULL, '0.0', '4']]
+
+
+def test_rows_are_copied_in_batches(frame):
+    cur = RecordingCursor()
+
+    assert copy_frame(cur, frame, 'expenses', 'expenditures', batch_size=3) == 4
+
+    assert [len(payload.splitlines()) for _, payload in cur.copies] == [3, 1]
+
+
+def test_empty_frame_copies_nothing(frame):
+    cur = RecordingCursor()
+
+    assert copy_frame(cur, frame.iloc[0:0], 'expenses', 'expenditures') == 0
+    assert cur.copies == []
+
+
+def test_null_and_empty_string_round_trip(frame, tmp_path):
+    pgserver = pytest.importorskip('pgserver')
+    psycopg2 = pytest.importorskip('psycopg2')
+
+    server = pgserver.get_server(tmp_path / 'pgdata', cleanup_mode='stop')
+    conn = psycopg2.connect(server.get_uri())
+    try:
+        cur = conn.cursor()
+        cur.execute('CREATE TEMPORARY TABLE copied (name TEXT, amount DOUBLE PRECISION, count BIGINT);')
+        assert copy_frame(cur, frame, 'pg_temp', 'copied', batch_size=3) == 4
+
+        cur.execute('SELECT name, amount, count FROM copied;')
+        assert cur.fetchall() == [('x', 1.0, 1), ('', None, None), (None, 2.5, 3), (None, 0.0, 4)]
+    finally:
+        conn.close()
@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+from change_statistics import change_statistics, growth_rates
+from utilities_core import CoreUtilities
+
+
+GROUP_COLUMNS = ['region', 'expenditure_title']
+
+WINDOWS = [(2010, 2015), (2011, 2013), (2012, 2014), (2013, 2013)]
+
+
+@pytest.fixture
+def expenditures():
+    """
+    Two regions and two titles over 2010-2015, with a missing year, zero amounts and a group-year split over two rows.
+    """
+
+    rng = np.random.default_rng(7)
+    index = pd.MultiIndex.from_product([['Midwest', 'South'], ['instruction', 'tech_education'], range(2010, 2016)],
+                                       names=['region', 'expenditure_title', 'year'])
+    df = index.to_frame(index=False).assign(amount=rng.integers(1, 1_000, len(index)).astype('float64'))
+    # South tech_education has no 2012 row and is zero in 2011 and 2014
+    df = df[~((df['region'] == 'South') & (df['expenditure_title'] == 'tech_education') & (df['year'] == 2012))]
+    df.loc[(df['region'] == 'South') & (df['expenditure_title'] == 'tech_education') & df['year'].isin([2011, 2014]), 'amount'] = 0.0
+    # Midwest instruction 2013 is reported in two rows
+    split = df[(df['region'] == 'Midwest') & (df['expenditure_title'] == 'instruction') & (df['year'] == 2013)].assign(amount=50.0)
+    return pd.concat([df, split], ignore_index=True)
+
+
+@pytest.fixture
+def student_counts():
+    index = pd.MultiIndex.from_product([['Midwest', 'South'], range(2010, 2016)], names=['region', 'year'])
+    counts = index.to_frame(index=False).assign(student_count=np.arange(1, 13) * 100)
+    # No students reported for the South in 2015
+    counts.loc[(counts['region'] == 'South') & (counts['year'] == 2015), 'student_count'] = 0
+    return counts
+
+
+def notebook_growth_rates(df, value_column, group_columns):
+    """
+    The sort_values() / groupby().diff() / groupby().pct_change() * 100 cells of the notebooks.
+    """
+
+    df = df.groupby(group_columns + ['year'], as_index=False)[value_column].sum()
+    df = df.sort_values(group_columns + ['year']).reset_index(drop=True)
+    series = df.groupby(group_columns)[value_column] if group_columns else df[value_column]
+    df['yearly_difference'] = series.diff()
+    # pct_change() turns growth from zero into inf; growth_rates() leaves it undefined
+    df['growth_rate'] = (series.pct_change() * 100).replace([np.inf, -np.inf], np.nan)
+    return df
+
+
+def as_float(value):
+    return np.nan if value is None else float(value)
+
+
+@pytest.mark.parametrize('group_columns', [GROUP_COLUMNS, ['region'], []])
+def test_growth_rates_match_pct_change(expenditures, group_columns):
+    expected = notebook_growth_rates(expenditures, 'amount', group_columns)
+
+    actual = growth_rates(expenditures, 'amount', group_columns)
+
+    actual = actual.sort_values(group_columns + ['year']).reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual[expected.columns], expected, check_dtype=False)
+
+
+def test_growth_rates_wrapper_defaults_to_national_totals(expenditures):
+    expected = growth_rates(expenditures, 'amount')
+
+    pd.testing.assert_frame_equal(CoreUtilities().calculate_growth_rates(expenditures, 'amount'), expected)
+
+
+def test_growth_rates_per_student(expenditures, student_counts):
+    actual = growth_rates(expenditures, 'amount', GROUP_COLUMNS, student_counts)
+
+    merged = actual.merge(student_counts, on=['region', 'year'], suffixes=('', '_expected'))
+    assert len(merged) == len(actual)
+    assert (merged['student_count'] == merged['student_count_expected']).all()
+    expected = (merged['amount'] / merged['student_count_expected']).replace([np.inf, -np.inf], np.nan)
+    np.testing.assert_allclose(merged['cost_per_student'], expected)
+
+
+def test_change_statistics_match_per_call_helpers(expenditures):
+    utils = CoreUtilities()
+    growth_df = notebook_growth_rates(expenditures, 'amount', GROUP_COLUMNS)
+
+    actual = change_statistics(expenditures, 'amount', GROUP_COLUMNS, WINDOWS)
+
+    assert len(actual) == 4 * len(WINDOWS)
+    for row in actual.itertuples(index=False):
+        criteria = {'region': row.region, 'expenditure_title': row.expenditure_title}
+        start_value = utils.get_single_value_from_df(growth_df, {**criteria, 'year': row.start_year}, 'amount')
+        end_value = utils.get_single_value_from_df(growth_df, {**criteria, 'year': row.end_year}, 'amount')
+        mean_growth_rate = utils.calculate_mean_growth_rate(growth_df, row.start_year, row.end_year,
+                                                            row.expenditure_title, row.region)
+
+        np.testing.assert_allclose(row.start_value, as_float(start_value))
+        np.testing.assert_allclose(row.end_value, as_float(end_value))
+        np.testing.assert_allclose(row.mean_growth_rate, mean_growth_rate)
+        if start_value is None or end_value is None:
+            assert np.isnan(row.absolute_difference) and np.isnan(row.percent_difference)
+        else:
+            np.testing.assert_allclose(row.absolute_difference, utils.calculate_total_difference(start_value, end_value))
+            np.testing.assert_allclose(row.percent_difference,
+                                       as_float(utils.calculate_percentage_difference(start_value, end_value)))
+
+
+def test_compound_growth_rate(expenditures):
+    actual = change_statistics(expenditures, 'amount', GROUP_COLUMNS, WINDOWS)
+
+    periods = actual['end_year'] - actual['start_year']
+    ratio = actual['end_value'] / actual['start_value'].where(actual['start_value'] != 0)
+    expected = ((ratio ** (1 / periods)) - 1) * 100
+    # A single-year window has no compound rate
+    expected = expected.where(periods > 0)
+    np.testing.assert_allclose(actual['compound_growth_rate'], expected)
+
+
+def test_change_statistics_per_student(expenditures, student_counts):
+    growth_df = growth_rates(expenditures, 'amount', GROUP_COLUMNS, student_counts)
+    per_student = growth_df[GROUP_COLUMNS + ['year', 'cost_per_student']].rename(columns={'cost_per_student': 'amount'})
+
+    actual = change_statistics(expenditures, 'amount', GROUP_COLUMNS, WINDOWS, student_counts)
+    expected = change_statistics(per_student, 'amount', GROUP_COLUMNS, WINDOWS)
+
+    for statistic in ('start_value', 'end_value', 'absolute_difference', 'percent_difference', 'mean_growth_rate'):
+        np.testing.assert_allclose(actual[f'cost_per_student_{statistic}'], expected[statistic])
+
+
+def test_wrapper_without_windows_returns_no_rows(expenditures):
+    actual = CoreUtilities().calculate_change_statistics(expenditures, 'amount', GROUP_COLUMNS)
+
+    assert actual.empty
+    assert {'start_year', 'end_year', 'mean_growth_rate'} <= set(actual.columns)
@@ -0,0 +1,86 @@
+import numpy as np
+import pandas as pd
+import pytest
+from chart_rendering import aggregate_for_plot, downsample_lines, line_render_mode
+
+
+@pytest.fixture
+def lines():
+    """
+    A long noisy series with a spike and a dip, a second long series with gaps, and a short series, in shuffled order.
+    """
+
+    rng = np.random.default_rng(3)
+    noisy = pd.DataFrame({'state': 'CA', 'x': np.arange(1_000), 'y': rng.normal(0, 1, 1_000)})
+    noisy.loc[417, 'y'], noisy.loc[803, 'y'] = 50.0, -50.0
+    gappy = pd.DataFrame({'state': 'TX', 'x': np.arange(700), 'y': rng.normal(10, 3, 700)})
+    gappy.loc[gappy.index % 7 == 0, 'y'] = np.nan
+    short = pd.DataFrame({'state': 'WY', 'x': np.arange(40), 'y': rng.normal(0, 1, 40)})
+    return pd.concat([noisy, gappy, short], ignore_index=True).sample(frac=1, random_state=0)
+
+
+def buckets(series, n_buckets):
+    series = series.sort_values('x').reset_index(drop=True)
+    return series.assign(bucket=np.arange(len(series)) * n_buckets // len(series))
+
+
+@pytest.mark.parametrize('max_points', [100, 101, 2])
+def test_each_bucket_keeps_its_min_and_max(lines, max_points):
+    kept = downsample_lines(lines, 'x', 'y', ['state'], max_points=max_points)
+
+    n_buckets = max(max_points // 2, 1)
+    for state in ('CA', 'TX'):
+        series = buckets(lines[lines['state'] == state], n_buckets)
+        kept_series = kept[kept['state'] == state]
+        assert len(kept_series) <= 2 * n_buckets
+        for _, bucket in series.groupby('bucket'):
+            kept_bucket = kept_series[kept_series['x'].isin(bucket['x'])]
+            assert kept_bucket['y'].min() == bucket['y'].min()
+            assert kept_bucket['y'].max() == bucket['y'].max()
+
+
+def test_spikes_survive(lines):
+    kept = downsample_lines(lines, 'x', 'y', ['state'], max_points=20)
+
+    assert {50.0, -50.0} <= set(kept.loc[kept['state'] == 'CA', 'y'])
+
+
+def test_short_series_are_untouched_and_rows_are_ordered(lines):
+    kept = downsample_lines(lines, 'x', 'y', ['state'], max_points=100)
+
+    expected = lines[lines['state'] == 'WY'].sort_values('x')
+    assert kept.loc[kept['state'] == 'WY', 'x'].tolist() == expected['x'].tolist()
+    assert kept['state'].is_monotonic_increasing
+    assert kept.groupby('state')['x'].apply(lambda x: x.is_monotonic_increasing).all()
+
+
+def test_no_downsampling_below_the_cap(lines):
+    kept = downsample_lines(lines, 'x', 'y', ['state'], max_points=1_000)
+
+    assert len(kept) == len(lines)
+
+
+def test_without_series_keys(lines):
+    one_line = lines[lines['state'] == 'CA'].drop(columns='state')
+
+    kept = downsample_lines(one_line, 'x', 'y', [], max_points=10)
+
+    assert len(kept) <= 10
+    assert kept['y'].max() == 50.0 and kept['y'].min() == -50.0
+
+
+def test_aggregate_for_plot_collapses_to_one_row_per_mark():
+    df = pd.DataFrame({'state': ['CA', 'CA', 'TX', 'TX'], 'year': [2019, 2019, 2019, 2020],
+                       'amount': [1.0, 2.0, 3.0, 4.0], 'region': ['West', 'West', 'South', 'South'],
+                       'census_id': ['01', '02', '03', '04']})
+
+    reduced, hover_data = aggregate_for_plot(df, 'year', 'amount', color='state', hover_data=['region', 'census_id'])
+
+    assert reduced[['state', 'year', 'amount', 'region']].values.tolist() == \
+        [['CA', 2019, 3.0, 'West'], ['TX', 2019, 3.0, 'South'], ['TX', 2020, 4.0, 'South']]
+    assert hover_data == ['region']
+
+
+def test_line_render_mode():
+    assert line_render_mode(10) == 'svg'
+    assert line_render_mode(10_000) == 'webgl'
@@ -0,0 +1,116 @@
+import numpy as np
+import pandas as pd
+import pytest
+from cost_distribution import REGION_OF_STATE, CostDistribution, LogBuckets
+
+
+STATES = ['Alabama', 'Arkansas', 'California', 'Oregon', 'Ohio']
+
+QUANTILES = [0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1]
+
+
+@pytest.fixture
+def rows():
+    """
+    LEA-level costs per student over five orders of magnitude, with a few zero and negative costs.
+    """
+
+    rng = np.random.default_rng(11)
+    index = pd.MultiIndex.from_product([STATES, [2019, 2020], ['instruction', 'tech_related_equipment'], range(400)],
+                                       names=['state', 'year', 'expenditure_title', 'lea'])
+    rows = index.to_frame(index=False).drop(columns='lea')
+    costs = rng.lognormal(6, 2, len(rows))
+    costs[rng.random(len(rows)) < 0.03] = 0.0
+    costs[rng.random(len(rows)) < 0.01] *= -1
+    return rows.assign(year=rows['year'].astype('int16'), cost_per_student=costs)
+
+
+def exact_quantiles(rows, by, quantiles):
+    """
+    Exact quantiles with the sketch's rank definition: the value at rank q * (n - 1), costs of zero or below ranking as zero.
+    """
+
+    costs = rows.assign(cost_per_student=rows['cost_per_student'].clip(lower=0))
+    grouped = costs.groupby(by, sort=True)['cost_per_student'] if by else [((), costs['cost_per_student'])]
+    return pd.DataFrame([[np.quantile(values, q, method='lower') for q in quantiles] for _, values in grouped],
+                        columns=[f'p{q * 100:g}' for q in quantiles])
+
+
+def assert_within_relative_accuracy(actual, expected, relative_accuracy):
+    for col in expected.columns:
+        error = np.abs(actual[col].to_numpy() - expected[col].to_numpy())
+        assert (error <= relative_accuracy * np.abs(expected[col].to_numpy()) * (1 + 1e-9)).all(), col
+
+
+@pytest.mark.parametrize('by', [['state', 'year', 'expenditure_title'], ['region', 'year'], ['year'], []])
+@pytest.mark.parametrize('relative_accuracy', [0.01, 0.05])
+def test_merged_quantiles_within_relative_accuracy(rows, by, relative_accuracy):
+    rng = np.random.default_rng(5)
+    half = rng.random(len(rows)) < 0.5
+    merged = CostDistribution.from_rows(rows[half], relative_accuracy).merge(
+        CostDistribution.from_rows(rows[~half], relative_accuracy))
+
+    actual = merged.quantiles(QUANTILES, by=by)
+
+    expected = exact_quantiles(rows.assign(region=rows['state'].map(REGION_OF_STATE)), by, QUANTILES)
+    assert len(actual) == len(expected)
+    assert_within_relative_accuracy(actual, expected, relative_accuracy)
+
+
+def test_merge_matches_a_single_sketch(rows):
+    by_state = [CostDistribution.from_rows(shard) for _, shard in rows.groupby('state')]
+    merged = by_state[0]
+    for sketch in by_state[1:]:
+        merged = merged.merge(sketch)
+    whole = CostDistribution.from_rows(rows)
+
+    pd.testing.assert_frame_equal(merged.quantiles(QUANTILES, by=['region', 'expenditure_title']),
+                                  whole.quantiles(QUANTILES, by=['region', 'expenditure_title']))
+    pd.testing.assert_frame_equal(merged.quantiles(QUANTILES, by=[]), whole.quantiles(QUANTILES, by=[]))
+
+
+def test_count_mean_and_bounds(rows):
+    actual = CostDistribution.from_rows(rows).quantiles([0, 1], by=['state'])
+
+    grouped = rows.groupby('state')['cost_per_student']
+    assert actual['count'].tolist() == grouped.size().tolist()
+    np.testing.assert_allclose(actual['mean'], grouped.mean())
+    # Quantiles never leave [min, max]; costs below zero rank as zero
+    assert (actual['p100'] <= grouped.max().to_numpy()).all()
+    assert_within_relative_accuracy(actual[['p100']], grouped.max().to_frame('p100').reset_index(drop=True), 0.01)
+    assert (actual['p0'] == 0).all()
+
+
+def test_filters_select_sketches(rows):
+    distribution = CostDistribution.from_rows(rows)
+
+    actual = distribution.quantiles([0.5], by=['year'], filters={'region': 'West', 'expenditure_title': 'instruction'})
+
+    selected = rows[rows['state'].isin(['California', 'Oregon']) & (rows['expenditure_title'] == 'instruction')]
+    assert actual['count'].tolist() == selected.groupby('year').size().tolist()
+    assert_within_relative_accuracy(actual, exact_quantiles(selected, ['year'], [0.5]), distribution.relative_accuracy)
+
+
+def test_merge_requires_the_same_accuracy(rows):
+    with pytest.raises(ValueError):
+        CostDistribution.from_rows(rows, 0.01).merge(CostDistribution.from_rows(rows, 0.02))
+
+
+def test_unknown_dimension(rows):
+    with pytest.raises(ValueError):
+        CostDistribution.from_rows(rows).quantiles(by=['county'])
+
+
+@pytest.mark.parametrize('relative_accuracy', [0, 1, -0.5])
+def test_log_buckets_reject_invalid_accuracy(relative_accuracy):
+    with pytest.raises(ValueError):
+        LogBuckets(relative_accuracy)
+
+
+def test_log_bucket_values_are_within_relative_accuracy():
+    buckets = LogBuckets(0.001)
+    values = np.geomspace(1e-3, 1e7, 10_000)
+
+    representative = buckets.value(buckets.index(values))
+
+    assert (np.abs(representative - values) <= 0.001 * values * (1 + 1e-9)).all()
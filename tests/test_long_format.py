@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+import pytest
+from expenditures import TitleRegistry
+from long_format import LONG_TABLES, melt_df, verify_wide_to_long, wide_to_long
+
+
+TABLE_COLUMNS = {
+    'expenditures': ['census_id', 'year', 'instruction', 'tech_education', 'vocational_education', 'instruction_flag'],
+    'local_revenue': ['census_id', 'year', 'property_tax', 'local_other'],
+    'state_revenue': ['census_id', 'year', 'state_formula'],
+    'federal_revenue': ['census_id', 'year', 'title_i', 'vocational_grants', 'title_i_flag']
+}
+
+
+@pytest.fixture
+def wide():
+    """
+    Cleaned wide frame of four LEAs with dense measures (no null or zero) and sparse ones (mostly null or zero).
+    """
+
+    return pd.DataFrame({
+        'census_id': ['01', '02', '03', '04'],
+        'year': pd.to_datetime(['2019-01-01'] * 4),
+        # dense
+        'instruction': [100.0, 250.5, 75.0, 12.0],
+        'property_tax': [9.0, 8.0, 7.0, 6.0],
+        'state_formula': [1.5, 2.5, 3.5, 4.5],
+        'title_i': [10.0, 20.0, 30.0, 40.0],
+        # sparse
+        'tech_education': [np.nan, 0.0, 5.0, np.nan],
+        'vocational_education': [0.0, 0.0, 0.0, 3.0],
+        'local_other': [np.nan, np.nan, np.nan, np.nan],
+        'vocational_grants': [np.nan, 0.0, 0.0, 2.0],
+        # flags
+        'instruction_flag': ['R', 'I', 'R', np.nan],
+        'title_i_flag': ['A', 'A', np.nan, 'I']
+    })
+
+
+def expected_tables(df, drop_empty=False):
+    tables = {}
+    for table, (schema, _, value_column) in LONG_TABLES.items():
+        expected = melt_df(df, schema, TABLE_COLUMNS[table])
+        if drop_empty:
+            expected = expected[expected[value_column].notna() & (expected[value_column] != 0)].reset_index(drop=True)
+        tables[table] = expected
+    return tables
+
+
+def as_melted(actual, expected, value_column):
+    # pd.melt's title dtype depends on the pandas version (object or str), so strings are compared by value
+    return actual.astype({col: expected[col].dtype for col in expected.columns if col not in (value_column, 'year')})
+
+
+@pytest.mark.parametrize('drop_empty', [False, True])
+def test_plain_output_matches_melt_df(wide, drop_empty):
+    actual = wide_to_long(wide, TABLE_COLUMNS, drop_empty=drop_empty, categorical=False)
+
+    for table, expected in expected_tables(wide, drop_empty).items():
+        value_column = LONG_TABLES[table][2]
+        pd.testing.assert_frame_equal(as_melted(actual[table], expected, value_column), expected)
+
+
+def test_drop_empty_keeps_only_non_null_non_zero_measures(wide):
+    actual = wide_to_long(wide, TABLE_COLUMNS, drop_empty=True, categorical=False)
+
+    assert actual['local_revenue']['revenue_title'].tolist() == ['property_tax'] * 4
+    assert actual['expenditures']['expenditure_title'].value_counts().to_dict() == \
+        {'instruction': 4, 'tech_education': 1, 'vocational_education': 1}
+    assert actual['federal_revenue']['revenue'].tolist() == [10.0, 20.0, 30.0, 40.0, 2.0]
+
+
+@pytest.mark.parametrize('drop_empty', [False, True])
+def test_categorical_titles_and_flags_match_melt_df(wide, drop_empty):
+    actual = wide_to_long(wide, TABLE_COLUMNS, drop_empty=drop_empty, categorical=True)
+
+    for table, expected in expected_tables(wide, drop_empty).items():
+        _, title_column, value_column = LONG_TABLES[table]
+        measures = [col for col in TABLE_COLUMNS[table] if col not in ('census_id', 'year') and not col.endswith('_flag')]
+        assert isinstance(actual[table][title_column].dtype, pd.CategoricalDtype)
+        assert actual[table][title_column].cat.categories.tolist() == measures
+        for col in TABLE_COLUMNS[table]:
+            if col.endswith('_flag'):
+                assert isinstance(actual[table][col].dtype, pd.CategoricalDtype)
+        pd.testing.assert_frame_equal(as_melted(actual[table], expected, value_column), expected)
+
+
+@pytest.mark.parametrize('drop_empty', [False, True])
+def test_title_code_encodes_each_title(wide, drop_empty):
+    titles = TitleRegistry()
+    for table in LONG_TABLES:
+        for col in reversed(TABLE_COLUMNS[table]):
+            if col not in ('census_id', 'year') and not col.endswith('_flag'):
+                titles.add(table, col)
+
+    actual = wide_to_long(wide, TABLE_COLUMNS, drop_empty=drop_empty, titles=titles)
+
+    for table, (_, title_column, _) in LONG_TABLES.items():
+        long_table = actual[table]
+        assert long_table.columns.tolist().index('title_code') == long_table.columns.tolist().index(title_column) + 1
+        expected_codes = [titles.code(table, name) for name in long_table[title_column]]
+        assert long_table['title_code'].tolist() == expected_codes
+
+
+def test_compact_dtypes_match_melt_df(wide):
+    compact = wide.astype({'instruction': 'float32', 'title_i': 'Int32', 'instruction_flag': 'category'})
+    verify_wide_to_long(compact, TABLE_COLUMNS)
+
+
+def test_empty_frame(wide):
+    empty = wide.iloc[0:0]
+    for drop_empty in (False, True):
+        actual = wide_to_long(empty, TABLE_COLUMNS, drop_empty=drop_empty, categorical=False)
+        for table, expected in expected_tables(empty, drop_empty).items():
+            assert actual[table].empty
+            assert actual[table].columns.tolist() == expected.columns.tolist()
+    verify_wide_to_long(empty, TABLE_COLUMNS)
@@ -0,0 +1,97 @@
+import pytest
+from long_format import LONG_TABLES
+from schema_manager import FISCAL_YEAR_DEFINITION, create_table_sql, index_definitions, year_partition_sql
+
+
+LONG_COLUMNS = {'census_id': 'TEXT', 'year': 'TIMESTAMP', 'expenditure_title': 'TEXT', 'title_code': 'SMALLINT',
+                'amount': 'DOUBLE PRECISION', 'instruction_flag': 'TEXT'}
+
+
+def test_long_table_is_partitioned_by_fiscal_year():
+    statements = create_table_sql('expenses', 'expenditures', LONG_COLUMNS, fiscal_years=range(2019, 2021))
+
+    assert statements == [
+        'CREATE TABLE "expenses"."expenditures" ("census_id" TEXT, "year" TIMESTAMP, "expenditure_title" TEXT, '
+        '"title_code" SMALLINT, "amount" DOUBLE PRECISION, "instruction_flag" TEXT, '
+        f'{FISCAL_YEAR_DEFINITION}) PARTITION BY RANGE (year);',
+        'CREATE TABLE IF NOT EXISTS "expenses"."expenditures_2019" PARTITION OF "expenses"."expenditures" '
+        "FOR VALUES FROM ('2019-01-01') TO ('2020-01-01');",
+        'CREATE TABLE IF NOT EXISTS "expenses"."expenditures_2020" PARTITION OF "expenses"."expenditures" '
+        "FOR VALUES FROM ('2020-01-01') TO ('2021-01-01');",
+        'CREATE TABLE IF NOT EXISTS "expenses"."expenditures_default" PARTITION OF "expenses"."expenditures" DEFAULT;'
+    ]
+
+
+@pytest.mark.parametrize('table', list(LONG_TABLES))
+def test_every_long_table_gets_a_partition_per_year(table):
+    schema = LONG_TABLES[table][0]
+
+    statements = create_table_sql(schema, table, LONG_COLUMNS)
+
+    assert statements[0].endswith('PARTITION BY RANGE (year);')
+    assert statements[1:-1] == [year_partition_sql(schema, table, year) for year in range(2010, 2021)]
+    assert statements[-1].endswith('DEFAULT;')
+
+
+def test_entity_table_has_census_id_primary_key():
+    statements = create_table_sql('entity', 'entity', {'census_id': 'TEXT', 'state': 'TEXT', 'name': 'TEXT'})
+
+    assert statements == ['CREATE TABLE "entity"."entity" ("census_id" TEXT PRIMARY KEY, "state" TEXT, "name" TEXT);']
+
+
+def test_plain_table_gets_fiscal_year_column():
+    statements = create_table_sql('entity', 'annual_stats', {'census_id': 'TEXT', 'year': 'TIMESTAMP',
+                                                             'fall_membership': 'DOUBLE PRECISION'})
+
+    assert statements == ['CREATE TABLE "entity"."annual_stats" ("census_id" TEXT, "year" TIMESTAMP, '
+                          f'"fall_membership" DOUBLE PRECISION, {FISCAL_YEAR_DEFINITION});']
+
+
+def test_quoted_identifiers():
+    statements = create_table_sql('entity', 'entity', {'census_id': 'TEXT', 'odd"name': 'TEXT'})
+
+    assert '"odd""name" TEXT' in statements[0]
+
+
+def test_long_table_indexes():
+    assert index_definitions('expenses', 'expenditures') == [
+        'CREATE INDEX IF NOT EXISTS expenditures_census_id_idx ON "expenses"."expenditures" (census_id);',
+        'CREATE INDEX IF NOT EXISTS expenditures_title_code_year_idx ON "expenses"."expenditures" (title_code, fiscal_year);',
+        'CREATE INDEX IF NOT EXISTS expenditures_fiscal_year_idx ON "expenses"."expenditures" (fiscal_year);'
+    ]
+
+
+def test_entity_and_annual_stats_indexes():
+    assert index_definitions('entity', 'entity') == ['CREATE INDEX IF NOT EXISTS entity_state_idx ON "entity"."entity" (state);']
+    assert index_definitions('entity', 'annual_stats') == [
+        'CREATE INDEX IF NOT EXISTS annual_stats_census_id_idx ON "entity"."annual_stats" (census_id, fiscal_year);',
+        'CREATE INDEX IF NOT EXISTS annual_stats_fall_membership_idx ON "entity"."annual_stats" (fall_membership);'
+    ]
+
+
+def test_statements_run_and_route_rows_to_their_partition(tmp_path):
+    pgserver = pytest.importorskip('pgserver')
+    psycopg2 = pytest.importorskip('psycopg2')
+
+    server = pgserver.get_server(tmp_path / 'pgdata', cleanup_mode='stop')
+    conn = psycopg2.connect(server.get_uri())
+    try:
+        cur = conn.cursor()
+        cur.execute('CREATE SCHEMA expenses;')
+        for statement in create_table_sql('expenses', 'expenditures', LONG_COLUMNS, fiscal_years=range(2019, 2021)):
+            cur.execute(statement)
+        for statement in index_definitions('expenses', 'expenditures'):
+            cur.execute(statement)
+
+        cur.execute("INSERT INTO expenses.expenditures (census_id, year, expenditure_title, title_code, amount) "
+                    "VALUES ('01', '2019-07-01', 'instruction', 1, 10), ('01', '2020-01-01', 'instruction', 1, 20), "
+                    "('01', '2009-01-01', 'instruction', 1, 30);")
+        cur.execute('SELECT tableoid::regclass::text, fiscal_year FROM expenses.expenditures ORDER BY amount;')
+        assert cur.fetchall() == [('expenses.expenditures_2019', 2019), ('expenses.expenditures_2020', 2020),
+                                  ('expenses.expenditures_default', 2009)]
+
+        cur.execute("SELECT indexname FROM pg_indexes WHERE schemaname = 'expenses' AND tablename = 'expenditures';")
+        assert {name for name, in cur.fetchall()} == {'expenditures_census_id_idx', 'expenditures_title_code_year_idx',
+                                                      'expenditures_fiscal_year_idx'}
+    finally:
+        conn.close()
@@ -0,0 +1,68 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from column_mapping import COLUMN_MAP_PATH
+from long_format import LONG_TABLES
+from synthetic_data import SENTINELS, SyntheticSurvey, lea_attributes, synthetic_sheet, synthetic_year, template_sheets
+
+
+WORKBOOK_PATH = os.path.join(os.path.dirname(__file__), '..', os.path.basename(COLUMN_MAP_PATH))
+
+
+@pytest.fixture(scope='module')
+def template():
+    return template_sheets(WORKBOOK_PATH)[20]
+
+
+def amount_columns(sheet):
+    amounts = sheet[sheet['Table'].isin(list(LONG_TABLES)) & (sheet['Type'].str.upper() == 'NUMERIC')
+                    & ~sheet['New Name'].str.startswith('total_')]
+    return amounts['Original Name'].tolist()
+
+
+def test_same_seed_gives_the_same_survey(template):
+    survey = SyntheticSurvey(n_leas=200, seed=3)
+    sheet = synthetic_sheet(template, measures_per_table=5)
+
+    first = synthetic_year(sheet, 20, lea_attributes(survey.n_leas, survey.seed), survey)
+    second = synthetic_year(sheet, 20, lea_attributes(survey.n_leas, survey.seed), survey)
+    other_seed = synthetic_year(sheet, 20, lea_attributes(survey.n_leas, 4), SyntheticSurvey(n_leas=200, seed=4))
+
+    pd.testing.assert_frame_equal(first, second)
+    assert not first[amount_columns(sheet)].equals(other_seed[amount_columns(sheet)])
+
+
+def test_leas_are_the_same_in_every_year(template):
+    survey = SyntheticSurvey(n_leas=200, non_government_rate=0)
+    sheet = synthetic_sheet(template, measures_per_table=5)
+    leas = lea_attributes(survey.n_leas, survey.seed)
+    census_id = sheet.loc[sheet['New Name'] == 'census_id', 'Original Name'].item()
+
+    years = [synthetic_year(sheet, year, leas, survey) for year in (19, 20)]
+
+    assert years[0][census_id].tolist() == years[1][census_id].tolist() == leas['census_id'].tolist()
+    assert not years[0][amount_columns(sheet)].equals(years[1][amount_columns(sheet)])
+
+
+def test_measures_per_table(template):
+    sheet = synthetic_sheet(template, measures_per_table=40)
+
+    for table in LONG_TABLES:
+        rows = sheet[sheet['Table'] == table]
+        measures = rows[(rows['Type'].str.upper() == 'NUMERIC') & ~rows['New Name'].str.startswith('total_')]
+        assert len(measures) == 40
+        assert measures['New Name'].is_unique
+    # Rows of the other tables are kept as they are
+    assert (sheet['Table'] == 'entity').sum() == (template['Table'].astype(str).str.strip() == 'entity').sum()
+
+
+def test_zero_and_sentinel_rates(template):
+    survey = SyntheticSurvey(n_leas=2_000, sentinel_rate=0.1, zero_rate=0.2)
+    sheet = synthetic_sheet(template, measures_per_table=5)
+
+    amounts = synthetic_year(sheet, 20, lea_attributes(survey.n_leas), survey)[amount_columns(sheet)].to_numpy()
+
+    assert np.isin(amounts[amounts < 0], SENTINELS).all()
+    assert abs(np.isin(amounts, SENTINELS).mean() - survey.sentinel_rate) < 0.01
+    assert abs((amounts == 0).mean() - survey.zero_rate) < 0.01
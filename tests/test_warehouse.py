@@ -0,0 +1,29 @@
+import pandas as pd
+from warehouse import ParquetWarehouse
+
+
+def year_map(census_ids, state='Ohio'):
+    entity = pd.DataFrame({'census_id': census_ids, 'state': state, 'lea_name': [f'LEA {c}' for c in census_ids]})
+    annual_stats = pd.DataFrame({'census_id': census_ids, 'fall_membership': range(len(census_ids))})
+    return {'entity': ['entity', entity], 'annual_stats': ['entity', annual_stats]}
+
+
+def test_reloading_a_year_keeps_existing_entity_rows(tmp_path):
+    warehouse = ParquetWarehouse(str(tmp_path))
+    warehouse.write_year(19, [year_map(['A', 'B'])])
+    warehouse.write_year(19, [year_map(['A', 'B', 'C'])])
+
+    assert warehouse.census_ids() == {'A', 'B', 'C'}
+    assert sorted(warehouse.read('entity')['census_id']) == ['A', 'B', 'C']
+    assert sorted(warehouse.read('annual_stats', years=[2019])['census_id']) == ['A', 'B', 'C']
+
+
+def test_reloading_a_year_in_chunks_keeps_existing_entity_rows(tmp_path):
+    warehouse = ParquetWarehouse(str(tmp_path))
+    warehouse.write_year(19, [year_map(['A']), year_map(['B'])])
+    warehouse.write_year(20, [year_map(['C']), year_map(['D'])])
+    warehouse.write_year(19, [year_map(['A']), year_map(['B', 'E'])])
+
+    assert warehouse.census_ids() == {'A', 'B', 'C', 'D', 'E'}
+    assert sorted(warehouse.read('annual_stats', years=[2019])['census_id']) == ['A', 'B', 'E']
+    assert sorted(warehouse.read('annual_stats', years=[2020])['census_id']) == ['C', 'D']